@@ -1,10 +1,15 @@
-
-from typing import Any
+from typing import Any, Tuple
+import asyncio
+import numpy as np
 import pandas as pd
 import json
 import os
 import logging
 from mcp.server.fastmcp import FastMCP
+from catalog import CATEGORY_PATTERNS, intersect
+from catalog_manager import CatalogManager
+from result_cache import ResultCache, decode_cursor, encode_cursor, filter_key
+from serializer import FULL_SCHEMA, SCHEMA_VERSIONS, dumps_with_fragments
 
 # Set up logging to stderr (required for MCP STDIO servers)
 logging.basicConfig(level=logging.INFO)
@@ -13,17 +18,188 @@ logger = logging.getLogger(__name__)
 # CSV file path
 CSV_PATH = os.getenv("NIKE_CSV_PATH", "./data/nike.csv")
 
-# Load CSV data
-try:
-    df = pd.read_csv(CSV_PATH)
-    logger.info(f"Loaded {len(df)} products from {CSV_PATH}")
-except Exception as e:
-    logger.error(f"Error loading CSV: {e}")
-    df = pd.DataFrame()
+# Compiled catalog artifact (see compile_catalog.py); mapped instead of parsing the CSV when set
+CATALOG_ARTIFACT_PATH = os.getenv("CATALOG_ARTIFACT_PATH")
+
+# Seconds between checks of the CSV for changes (0 disables the watcher)
+CATALOG_WATCH_INTERVAL = float(os.getenv("CATALOG_WATCH_INTERVAL", "30"))
+
+# Load CSV data, parse typed columns and build the filter index once;
+# later changes to the file are picked up as a new snapshot
+catalog = CatalogManager(CATALOG_ARTIFACT_PATH or CSV_PATH, watch_interval=CATALOG_WATCH_INTERVAL)
+
+# filter_products result rows cached per catalog snapshot (0 entries disables the cache)
+FILTER_CACHE_SIZE = int(os.getenv("FILTER_CACHE_SIZE", "1024"))
+FILTER_CACHE_TTL = float(os.getenv("FILTER_CACHE_TTL", "300"))
+results = ResultCache(max_entries=FILTER_CACHE_SIZE, ttl=FILTER_CACHE_TTL)
+
+# Row lists of paged filter_products calls, kept for their later pages even when the result cache is off
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "256"))
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "600"))
+pages = ResultCache(max_entries=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL)
+
+# Key signing page cursors so clients cannot edit their filters; random per process unless
+# set, which replicas behind one load balancer need to accept each other's cursors
+CURSOR_SECRET = os.getenv("CURSOR_SECRET", "").encode('utf-8') or os.urandom(32)
+
+# filter_products arguments that select and order its rows: what a filter_products_batch spec
+# may set and a page cursor carries; and the most specs per batch
+FILTER_FIELDS = ('gender', 'category', 'color', 'size', 'search_term', 'min_price', 'max_price', 'sort_by_price',
+                     'limit', 'sort_by_relevance')
+MAX_BATCH_SPECS = 20
 
 # Initialize MCP server
 mcp = FastMCP("Nike Fashion Assistant")
 
+def _filter_rows(snapshot, gender: str = None, category: str = None, color: str = None, size: str = None,
+                 search_term: str = None, min_price: float = None, max_price: float = None,
+                 sort_by_price: str = None, limit: int = 100, sort_by_relevance: bool = False, base=None):
+    """Row positions filter_products returns for these arguments, in response order.
+
+    ``base`` is given by batch calls: the rows already matching this gender and
+    these price bounds, evaluated once for every spec that shares them.
+    """
+    if base is not None:
+        rows = snapshot.index.match(category=category, color=color, size=size, within=base)
+    else:
+        rows = snapshot.index.match(
+            gender=gender,
+            category=category,
+            color=color,
+            size=size,
+            min_price=min_price,
+            max_price=max_price
+        )
+    logger.info(f"Filters - gender: {gender}, category: {category}, color: {color}, size: {size}, search_term: {search_term}, min_price: {min_price}, max_price: {max_price}, sort_by_price: {sort_by_price}, sort_by_relevance: {sort_by_relevance}")
+    search_words = []
+    
+    # If search_term is provided, use it as additional filter (fallback)
+    if search_term:
+        search_words = [word for word in search_term.lower().split() if len(word) > 2]
+        logger.info(f"Search term: '{search_term}', words: {search_words}")
+        
+        # Correct typos against the catalog vocabulary ('womrn' -> 'women'); a word the catalog matches is not a typo
+        unmatched = [word for word in search_words if len(snapshot.index.search_word(word)) == 0]
+        replacements = dict(snapshot.spelling.correct_tokens(unmatched)[1])
+        corrections = [(word, replacements[word]) for word in search_words if word in replacements]
+        # Repeated and reordered words select the same rows: filter_key treats the words as a set
+        search_words = sorted({replacements.get(word, word) for word in search_words})
+        if corrections:
+            logger.info(f"Corrected search words: {corrections}")
+        
+        if search_words:
+            # Each word matches its stem or a common variation in the title or description;
+            # all words must be present in the same row (AND logic)
+            word_rows = [snapshot.index.search_word(word) for word in search_words]
+            matched = intersect([rows] + word_rows)
+            
+            if len(search_words) > 1:
+                # STRICT GENDER FILTERING: If gender is specified, don't fall back to similar items
+                has_gender = any(word in search_words for word in ['women', 'men', 'woman', 'man'])
+                if len(matched) == 0 and has_gender:
+                    logger.info("No exact gender matches found - keeping strict gender filter")
+                    # Don't fall back to similar items if gender was specified
+                    # This ensures "men hoodie" returns 0 results, not women's hoodies
+                elif len(matched) == 0 and not has_gender:
+                    logger.info("No exact matches found, trying to find similar items...")
+                    # Only try similar items if no gender was specified: any of the words as typed
+                    similar = intersect([rows, snapshot.index.contains('text', '|'.join(search_words))])
+                    if len(similar) > 0:
+                        logger.info(f"Found {len(similar)} similar items without gender filter")
+                        matched = similar
+            
+            logger.info(f"Found {len(matched)} matches for search_term")
+            rows = matched
+    
+    logger.info(f"Final filtered results: {len(rows)} products")
+    
+    # Rank by BM25 relevance to the searched words (price breaks ties), or apply price sorting;
+    # only the first `limit` rows are ever returned
+    if sort_by_relevance and len(rows) > 0:
+        # Category and color terms as the filters matched them, so equal cache keys rank alike
+        query_words = search_words + (CATEGORY_PATTERNS.get(category.lower(), category.lower()).split('|') if category else []) \
+            + (color.split('|') if color else [])
+        rows = snapshot.relevance.top_k(rows, query_words, limit, sort_by_price.lower() if sort_by_price else None)
+        logger.info(f"Selected top {len(rows)} by relevance to {query_words}")
+    elif sort_by_price and len(rows) > 0:
+        rows = snapshot.index.top_k_by_price(rows, sort_by_price.lower(), limit)
+        logger.info(f"Selected top {len(rows)} by price {sort_by_price.lower()}")
+    
+    # Serialize the first `limit` rows, skipping repeated product URLs
+    rows = snapshot.serializer.unique_rows(rows[:limit])
+    return rows
+
+def _batch_filters(spec: Any) -> dict:
+    """filter_products arguments of one batch spec, type-checked; ValueError names what is wrong with it"""
+    if not isinstance(spec, dict):
+        raise ValueError(f"A spec must be an object of filters, not {type(spec).__name__}")
+    unknown = sorted(set(spec) - set(FILTER_FIELDS) - {"name"})
+    if unknown:
+        raise ValueError(f"Unknown filters: {unknown}")
+    filters = {}
+    for field in FILTER_FIELDS:
+        value = spec.get(field)
+        if value is None:
+            continue
+        if field in ('min_price', 'max_price'):
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise ValueError(f"{field} must be a number, not {value!r}")
+            try:
+                value = float(value)
+            except ValueError:
+                raise ValueError(f"{field} must be a number, not {value!r}") from None
+        elif field == 'limit':
+            if isinstance(value, bool) or not isinstance(value, int):
+                raise ValueError(f"limit must be an integer, not {value!r}")
+        elif field == 'sort_by_relevance':
+            if not isinstance(value, bool):
+                raise ValueError(f"sort_by_relevance must be true or false, not {value!r}")
+        elif not isinstance(value, str):
+            raise ValueError(f"{field} must be a string, not {value!r}")
+        filters[field] = value
+    return filters
+
+def _pairing_rows(snapshot, current_product: dict) -> Tuple[str, np.ndarray]:
+    """(source, rows) of the complementary-item fallback: the pairing rules for the product's type and colors,
+    or the brand's products when they match nothing"""
+    # AI-style pairing logic based on the selected item
+    pairing_terms = []
+    product_name = current_product.get('description', '').lower()
+    product_colors = current_product.get('colors', '').lower()
+    
+    # Determine what type of item this is and what would pair well
+    if any(word in product_name for word in ['hoodie', 'sweatshirt', 'crew', 'fleece', 'sweater', 'top', 'shirt']):
+        # This is a top - suggest bottoms
+        pairing_terms.extend(['pant', 'legging', 'sweatpant', 'jogger', 'short'])
+    elif any(word in product_name for word in ['pant', 'legging', 'sweatpant', 'jogger', 'short']):
+        # This is a bottom - suggest tops
+        pairing_terms.extend(['hoodie', 'sweatshirt', 'crew', 'fleece', 'sweater', 'top', 'shirt'])
+    elif any(word in product_name for word in ['dress', 'skirt']):
+        # This is a dress - suggest accessories
+        pairing_terms.extend(['jacket', 'cardigan', 'blazer'])
+    
+    # Color pairing logic
+    if 'black' in product_colors or 'navy' in product_colors:
+        pairing_terms.extend(['white', 'gray', 'beige', 'cream'])
+    elif 'white' in product_colors or 'cream' in product_colors:
+        pairing_terms.extend(['black', 'navy', 'brown', 'gray'])
+    elif 'blue' in product_colors:
+        pairing_terms.extend(['black', 'white', 'gray', 'navy'])
+    elif 'pink' in product_colors or 'red' in product_colors:
+        pairing_terms.extend(['black', 'white', 'gray', 'navy'])
+    
+    # Search for pairing products
+    if pairing_terms:
+        rows = snapshot.index.contains('category', '|'.join(pairing_terms))
+        logger.info(f"Found {len(rows)} complementary items")
+        if len(rows) > 0:
+            return "pairing_rules", rows
+    
+    # If still no matches, get products from the same brand
+    rows = snapshot.index.contains('name', 'nike')
+    logger.info(f"Fallback to Nike products: {len(rows)} items")
+    return "brand", rows
+
 # MCP Tools
 @mcp.tool()
 async def filter_products(
@@ -35,15 +211,19 @@ async def filter_products(
     min_price: float = None,
     max_price: float = None,
     sort_by_price: str = None,
-    limit: int = 100
+    limit: int = 100,
+    schema_version: int = FULL_SCHEMA,
+    sort_by_relevance: bool = False,
+    page_size: int = None,
+    cursor: str = None
 ) -> str:
     """Filter products based on gender, category, color, size, price range, and search terms.
     
     EXTRACT THESE ENTITIES from user queries:
     - gender: 'men', 'women', 'male', 'female' (matches 'Men's' or 'Women's' in product descriptions)
     - category: 'hoodie', 'pants', 'shirt', 'sweatshirt', 'jacket', 'top'
-    - color: 'black', 'white', 'blue', 'red', 'pink', 'brown', 'gray'
-    - size: 'S', 'M', 'L', 'XL', 'small', 'medium', 'large'
+    - color: 'black', 'white', 'blue', 'red', 'pink', 'brown', 'gray' (whole color words: 'red' does not match 'Bred')
+    - size: 'S', 'M', 'L', 'XL', '2XL', 'M Tall', 'small', 'medium', 'large' (exact: 'S' does not match 'XS')
     - price: 'cheapest', 'under $50', 'under $100', 'expensive', 'budget', 'affordable'
     
     Examples:
@@ -58,236 +238,68 @@ async def filter_products(
         gender: Product gender - 'men', 'women', 'male', 'female'
         category: Product category - 'hoodie', 'pants', 'shirt', 'sweatshirt', 'jacket', 'top'
         color: Product color - 'black', 'white', 'blue', 'red', 'pink', 'brown', 'gray'
-        size: Product size - 'S', 'M', 'L', 'XL', 'small', 'medium', 'large'
+        size: Product size - 'S', 'M', 'L', 'XL', '2XL', 'M Tall', 'small', 'medium', 'large'; matched exactly
         search_term: Fallback search term for complex queries
         min_price: Minimum price filter (float)
         max_price: Maximum price filter (float)
         sort_by_price: Sort by price - 'asc' for cheapest first, 'desc' for most expensive first
         limit: Maximum number of products to return (default: 100)
+        schema_version: Response schema - 1 for the full product dict with alias keys, 2 for the compact dict without aliases
+        sort_by_relevance: Best matches for the search term, category and color first; sort_by_price then only breaks ties
+        page_size: Products per response; while more of the (at most `limit`) matches remain, the response has a next_cursor
+        cursor: next_cursor of an earlier response, to get its next page; the filters are taken from the cursor
     
     Returns:
         JSON string containing filtered products
     """
     try:
+        # Pin one snapshot for the whole call; a concurrent reload cannot change it
+        snapshot = catalog.current()
+        df = snapshot.df
         if df.empty:
             return json.dumps({"success": False, "error": "No products available", "products": []})
+        if schema_version not in SCHEMA_VERSIONS:
+            return json.dumps({"success": False, "error": f"Unsupported schema_version: {schema_version}", "products": []})
         
-        filtered_df = df.copy()
-        logger.info(f"Starting filter with {len(filtered_df)} products")
-        logger.info(f"Filters - gender: {gender}, category: {category}, color: {color}, size: {size}, search_term: {search_term}, min_price: {min_price}, max_price: {max_price}, sort_by_price: {sort_by_price}")
-        
-        # Apply gender filter first (most important for strict matching)
-        if gender and len(filtered_df) > 0:
-            gender_lower = gender.lower()
-            if gender_lower in ['men', 'male']:
-                # Use exact gender matching
-                gender_mask = filtered_df['Gender'] == 'Men'
-                logger.info(f"Gender filter 'men': {gender_mask.sum()} matches")
-                filtered_df = filtered_df[gender_mask]
-            elif gender_lower in ['women', 'female']:
-                # Use exact gender matching
-                gender_mask = filtered_df['Gender'] == 'Women'
-                logger.info(f"Gender filter 'women': {gender_mask.sum()} matches")
-                filtered_df = filtered_df[gender_mask]
-        
-        # Apply category filter
-        if category and len(filtered_df) > 0:
-            category_lower = category.lower()
-            # Map common category terms to search patterns
-            category_patterns = {
-                'hoodie': 'hoodie|sweatshirt',
-                'pants': 'pants|trousers|sweatpants',
-                'shirt': 'shirt|top|blouse',
-                'sweatshirt': 'sweatshirt|hoodie',
-                'jacket': 'jacket|coat|blazer',
-                'top': 'top|shirt|blouse'
-            }
-            
-            search_pattern = category_patterns.get(category_lower, category_lower)
-            category_mask = filtered_df['Category.1'].str.contains(search_pattern, case=False, na=False)
-            logger.info(f"Category filter '{category}': {category_mask.sum()} matches")
-            filtered_df = filtered_df[category_mask]
-        
-        # Apply color filter
-        if color and len(filtered_df) > 0:
-            color_mask = filtered_df['Colors'].str.contains(color, case=False, na=False)
-            logger.info(f"Color filter '{color}': {color_mask.sum()} matches")
-            filtered_df = filtered_df[color_mask]
-        
-        # Apply size filter
-        if size and len(filtered_df) > 0:
-            size_mask = filtered_df['Sizes'].str.contains(size, case=False, na=False)
-            logger.info(f"Size filter '{size}': {size_mask.sum()} matches")
-            filtered_df = filtered_df[size_mask]
-        
-        # Apply price filters
-        if (min_price is not None or max_price is not None) and len(filtered_df) > 0:
-            # Convert price column to numeric, handling any non-numeric values
-            price_series = pd.to_numeric(filtered_df['Current Price'].str.replace('$', '').str.replace(',', '').str.replace('\u00a0', ''), errors='coerce')
-            
-            if min_price is not None:
-                price_mask = price_series >= min_price
-                logger.info(f"Min price filter '${min_price}': {price_mask.sum()} matches")
-                filtered_df = filtered_df[price_mask]
-            
-            if max_price is not None:
-                price_mask = price_series <= max_price
-                logger.info(f"Max price filter '${max_price}': {price_mask.sum()} matches")
-                filtered_df = filtered_df[price_mask]
-        
-        # Apply price sorting
-        if sort_by_price and len(filtered_df) > 0:
-            # Convert price column to numeric for sorting
-            price_series = pd.to_numeric(filtered_df['Current Price'].str.replace('$', '').str.replace(',', '').str.replace('\u00a0', ''), errors='coerce')
-            filtered_df = filtered_df.copy()
-            filtered_df['numeric_price'] = price_series
-            
-            if sort_by_price.lower() == 'asc':
-                filtered_df = filtered_df.sort_values('numeric_price', ascending=True)
-                logger.info(f"Sorted by price ascending (cheapest first)")
-            elif sort_by_price.lower() == 'desc':
-                filtered_df = filtered_df.sort_values('numeric_price', ascending=False)
-                logger.info(f"Sorted by price descending (most expensive first)")
-            
-            # Remove the temporary numeric_price column
-            filtered_df = filtered_df.drop('numeric_price', axis=1)
-        
-        # If search_term is provided, use it as additional filter (fallback)
-        if search_term:
-            search_cols = ['Category.1', 'Detailed description']
-            search_words = [word for word in search_term.lower().split() if len(word) > 2]
-            logger.info(f"Search term: '{search_term}', words: {search_words}")
-            
-            if search_words:
-                # Create flexible search patterns for common spelling variations
-                flexible_patterns = []
-                for word in search_words:
-                    # Add the original word
-                    flexible_patterns.append(word)
-                    # Add common variations
-                    if word == 'womrn' or word == 'women':
-                        flexible_patterns.extend(['women', 'woman', 'female'])
-                    elif word == 'men' or word == 'man':
-                        flexible_patterns.extend(['men', 'man', 'male'])
-                    elif word == 'hoodie' or word == 'hoody':
-                        flexible_patterns.extend(['hoodie', 'hoody', 'hood', 'sweatshirt'])
-                    elif word == 'pant' or word == 'pants':
-                        flexible_patterns.extend(['pant', 'pants', 'trouser', 'trousers'])
-                    elif word == 'shirt' or word == 'shirts':
-                        flexible_patterns.extend(['shirt', 'shirts', 'top', 'tops'])
-                
-                # Remove duplicates and create pattern
-                unique_patterns = list(set(flexible_patterns))
-                search_pattern = '|'.join(unique_patterns)
-                logger.info(f"Flexible search pattern: {search_pattern}")
-                
-                # Use AND logic - all words must be present in the same row
-                mask = filtered_df[search_cols].apply(
-                    lambda x: x.str.contains(search_pattern, case=False, na=False, regex=True)
-                ).any(axis=1)
-                
-                # Additional check: ensure we have matches for multiple words if they exist
-                if len(search_words) > 1:
-                    # For multi-word searches, ensure ALL words match (AND logic)
-                    word_matches = []
-                    for word in search_words:
-                        word_variations = [word]
-                        if word == 'womrn' or word == 'women':
-                            word_variations.extend(['women', 'woman', 'female'])
-                        elif word == 'men' or word == 'man':
-                            word_variations.extend(['men', 'man', 'male'])
-                        elif word == 'hoodie' or word == 'hoody':
-                            word_variations.extend(['hoodie', 'hoody', 'hood', 'sweatshirt'])
-                        elif word == 'pant' or word == 'pants':
-                            word_variations.extend(['pant', 'pants', 'trouser', 'trousers'])
-                        elif word == 'shirt' or word == 'shirts':
-                            word_variations.extend(['shirt', 'shirts', 'top', 'tops'])
-                        
-                        word_pattern = '|'.join(word_variations)
-                        word_mask = filtered_df[search_cols].apply(
-                            lambda x: x.str.contains(word_pattern, case=False, na=False, regex=True)
-                        ).any(axis=1)
-                        word_matches.append(word_mask)
-                    
-                    # Combine all word matches with AND logic
-                    combined_mask = word_matches[0]
-                    for word_mask in word_matches[1:]:
-                        combined_mask = combined_mask & word_mask
-                    mask = combined_mask
-                    
-                    # STRICT GENDER FILTERING: If gender is specified, don't fall back to similar items
-                    has_gender = any(word in search_words for word in ['women', 'men', 'woman', 'man', 'womrn'])
-                    if mask.sum() == 0 and has_gender:
-                        logger.info("No exact gender matches found - keeping strict gender filter")
-                        # Don't fall back to similar items if gender was specified
-                        # This ensures "men hoodie" returns 0 results, not women's hoodies
-                    elif mask.sum() == 0 and not has_gender:
-                        logger.info("No exact matches found, trying to find similar items...")
-                        # Only try similar items if no gender was specified
-                        similar_pattern = '|'.join(search_words)
-                        similar_mask = filtered_df[search_cols].apply(
-                            lambda x: x.str.contains(similar_pattern, case=False, na=False, regex=True)
-                        ).any(axis=1)
-                        if similar_mask.sum() > 0:
-                            logger.info(f"Found {similar_mask.sum()} similar items without gender filter")
-                            mask = similar_mask
-                
-                logger.info(f"Found {mask.sum()} matches for search_term")
-                filtered_df = filtered_df[mask]
+        offset = 0
+        if cursor:
+            # Later pages of an earlier call: same filters, so the same rows in the same order
+            version, filters, offset, page_size = decode_cursor(cursor, CURSOR_SECRET)
+            if version != snapshot.version:
+                return json.dumps({"success": False, "error": "The catalog changed since this cursor was issued; search again",
+                                   "products": []})
+            gender, category, color, size, search_term, min_price, max_price, sort_by_price, limit, sort_by_relevance = (
+                filters.get(field) for field in FILTER_FIELDS
+            )
         
+        # Identical requests (up to synonyms and term order) reuse the rows of an earlier call;
+        # rows are recomputed identically from the same snapshot once the entry expires
+        key = filter_key(gender, category, color, size, search_term, min_price, max_price, sort_by_price, limit, sort_by_relevance)
+        rows = results.get(snapshot, key)
+        if rows is None and cursor:
+            rows = pages.get(snapshot, key)
+        if rows is None:
+            rows = _filter_rows(snapshot, gender, category, color, size, search_term, min_price, max_price, sort_by_price, limit,
+                                sort_by_relevance)
+            results.put(snapshot, key, rows)
+        else:
+            logger.info(f"Result cache hit for {key}")
         
-        logger.info(f"Final filtered results: {len(filtered_df)} products")
-        
-        # Convert to list of dictionaries with safe string conversion
-        products = []
-        seen_urls = set()  # Track product URLs to avoid duplicates
-        for _, row in filtered_df.head(limit).iterrows():
-            def safe_str(value):
-                if pd.isna(value) or value is None:
-                    return ""
-                return str(value)
-            
-            # Get product URL to check for duplicates
-            product_url = safe_str(row['Product page url'])
-            if not product_url or product_url in seen_urls:
-                continue
-            seen_urls.add(product_url)
-            
-            # Get brand from productcard_messaging or use first part of Category.1
-            category_name = safe_str(row['Category.1'])
-            brand = 'Nike'  # Default brand
-            
-            product = {
-                "id": safe_str(row['ProductID']),  # Use ProductID from CSV
-                "name": safe_str(row['Category']),  # Product brand/name
-                "brand": brand,  # Brand name
-                "vendor": safe_str(row['Vendor']),  # Vendor name
-                "description": category_name,  # Product description
-                "detailed_description": safe_str(row['Detailed description']),
-                "price": safe_str(row['Current Price']),
-                "current_price": safe_str(row['Current Price']),  # Alias for price
-                "original_price": safe_str(row['Original Price']),
-                "image_url": safe_str(row['Image Url']),
-                "Image_Url": safe_str(row['Image Url']),  # Alias with different casing
-                "product_url": safe_str(row['Product page url']),
-                "product_page_url": safe_str(row['Product page url']),  # Alias
-                "sizes": safe_str(row['Sizes']),
-                "Sizes": safe_str(row['Sizes']),  # Alias with different casing
-                "colors": safe_str(row['Colors']),
-                "Colors": safe_str(row['Colors']),  # Alias with different casing
-                "colors_available": safe_str(row.get('Colors Available', '') if 'Colors Available' in row.index else ''),  # New field
-                "Colors_Available": safe_str(row.get('Colors Available', '') if 'Colors Available' in row.index else ''),  # Alias
-                "messaging": safe_str(row['productcard_messaging']),
-                "productcard_messaging": safe_str(row['productcard_messaging']),
-                "offer_percent": safe_str(row['Offer %']),
-                "gender": safe_str(row['Gender']),
-                "category": safe_str(row['Category']),  # Category field
-                "Category": safe_str(row['Category'])  # Alias with different casing
-            }
-            products.append(product)
+        page, next_cursor = rows, None
+        if page_size is not None:
+            page_size = max(int(page_size), 1)
+            page = rows[offset:offset + page_size]
+            if offset + page_size < len(rows):
+                filters = dict(zip(FILTER_FIELDS, (gender, category, color, size, search_term, min_price, max_price,
+                                                   sort_by_price, limit, sort_by_relevance)))
+                next_cursor = encode_cursor(snapshot.version, filters, offset + page_size, page_size, CURSOR_SECRET)
+                pages.put(snapshot, key, rows)
+        products = snapshot.serializer.products(page, schema_version)
         
         result = {
             "success": True,
+            "schema_version": schema_version,
+            "catalog_version": snapshot.version,
             "products": products,
             "total_count": len(products),
             "filters_applied": {
@@ -298,12 +310,16 @@ async def filter_products(
                 "search_term": search_term,
                 "min_price": min_price,
                 "max_price": max_price,
-                "sort_by_price": sort_by_price
+                "sort_by_price": sort_by_price,
+                "sort_by_relevance": sort_by_relevance
             }
         }
+        if page_size is not None:
+            result["matched_count"] = len(rows)
+            result["next_cursor"] = next_cursor
         
         # Add helpful message if no products found
-        if len(products) == 0:
+        if len(rows) == 0:
             # Create specific suggestions based on what was searched
             suggestions = []
             if gender and gender.lower() in ['men', 'male']:
@@ -324,11 +340,77 @@ async def filter_products(
             suggestion_text = ", ".join(suggestions[:3])
             result["message"] = f"Sorry, I couldn't find any products matching your search criteria. 😔\n\nHow about trying one of these instead?\n• {suggestion_text}\n• Or try a different color or size\n\nI'm here to help you find the perfect fashion items! 💫"
         
-        return json.dumps(result)
+        return dumps_with_fragments(result, "products", products)
         
     except Exception as e:
         return json.dumps({"success": False, "error": str(e), "products": []})
 
+@mcp.tool()
+async def filter_products_batch(specs: list[Any], schema_version: int = FULL_SCHEMA) -> str:
+    """Run several filter_products searches in one call, e.g. the tops, bottoms and jackets of one outfit.
+    
+    Each spec takes the filter_products arguments (gender, category, color, size, search_term,
+    min_price, max_price, sort_by_price, limit, sort_by_relevance) plus an optional 'name' that
+    keys its result (default: the spec's position); names must be unique. A spec with an unknown
+    filter or a badly typed value gets its own error entry without failing the others. Filters
+    shared by several specs, such as one gender and budget, are evaluated once for the whole batch.
+    
+    Args:
+        specs: Searches to run, e.g. [{"name": "tops", "gender": "women", "category": "top", "max_price": 80},
+               {"name": "bottoms", "gender": "women", "category": "pants", "max_price": 80}]
+        schema_version: Response schema - 1 for the full product dict with alias keys, 2 for the compact dict without aliases
+    
+    Returns:
+        JSON string with "results" mapping each spec's name to its products, total_count and filters_applied
+    """
+    try:
+        snapshot = catalog.current()
+        if snapshot.df.empty:
+            return json.dumps({"success": False, "error": "No products available", "results": {}})
+        if schema_version not in SCHEMA_VERSIONS:
+            return json.dumps({"success": False, "error": f"Unsupported schema_version: {schema_version}", "results": {}})
+        if len(specs) > MAX_BATCH_SPECS:
+            return json.dumps({"success": False, "error": f"At most {MAX_BATCH_SPECS} specs per batch", "results": {}})
+        
+        names = [str(spec.get("name", position)) if isinstance(spec, dict) else str(position)
+                 for position, spec in enumerate(specs)]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            return json.dumps({"success": False, "error": f"Duplicate spec names: {duplicates}", "results": {}})
+        
+        bases = {}
+        entries = {}
+        for name, spec in zip(names, specs):
+            try:
+                filters = _batch_filters(spec)
+                key = filter_key(**filters)
+                rows = results.get(snapshot, key)
+                if rows is None:
+                    # Rows for the spec's gender and price bounds, shared with the other specs that have them
+                    audience = {field: filters.get(field) for field in ("gender", "min_price", "max_price")}
+                    base_key = filter_key(**audience)
+                    if base_key not in bases:
+                        bases[base_key] = snapshot.index.match(**audience)
+                    rows = _filter_rows(snapshot, **filters, base=bases[base_key])
+                    results.put(snapshot, key, rows)
+                products = snapshot.serializer.products(rows, schema_version)
+            except Exception as e:
+                entries[name] = json.dumps({"success": False, "error": str(e), "products": []})
+                continue
+            entry = {
+                "success": True,
+                "total_count": len(products),
+                "filters_applied": {field: filters.get(field) for field in FILTER_FIELDS}
+            }
+            entries[name] = dumps_with_fragments(entry, "products", products)
+        logger.info(f"Batch of {len(specs)} searches over {len(bases)} shared gender/price row sets")
+        
+        result = {"success": True, "schema_version": schema_version, "catalog_version": snapshot.version}
+        return dumps_with_fragments(result, "results", entries)
+    
+    except Exception as e:
+        return json.dumps({"success": False, "error": str(e), "results": {}})
+
 @mcp.tool()
 async def get_similar_products(
     product_description: str,
@@ -340,12 +422,16 @@ async def get_similar_products(
     min_price: float = None,
     max_price: float = None,
     sort_by_price: str = None,
-    limit: int = 4
+    limit: int = 4,
+    schema_version: int = FULL_SCHEMA,
+    product_id: str = None
 ) -> str:
     """Get similar/recommended products based on the current product using AI-style pairing logic.
     
     This tool analyzes the clicked product and intelligently recommends complementary items
-    that would pair well with it, using fashion knowledge and color coordination.
+    that would pair well with it, using fashion knowledge and color coordination. With a
+    known product_id the recommendations come from the precomputed complementary-product
+    table, narrowed by any filters given.
     
     Args:
         product_description: Description of the current product
@@ -358,173 +444,95 @@ async def get_similar_products(
         max_price: Maximum price filter (float)
         sort_by_price: Sort by price - 'asc' for cheapest first, 'desc' for most expensive first
         limit: Maximum number of products to return (default: 4)
+        schema_version: Response schema - 1 for the full product dict with alias keys, 2 for the compact dict without aliases
+        product_id: ProductID of the current product; looks up its precomputed recommendations
     
     Returns:
         JSON string containing recommended products
     """
     try:
+        # Pin one snapshot for the whole call; a concurrent reload cannot change it
+        snapshot = catalog.current()
+        df = snapshot.df
         if df.empty:
             return json.dumps({"success": False, "error": "No products available", "recommendations": []})
+        if schema_version not in SCHEMA_VERSIONS:
+            return json.dumps({"success": False, "error": f"Unsupported schema_version: {schema_version}", "recommendations": []})
         
         # Parse current product
         current_product_obj = json.loads(current_product) if isinstance(current_product, str) else current_product
         
-        # Start with all products
-        filtered_df = df.copy()
-        logger.info(f"Starting recommendations with {len(filtered_df)} products")
         logger.info(f"Current product: {current_product_obj.get('description', 'N/A')}")
         logger.info(f"Filters - gender: {gender}, category: {category}, color: {color}, size: {size}, min_price: {min_price}, max_price: {max_price}, sort_by_price: {sort_by_price}")
+        rows = filter_rows = snapshot.index.match(
+            gender=gender,
+            category=category,
+            color=color,
+            size=size,
+            min_price=min_price,
+            max_price=max_price
+        )
         
-        # Apply gender filter first (most important for strict matching)
-        if gender and len(filtered_df) > 0:
-            gender_lower = gender.lower()
-            if gender_lower in ['men', 'male']:
-                gender_mask = filtered_df['Gender'] == 'Men'
-                logger.info(f"Gender filter 'men': {gender_mask.sum()} matches")
-                filtered_df = filtered_df[gender_mask]
-            elif gender_lower in ['women', 'female']:
-                gender_mask = filtered_df['Gender'] == 'Women'
-                logger.info(f"Gender filter 'women': {gender_mask.sum()} matches")
-                filtered_df = filtered_df[gender_mask]
-        
-        # Apply category filter
-        if category and len(filtered_df) > 0:
-            category_lower = category.lower()
-            category_patterns = {
-                'hoodie': 'hoodie|sweatshirt',
-                'pants': 'pants|trousers|sweatpants',
-                'shirt': 'shirt|top|blouse',
-                'sweatshirt': 'sweatshirt|hoodie',
-                'jacket': 'jacket|coat|blazer',
-                'top': 'top|shirt|blouse'
-            }
-            
-            search_pattern = category_patterns.get(category_lower, category_lower)
-            category_mask = filtered_df['Category.1'].str.contains(search_pattern, case=False, na=False)
-            logger.info(f"Category filter '{category}': {category_mask.sum()} matches")
-            filtered_df = filtered_df[category_mask]
-        
-        # Apply color filter
-        if color and len(filtered_df) > 0:
-            color_mask = filtered_df['Colors'].str.contains(color, case=False, na=False)
-            logger.info(f"Color filter '{color}': {color_mask.sum()} matches")
-            filtered_df = filtered_df[color_mask]
+        # Precomputed complementary products for a known product, kept in table order
+        # where they pass the filters
+        source = "filters"
+        if product_id:
+            table_rows = snapshot.recommendations.lookup(product_id)
+            if len(rows) == 0:
+                table_rows = rows
+            elif len(rows) < snapshot.index.size:
+                # Membership by binary search in the sorted filter rows, not a catalog-sized mask
+                positions = np.minimum(np.searchsorted(rows, table_rows), len(rows) - 1)
+                table_rows = table_rows[rows[positions] == table_rows]
+            if len(table_rows) > 0:
+                source = "table"
+                rows = snapshot.index.sort_by_price(table_rows, sort_by_price.lower()) if sort_by_price else table_rows
+                logger.info(f"Recommendation table: {len(rows)} complementary items for {product_id}")
         
-        # Apply size filter
-        if size and len(filtered_df) > 0:
-            size_mask = filtered_df['Sizes'].str.contains(size, case=False, na=False)
-            logger.info(f"Size filter '{size}': {size_mask.sum()} matches")
-            filtered_df = filtered_df[size_mask]
+        # Apply price sorting; only the first `limit` rows are ever returned
+        if source == "filters" and sort_by_price and len(rows) > 0:
+            rows = snapshot.index.top_k_by_price(rows, sort_by_price.lower(), limit)
+            logger.info(f"Selected top {len(rows)} by price {sort_by_price.lower()}")
         
-        # Apply price filters
-        if (min_price is not None or max_price is not None) and len(filtered_df) > 0:
-            price_series = pd.to_numeric(filtered_df['Current Price'].str.replace('$', '').str.replace(',', '').str.replace('\u00a0', ''), errors='coerce')
-            
-            if min_price is not None:
-                price_mask = price_series >= min_price
-                logger.info(f"Min price filter '${min_price}': {price_mask.sum()} matches")
-                filtered_df = filtered_df[price_mask]
-            
-            if max_price is not None:
-                price_mask = price_series <= max_price
-                logger.info(f"Max price filter '${max_price}': {price_mask.sum()} matches")
-                filtered_df = filtered_df[price_mask]
-        
-        # Apply price sorting
-        if sort_by_price and len(filtered_df) > 0:
-            price_series = pd.to_numeric(filtered_df['Current Price'].str.replace('$', '').str.replace(',', '').str.replace('\u00a0', ''), errors='coerce')
-            filtered_df = filtered_df.copy()
-            filtered_df['numeric_price'] = price_series
-            
-            if sort_by_price.lower() == 'asc':
-                filtered_df = filtered_df.sort_values('numeric_price', ascending=True)
-                logger.info(f"Sorted by price ascending (cheapest first)")
-            elif sort_by_price.lower() == 'desc':
-                filtered_df = filtered_df.sort_values('numeric_price', ascending=False)
-                logger.info(f"Sorted by price descending (most expensive first)")
-            
-            filtered_df = filtered_df.drop('numeric_price', axis=1)
+        filtered_df = df.iloc[rows]
         
         # If no products found after filtering, try to find complementary items based on the current product
         if len(filtered_df) == 0:
             logger.info("No products found with filters, trying complementary pairing logic...")
             
-            # AI-style pairing logic based on the selected item
-            pairing_terms = []
-            product_name = current_product_obj.get('description', '').lower()
-            product_colors = current_product_obj.get('colors', '').lower()
-            
-            # Determine what type of item this is and what would pair well
-            if any(word in product_name for word in ['hoodie', 'sweatshirt', 'crew', 'fleece', 'sweater', 'top', 'shirt']):
-                # This is a top - suggest bottoms
-                pairing_terms.extend(['pant', 'legging', 'sweatpant', 'jogger', 'short'])
-            elif any(word in product_name for word in ['pant', 'legging', 'sweatpant', 'jogger', 'short']):
-                # This is a bottom - suggest tops
-                pairing_terms.extend(['hoodie', 'sweatshirt', 'crew', 'fleece', 'sweater', 'top', 'shirt'])
-            elif any(word in product_name for word in ['dress', 'skirt']):
-                # This is a dress - suggest accessories
-                pairing_terms.extend(['jacket', 'cardigan', 'blazer'])
-            
-            # Color pairing logic
-            if 'black' in product_colors or 'navy' in product_colors:
-                pairing_terms.extend(['white', 'gray', 'beige', 'cream'])
-            elif 'white' in product_colors or 'cream' in product_colors:
-                pairing_terms.extend(['black', 'navy', 'brown', 'gray'])
-            elif 'blue' in product_colors:
-                pairing_terms.extend(['black', 'white', 'gray', 'navy'])
-            elif 'pink' in product_colors or 'red' in product_colors:
-                pairing_terms.extend(['black', 'white', 'gray', 'navy'])
-            
-            # Search for pairing products
-            if pairing_terms:
-                mask = df['Category.1'].str.contains('|'.join(pairing_terms), case=False, na=False)
-                filtered_df = df[mask]
-                logger.info(f"Found {len(filtered_df)} complementary items")
-            
-            # If still no matches, get products from the same brand
-            if len(filtered_df) == 0:
-                filtered_df = df[df['Category'].str.contains('Nike', case=False, na=False)]
-                logger.info(f"Fallback to Nike products: {len(filtered_df)} items")
+            source, rows = _pairing_rows(snapshot, current_product_obj)
+            filtered_df = df.iloc[rows]
         
         logger.info(f"Final recommendation results: {len(filtered_df)} products")
         
-        # Convert to list of dictionaries with safe string conversion
-        recommendations = []
-        seen_urls = set()  # Track product URLs to avoid duplicates
-        for _, row in filtered_df.head(limit).iterrows():
-            def safe_str(value):
-                if pd.isna(value) or value is None:
-                    return ""
-                return str(value)
-            
-            # Get product URL to check for duplicates
-            product_url = safe_str(row['Product page url'])
-            if not product_url or product_url in seen_urls:
-                continue
-            seen_urls.add(product_url)
-            
-            product = {
-                "id": len(recommendations) + 1,
-                "name": safe_str(row['Category']),
-                "vendor": safe_str(row['Vendor']),  # Vendor name
-                "description": safe_str(row['Category.1']),
-                "detailed_description": safe_str(row['Detailed description']),
-                "price": safe_str(row['Current Price']),
-                "original_price": safe_str(row['Original Price']),
-                "image_url": safe_str(row['Image Url']),
-                "product_url": safe_str(row['Product page url']),
-                "sizes": safe_str(row['Sizes']),
-                "colors": safe_str(row['Colors']),
-                "messaging": safe_str(row['productcard_messaging']),
-                "offer_percent": safe_str(row['Offer %']),
-                "gender": safe_str(row['Gender'])
-            }
-            recommendations.append(product)
+        # Serialize the first `limit` rows, skipping repeated product URLs; table lists are
+        # short, so repeats there are skipped before the cut and the spare entries fill in
+        rows = filtered_df.index.to_numpy()
+        rows = snapshot.serializer.unique_rows(rows if source == "table" else rows[:limit])[:limit]
+        if source == "table" and len(rows) < limit:
+            # The filters left fewer table entries than `limit`: top up from the other filter
+            # matches, then the pairing rules, never repeating the product itself
+            current = snapshot.index.product_row(product_id)
+            for fallback in ("filters", "pairing_rules"):
+                if len(rows) >= limit:
+                    break
+                if fallback == "filters":
+                    extra = snapshot.index.top_k_by_price(filter_rows, sort_by_price.lower(), limit + len(rows) + 1) \
+                        if sort_by_price else filter_rows
+                else:
+                    extra = _pairing_rows(snapshot, current_product_obj)[1]
+                extra = extra[~np.isin(extra, rows) & (extra != (-1 if current is None else current))][:limit]
+                rows = snapshot.serializer.unique_rows(np.concatenate([rows, extra]))[:limit]
+            logger.info(f"Topped up table recommendations to {len(rows)} items")
+        recommendations = snapshot.serializer.recommendations(rows, schema_version)
         
         result = {
             "success": True,
+            "schema_version": schema_version,
+            "catalog_version": snapshot.version,
             "recommendations": recommendations,
             "total_count": len(recommendations),
+            "source": source,
             "filters_applied": {
                 "gender": gender,
                 "category": category,
@@ -535,11 +543,119 @@ async def get_similar_products(
                 "sort_by_price": sort_by_price
             }
         }
-        return json.dumps(result)
+        return dumps_with_fragments(result, "recommendations", recommendations)
         
     except Exception as e:
         return json.dumps({"success": False, "error": str(e), "recommendations": []})
 
+@mcp.tool()
+async def find_similar_products(
+    product_id: str = None,
+    query: str = None,
+    gender: str = None,
+    limit: int = 10,
+    schema_version: int = FULL_SCHEMA
+) -> str:
+    """Find the products whose title and description are most similar to a product or a free-text query.
+    
+    Similarity is the cosine between product embeddings (TF-IDF with SVD over title and
+    description), so matches share meaning and vocabulary rather than a category keyword.
+    
+    Args:
+        product_id: ProductID of the product to find neighbours of (the product itself is excluded)
+        query: Free-text description to match when no product_id is given, e.g. 'soft warm layer for cold runs'
+        gender: Only return products for this gender - 'men', 'women', 'male', 'female'
+        limit: Maximum number of products to return (default: 10)
+        schema_version: Response schema - 1 for the full product dict with alias keys, 2 for the compact dict without aliases
+    
+    Returns:
+        JSON string containing the most similar products, best first, with their similarity scores
+    """
+    try:
+        snapshot = catalog.current()
+        if snapshot.df.empty:
+            return json.dumps({"success": False, "error": "No products available", "products": []})
+        if schema_version not in SCHEMA_VERSIONS:
+            return json.dumps({"success": False, "error": f"Unsupported schema_version: {schema_version}", "products": []})
+        
+        embeddings = snapshot.embeddings
+        row = None
+        if product_id:
+            row = snapshot.index.product_row(product_id)
+            if row is None:
+                return json.dumps({"success": False, "error": f"Unknown product_id: {product_id}", "products": []})
+            vector = embeddings.vectors[row]
+        elif query:
+            vector = embeddings.embed_text(query)
+            if vector is None:
+                return json.dumps({"success": True, "catalog_version": snapshot.version, "products": [], "total_count": 0,
+                                   "similarity": []})
+        else:
+            return json.dumps({"success": False, "error": "Provide product_id or query", "products": []})
+        
+        allowed = snapshot.index.gender_rows(gender) if gender else None
+        # A few spare neighbours cover repeated product URLs dropped below
+        rows, scores = embeddings.search(vector, limit + 5, allowed=allowed, exclude=row)
+        unique = snapshot.serializer.unique_rows(rows)[:limit]
+        similarity = dict(zip(rows.tolist(), scores.tolist()))
+        products = snapshot.serializer.products(unique, schema_version)
+        logger.info(f"Similarity search for {product_id or repr(query)}: {len(products)} products")
+        
+        result = {
+            "success": True,
+            "schema_version": schema_version,
+            "catalog_version": snapshot.version,
+            "products": products,
+            "total_count": len(products),
+            "similarity": [round(similarity[r], 4) for r in unique.tolist()]
+        }
+        return dumps_with_fragments(result, "products", products)
+    
+    except Exception as e:
+        return json.dumps({"success": False, "error": str(e), "products": []})
+
+@mcp.tool()
+async def catalog_status() -> str:
+    """Report the loaded catalog snapshot, including rows whose prices could not be parsed.
+    
+    Returns:
+        JSON string with the catalog version, path, row counts, per-column parse failures
+        and the filter_products result and page cache counters
+    """
+    snapshot = catalog.current()
+    return json.dumps({"success": not snapshot.empty, "catalog": catalog.status(), "result_cache": results.stats(),
+                       "page_cache": pages.stats()})
+
+@mcp.tool()
+async def spelling_vocabulary() -> str:
+    """Report the word frequencies typo correction uses, so clients can correct queries locally.
+    
+    Returns:
+        JSON string with the catalog version and a word -> frequency map
+    """
+    snapshot = catalog.current()
+    spelling = await asyncio.to_thread(lambda: snapshot.spelling)
+    return json.dumps({"success": True, "catalog_version": snapshot.version, "vocabulary": spelling.vocabulary})
+
+@mcp.tool()
+async def reload_catalog(wait: bool = True, force: bool = False) -> str:
+    """Reload the product catalog from its CSV and atomically swap in the new snapshot.
+    
+    In-flight searches finish on the snapshot they started with.
+    
+    Args:
+        wait: Wait for the rebuild to finish before returning (default: True)
+        force: Rebuild even if the file content has not changed (default: False)
+    
+    Returns:
+        JSON string with the resulting catalog version
+    """
+    if not wait:
+        catalog.reload_in_background(force=force)
+        return json.dumps({"success": True, "reloading": True, "catalog_version": catalog.current().version})
+    outcome = await asyncio.to_thread(catalog.reload, force)
+    return json.dumps({"success": "error" not in outcome, "catalog_version": outcome.pop("version"), **outcome})
+
 def main():
     """Initialize and run the MCP server"""
     logger.info("Starting Nike Fashion Assistant MCP Server")
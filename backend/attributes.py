@@ -0,0 +1,115 @@
+"""Structured size and color attributes as bitmasks over fixed vocabularies.
+
+``Sizes`` ("XS (0–2) S (4–6) M Tall"), ``Colors`` ("Shown: University
+Red/White") and ``Colors Available`` ("Blue, Red, White") are parsed into
+sets of normalized tokens, one bit per vocabulary entry, so a filter is an
+exact token test (``masks & bits``) rather than a substring match: "S" no
+longer matches XS or XXS, and "red" no longer matches "Bred". Parsing runs
+once per distinct column value, which is a handful for these columns.
+"""
+from typing import Dict, Iterable, List, Optional, Set
+import re
+import numpy as np
+import pandas as pd
+
+# Letter and plus sizes with their Tall fits, and numeric sizes; each gets one bit
+LETTER_SIZES = ('XXS', 'XS', 'S', 'M', 'L', 'XL', 'XXL', '3XL', '4XL', '5XL', '0X', '1X', '2X', '3X', '4X', '5X')
+TALL_SIZES = tuple(f"{size} TALL" for size in LETTER_SIZES)
+SIZE_VOCABULARY = LETTER_SIZES + TALL_SIZES + (
+    '00', '0', '2', '4', '6', '8', '10', '12', '14', '16', '18', '20', '22', '24'
+)
+
+# Spellings folded into a vocabulary size, for catalog values and user terms alike
+SIZE_ALIASES = {
+    '2XL': 'XXL', 'XXXL': '3XL', 'XXXXL': '4XL',
+    'SMALL': 'S', 'MEDIUM': 'M', 'LARGE': 'L',
+    'X-SMALL': 'XS', 'XSMALL': 'XS', 'EXTRA SMALL': 'XS',
+    'X-LARGE': 'XL', 'XLARGE': 'XL', 'EXTRA LARGE': 'XL'
+}
+
+# Color words; multi-word names ("Light Army") match word by word
+COLOR_VOCABULARY = (
+    'black', 'white', 'grey', 'red', 'blue', 'navy', 'green', 'pink', 'purple', 'brown', 'orange',
+    'yellow', 'teal', 'olive', 'charcoal', 'beige', 'cream', 'sail', 'tan', 'khaki', 'burgundy',
+    'maroon', 'silver', 'gold', 'ivory', 'lilac', 'mauve', 'coral', 'mint', 'anthracite', 'heather'
+)
+COLOR_ALIASES = {'gray': 'grey'}
+
+# Bits are vocabulary positions, so neither vocabulary may outgrow a uint64 mask
+for _name, _vocabulary in (('SIZE_VOCABULARY', SIZE_VOCABULARY), ('COLOR_VOCABULARY', COLOR_VOCABULARY)):
+    if len(_vocabulary) > 64:
+        raise ValueError(f"{_name} has {len(_vocabulary)} entries; a uint64 mask holds at most 64")
+
+SIZE_BITS = {size: np.uint64(1) << np.uint64(bit) for bit, size in enumerate(SIZE_VOCABULARY)}
+COLOR_BITS = {color: np.uint64(1) << np.uint64(bit) for bit, color in enumerate(COLOR_VOCABULARY)}
+
+# Size ranges in parentheses ("(0–2)", "(A-C)") qualify the size before them
+SIZE_RANGE = re.compile(r'\([^)]*\)')
+WORD = re.compile(r'[a-z0-9]+')
+
+
+def size_tokens(text: str) -> Set[str]:
+    tokens: List[str] = []
+    for token in SIZE_RANGE.sub(' ', text.upper()).split():
+        if token == 'TALL' and tokens:
+            # "M Tall" is its own size, not M plus a Tall flag
+            tokens[-1] += ' TALL'
+        else:
+            tokens.append(SIZE_ALIASES.get(token, token))
+    return set(tokens)
+
+
+def color_tokens(text: str) -> Set[str]:
+    words = WORD.findall(text.lower())
+    return {COLOR_ALIASES.get(word, word) for word in words}
+
+
+def _mask(tokens: Iterable[str], bits: Dict[str, np.uint64]) -> np.uint64:
+    mask = np.uint64(0)
+    for token in tokens:
+        mask |= bits.get(token, np.uint64(0))
+    return mask
+
+
+def _masks(values: Optional[pd.Series], size: int, parse, bits: Dict[str, np.uint64]) -> np.ndarray:
+    if values is None:
+        return np.zeros(size, dtype=np.uint64)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Already dictionary-encoded (ingested or compiled catalogs): parse the categories
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values.to_numpy(dtype=object))
+    distinct = np.array([_mask(parse(str(value)), bits) for value in uniques] + [np.uint64(0)], dtype=np.uint64)
+    # Missing values (code -1) take the trailing empty mask
+    return distinct[codes]
+
+
+def size_masks(values: Optional[pd.Series], size: int) -> np.ndarray:
+    """Per-row SIZE_VOCABULARY bitmask of a Sizes column"""
+    return _masks(values, size, size_tokens, SIZE_BITS)
+
+
+def color_masks(values: Optional[pd.Series], size: int) -> np.ndarray:
+    """Per-row COLOR_VOCABULARY bitmask of a Colors or Colors Available column"""
+    return _masks(values, size, color_tokens, COLOR_BITS)
+
+
+def size_query(term: str) -> Optional[np.uint64]:
+    """Bits of the one size a user term names ('s', 'small', '2xl', 'm tall'; 'tall' is any Tall fit),
+    or None when the term is not a vocabulary size"""
+    term = ' '.join(term.upper().split())
+    if term == 'TALL':
+        return _mask(TALL_SIZES, SIZE_BITS)
+    tokens = {SIZE_ALIASES[term]} if term in SIZE_ALIASES else size_tokens(term)
+    if len(tokens) != 1 or any(token not in SIZE_BITS for token in tokens):
+        return None
+    return _mask(tokens, SIZE_BITS)
+
+
+def color_query(term: str) -> Optional[np.uint64]:
+    """Bits of a user color term ('red', 'heather grey'), all of which a row needs,
+    or None when a word is outside the vocabulary"""
+    tokens = color_tokens(term)
+    if not tokens or any(token not in COLOR_BITS for token in tokens):
+        return None
+    return _mask(tokens, COLOR_BITS)
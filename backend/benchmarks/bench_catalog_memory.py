@@ -0,0 +1,69 @@
+"""Catalog memory per product: object-string frame versus the encoded frame plus compact store.
+
+    python benchmarks/bench_catalog_memory.py ./data/nike1.csv --scale 20
+
+"Before" is the frame read_csv builds (one Python string per cell) after
+normalization; "after" is what ingest_catalog keeps: categorical codes and
+distinct values in the frame, URLs over a shared prefix table and
+descriptions as UTF-8 buffers. The catalog is repeated ``--scale`` times
+with a copy number added to ProductIDs and URLs, so those stay unique per
+row as in a real catalog while descriptions repeat across copies as they do
+across color variants. Index postings are not counted (both sides build the
+same ones).
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def scaled_csv(csv_path, scale, target):
+    import pandas as pd
+    df = pd.read_csv(csv_path, dtype=str)
+    copies = []
+    for copy in range(scale):
+        part = df.copy()
+        if copy:
+            part['ProductID'] = part['ProductID'] + f"-{copy}"
+            for column in ('Image Url', 'Product page url'):
+                part[column] = part[column] + f"?copy={copy}"
+        copies.append(part)
+    pd.concat(copies, ignore_index=True).to_csv(target, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv_path', nargs='?', default='./data/nike1.csv')
+    parser.add_argument('--scale', type=int, default=1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    logging.disable(logging.CRITICAL)
+    import pandas as pd
+    from catalog import load_catalog
+    from ingest import ingest_catalog
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'catalog.csv')
+        scaled_csv(args.csv_path, args.scale, path)
+        before, _ = load_catalog(path)
+        after, _, index = ingest_catalog(path)
+
+    rows = len(before)
+    before_bytes = before.memory_usage(index=False, deep=True)
+    after_bytes = after.memory_usage(index=False, deep=True)
+    after_bytes = pd.concat([after_bytes, pd.Series({column: values.nbytes for column, values in index.compact.items()})])
+    print(f"{rows} products\n")
+    print(f"{'column':<24}{'before B':>10}{'after B':>10}{'where':>10}")
+    for column in before.columns:
+        where = 'compact' if column in index.compact else 'frame'
+        print(f"{column:<24}{before_bytes[column] / rows:>10.1f}{after_bytes.get(column, 0) / rows:>10.1f}{where:>10}")
+    print(f"{'total':<24}{before_bytes.sum() / rows:>10.1f}{after_bytes.sum() / rows:>10.1f}")
+    print(f"\n{before_bytes.sum() / after_bytes.sum():.1f}x smaller")
+
+
+if __name__ == '__main__':
+    main()
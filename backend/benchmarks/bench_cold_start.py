@@ -0,0 +1,86 @@
+"""Cold-start time and memory: parsing the CSV versus mapping a compiled artifact.
+
+    python benchmarks/bench_cold_start.py ./data/nike1.csv --runs 5
+
+Each measurement runs in a fresh interpreter that builds a CatalogSnapshot
+the way the MCP server does at startup and serves one filter query. RSS is
+read from /proc, split into anonymous (private) and file-backed (page cache,
+shareable between processes) pages, so Linux only.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CHILD = r'''
+import json, logging, sys, time
+logging.disable(logging.CRITICAL)
+
+def memory():
+    fields = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'RssAnon', 'RssFile'):
+                fields[key] = int(value.split()[0]) / 1024
+    return fields
+
+import numpy, pandas
+baseline = memory()
+start = time.perf_counter()
+from catalog_manager import CatalogManager
+snapshot = CatalogManager(sys.argv[1]).current()
+loaded = time.perf_counter() - start
+rows = snapshot.index.match(gender='women', category='hoodie')
+rows = snapshot.index.top_k_by_price(rows, 'asc', 20)
+snapshot.serializer.products(snapshot.serializer.unique_rows(rows))
+first_query = time.perf_counter() - start
+after = memory()
+print(json.dumps({
+    'load_s': loaded,
+    'first_query_s': first_query,
+    'rss_mb': after['VmRSS'] - baseline['VmRSS'],
+    'anon_mb': after['RssAnon'] - baseline['RssAnon'],
+    'file_mb': after['RssFile'] - baseline['RssFile'],
+}))
+'''
+
+
+def measure(path: str, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-c', CHILD, path], cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+        ).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv_path', nargs='?', default='./data/nike1.csv')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    from compile_catalog import compile_catalog
+
+    csv_path = os.path.abspath(args.csv_path)
+    with tempfile.TemporaryDirectory() as tmp:
+        artifact = os.path.join(tmp, 'catalog')
+        compile_catalog(csv_path, artifact)
+        results = {'csv': measure(csv_path, args.runs), 'artifact': measure(artifact, args.runs)}
+
+    print(f"{'source':<10}{'load ms':>10}{'1st query ms':>14}{'RSS MB':>9}{'anon MB':>9}{'file MB':>9}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['load_s'] * 1000:>10.1f}{r['first_query_s'] * 1000:>14.1f}"
+              f"{r['rss_mb']:>9.1f}{r['anon_mb']:>9.1f}{r['file_mb']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""filter_products search_term: per-word regex scans versus the token inverted index.
+
+    python benchmarks/bench_text_search.py ./data/nike1.csv --runs 20
+
+The regex path is the implementation the index replaced: one OR regex over
+the title and description columns, one more full scan per word for AND
+matching and a third "similar items" scan when nothing matched. Both run on
+the whole catalog (no other filters) with a cold and a warm term cache;
+the row counts show where stemming ("hoodies" -> "hoodie") widens a match.
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+QUERIES = [
+    'hoodie', 'fleece', 'women hoodie', 'men running shorts', 'oversized crew sweatshirt', 'hoodies',
+    'womens fleece pants', 'pink cropped top', 'waterproof jacket', 'lightweight breathable running top'
+]
+
+REGEX_VARIATIONS = {
+    'women': ['women', 'woman', 'female'],
+    'men': ['men', 'man', 'male'],
+    'hoodie': ['hoodie', 'hoody', 'hood', 'sweatshirt'],
+    'hoody': ['hoodie', 'hoody', 'hood', 'sweatshirt'],
+    'pant': ['pant', 'pants', 'trouser', 'trousers'],
+    'pants': ['pant', 'pants', 'trouser', 'trousers'],
+    'shirt': ['shirt', 'shirts', 'top', 'tops'],
+    'shirts': ['shirt', 'shirts', 'top', 'tops']
+}
+
+
+def regex_search(df, words):
+    """The replaced search_term path: up to N + 2 regex scans over both text columns"""
+    search_cols = ['Category.1', 'Detailed description']
+    patterns = [word for w in words for word in [w] + REGEX_VARIATIONS.get(w, [])]
+    mask = df[search_cols].apply(lambda x: x.str.contains('|'.join(set(patterns)), case=False, na=False, regex=True)).any(axis=1)
+    if len(words) > 1:
+        word_masks = [
+            df[search_cols].apply(
+                lambda x: x.str.contains('|'.join([w] + REGEX_VARIATIONS.get(w, [])), case=False, na=False, regex=True)
+            ).any(axis=1)
+            for w in words
+        ]
+        mask = word_masks[0]
+        for word_mask in word_masks[1:]:
+            mask = mask & word_mask
+        if mask.sum() == 0 and not any(w in words for w in ['women', 'men', 'woman', 'man']):
+            similar = df[search_cols].apply(lambda x: x.str.contains('|'.join(words), case=False, na=False, regex=True)).any(axis=1)
+            if similar.sum() > 0:
+                mask = similar
+    return df.index[mask].to_numpy()
+
+
+def index_search(index, words):
+    """The posting-list path _filter_rows uses now"""
+    from catalog import intersect
+    matched = intersect([index.all_rows] + [index.search_word(w) for w in words])
+    if len(matched) == 0 and len(words) > 1 and not any(w in words for w in ['women', 'men', 'woman', 'man']):
+        similar = index.contains('text', '|'.join(words))
+        if len(similar) > 0:
+            matched = similar
+    return matched
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv_path', nargs='?', default='./data/nike1.csv')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    logging.disable(logging.CRITICAL)
+    from catalog import CatalogIndex, load_catalog
+
+    df, _ = load_catalog(args.csv_path)
+    index = CatalogIndex(df)
+    print(f"{len(df)} products, {len(index.postings['text'])} text tokens\n")
+    print(f"{'search_term':<36}{'regex ms':>10}{'cold ms':>9}{'warm ms':>9}{'regex rows':>12}{'index rows':>12}")
+    totals = [0.0, 0.0, 0.0]
+    for query in QUERIES:
+        words = [word for word in query.lower().split() if len(word) > 2]
+        regex_s, regex_rows = timed(lambda: regex_search(df, words), args.runs)
+        index._term_cache.clear()
+        start = time.perf_counter()
+        index_search(index, words)
+        cold_s = time.perf_counter() - start
+        warm_s, index_rows = timed(lambda: index_search(index, words), args.runs)
+        for i, value in enumerate((regex_s, cold_s, warm_s)):
+            totals[i] += value
+        print(f"{query:<36}{regex_s * 1000:>10.2f}{cold_s * 1000:>9.2f}{warm_s * 1000:>9.3f}"
+              f"{len(regex_rows):>12}{len(index_rows):>12}")
+    print(f"{'total':<36}{totals[0] * 1000:>10.2f}{totals[1] * 1000:>9.2f}{totals[2] * 1000:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""find_similar_products: exhaustive BLAS scan versus the IVF index, latency and recall.
+
+    python benchmarks/bench_vector_search.py ./data/nike1.csv --scale 20 --queries 200
+
+The catalog is repeated ``--scale`` times to stand in for a larger one. Queries are
+the vectors of randomly chosen products. Recall@k is the share of the IVF
+results scoring at least the exact k-th neighbour's cosine, so duplicated
+rows (identical vectors) count as hits whichever copy is returned.
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv_path', nargs='?', default='./data/nike1.csv')
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--probes', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    logging.disable(logging.CRITICAL)
+    import numpy as np
+    import pandas as pd
+    from catalog import load_catalog
+    from embeddings import EmbeddingIndex, build_embeddings
+
+    df, _ = load_catalog(args.csv_path)
+    df = pd.concat([df] * args.scale, ignore_index=True)
+    build_s, arrays = timed(lambda: build_embeddings(df, ivf=True))
+    index = EmbeddingIndex(arrays)
+    cells = len(index.centroids)
+    print(f"{len(df)} products, {index.vectors.shape[1]} dimensions, {cells} IVF cells, built in {build_s:.2f}s\n")
+
+    queries = np.random.default_rng(1).choice(len(df), min(args.queries, len(df)), replace=False)
+    exact, thresholds = [], {}
+    for row in queries:
+        elapsed, (_, scores) = timed(lambda: index.search(index.vectors[row], args.k, exclude=row, exact=True))
+        exact.append(elapsed)
+        thresholds[row] = scores[-1]
+    print(f"{'search':<16}{'median ms':>11}{'p95 ms':>9}{'recall@' + str(args.k):>11}")
+    print(f"{'exact (BLAS)':<16}{statistics.median(exact) * 1000:>11.3f}"
+          f"{np.percentile(exact, 95) * 1000:>9.3f}{1.0:>11.3f}")
+    for probes in args.probes:
+        samples, hits = [], 0
+        for row in queries:
+            elapsed, (_, scores) = timed(lambda: index.search(index.vectors[row], args.k, exclude=row, probes=probes))
+            samples.append(elapsed)
+            # Tolerance for float32 rounding between the gathered and full products
+            hits += int(np.sum(scores >= thresholds[row] - 1e-5))
+        label = f"ivf probes={min(probes, cells)}"
+        print(f"{label:<16}{statistics.median(samples) * 1000:>11.3f}"
+              f"{np.percentile(samples, 95) * 1000:>9.3f}{hits / (len(queries) * args.k):>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
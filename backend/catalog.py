@@ -0,0 +1,452 @@
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+import re
+import numpy as np
+import pandas as pd
+from attributes import color_masks, color_query, size_masks, size_query
+from compact import CompactColumn, column_values
+from spelling import stem
+
+logger = logging.getLogger(__name__)
+
+# Map common category terms to search patterns
+CATEGORY_PATTERNS = {
+    'hoodie': 'hoodie|sweatshirt',
+    'pants': 'pants|trousers|sweatpants',
+    'shirt': 'shirt|top|blouse',
+    'sweatshirt': 'sweatshirt|hoodie',
+    'jacket': 'jacket|coat|blazer',
+    'top': 'top|shirt|blouse'
+}
+
+# User-facing gender terms mapped to the exact values in the Gender column
+GENDER_VALUES = {
+    'men': 'Men',
+    'male': 'Men',
+    'women': 'Women',
+    'female': 'Women'
+}
+
+# Columns with an inverted token index, keyed by the filter that reads them;
+# a field over several columns indexes their text joined with spaces
+TOKEN_COLUMNS = {
+    'category': ('Category.1',),
+    'name': ('Category',),
+    'color': ('Colors',),
+    'size': ('Sizes',),
+    'text': ('Category.1', 'Detailed description')
+}
+
+# search_term words (stemmed) matched together with their common variations
+SEARCH_SYNONYMS = {
+    'women': ('women', 'woman', 'female'),
+    'men': ('men', 'man', 'male'),
+    'man': ('man', 'men', 'male'),
+    'hoodie': ('hoodie', 'hoody', 'hood', 'sweatshirt'),
+    'hoody': ('hoody', 'hoodie', 'hood', 'sweatshirt'),
+    'pant': ('pant', 'trouser'),
+    'shirt': ('shirt', 'top')
+}
+
+EMPTY_ROWS = np.empty(0, dtype=np.int64)
+
+# Top-k by price walks the presorted permutation when the candidate rows cover
+# at least this fraction of the catalog; sparser candidates use argpartition
+PRICE_WALK_MIN_COVERAGE = 0.25
+
+# Resolved (field, term) postings kept per index; the least recently used are evicted
+TERM_CACHE_SIZE = 4096
+
+# Substrings up to this length index the tokens containing them; longer terms
+# intersect the token lists of their grams and confirm the few candidates
+GRAM_LENGTH = 3
+
+
+# Typed columns added by normalize_catalog, keyed by the raw CSV column they parse
+PRICE_COLUMNS = {
+    'price': 'Current Price',
+    'original_price': 'Original Price'
+}
+
+# How many offending values / ProductIDs the load report keeps per column
+REPORT_SAMPLE_SIZE = 10
+
+
+def parse_price(prices: pd.Series) -> pd.Series:
+    """Convert price strings like '$70.00' to floats (NaN when unparseable)"""
+    cleaned = prices.astype('string').str.replace(r'[$,\s]', '', regex=True)
+    return pd.to_numeric(cleaned, errors='coerce').astype('float64')
+
+
+def parse_percent(offers: pd.Series) -> pd.Series:
+    """Convert offer strings like '23% off' to floats (NaN when unparseable)"""
+    numbers = offers.astype('string').str.extract(r'(\d+(?:\.\d+)?)\s*%', expand=False)
+    return pd.to_numeric(numbers, errors='coerce').astype('float64')
+
+
+def _raw_column(df: pd.DataFrame, column: str) -> pd.Series:
+    if column in df.columns:
+        return df[column].astype('string')
+    return pd.Series(pd.NA, index=df.index, dtype='string')
+
+
+def _unparsed(df: pd.DataFrame, raw: pd.Series, parsed: pd.Series) -> Dict[str, Any]:
+    """Describe the rows that had a value in ``raw`` which did not parse"""
+    failed = (raw.str.strip().fillna('') != '') & parsed.isna()
+    product_ids = _raw_column(df, 'ProductID')[failed]
+    return {
+        'count': int(failed.sum()),
+        'values': {str(value): int(count) for value, count in raw[failed].value_counts().head(REPORT_SAMPLE_SIZE).items()},
+        'product_ids': product_ids.head(REPORT_SAMPLE_SIZE).fillna('').tolist()
+    }
+
+
+def normalize_catalog(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Add typed ``price``, ``original_price``, ``offer_pct`` and ``price_available`` columns.
+
+    Returns the normalized frame and a report of the rows whose raw values
+    could not be parsed (e.g. 'See Price in Bag'), so they no longer
+    disappear silently from price filters.
+    """
+    df = df.reset_index(drop=True)
+    report = {'rows': len(df), 'unparsed': {}}
+
+    for target, source in PRICE_COLUMNS.items():
+        raw = _raw_column(df, source)
+        df[target] = parse_price(raw)
+        report['unparsed'][source] = _unparsed(df, raw, df[target])
+
+    raw_offer = _raw_column(df, 'Offer %')
+    df['offer_pct'] = parse_percent(raw_offer)
+    report['unparsed']['Offer %'] = _unparsed(df, raw_offer, df['offer_pct'])
+
+    df['price_available'] = df['price'].notna()
+    report['priced_rows'] = int(df['price_available'].sum())
+    return df, report
+
+
+def load_catalog(path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Read the catalog CSV and run the normalization stage"""
+    df, report = normalize_catalog(pd.read_csv(path))
+    report['path'] = path
+    for column, failures in report['unparsed'].items():
+        if failures['count']:
+            logger.warning(f"{failures['count']} rows with unparseable '{column}': {failures['values']}")
+    return df, report
+
+
+def field_values(df: pd.DataFrame, field: str, compact: Optional[Dict[str, CompactColumn]] = None,
+                 rows: Optional[np.ndarray] = None) -> Optional[pd.Series]:
+    """The text a token field indexes (at ``rows``, default all), or None when the catalog has none of its columns"""
+    columns = [values for values in (column_values(df, compact, column, rows) for column in TOKEN_COLUMNS[field])
+               if values is not None]
+    if not columns:
+        return None
+    values = columns[0]
+    for other in columns[1:]:
+        values = values.fillna('') + ' ' + other.fillna('')
+    return values
+
+
+def _build_postings(values: pd.Series) -> Dict[str, np.ndarray]:
+    """Map each lowercased whitespace token to the sorted row positions containing it"""
+    tokens = values.astype('string').str.lower().str.split().explode().dropna()
+    pairs = pd.DataFrame({'token': tokens.to_numpy(dtype=object), 'row': tokens.index.to_numpy()}).drop_duplicates()
+    rows = pairs['row'].to_numpy(dtype=np.int64)
+    return {token: rows[positions] for token, positions in pairs.groupby('token', sort=False).indices.items()}
+
+
+def _build_grams(tokens: List[str]) -> Dict[str, np.ndarray]:
+    """Map every substring of up to GRAM_LENGTH characters to the sorted positions of the tokens containing it"""
+    grams: Dict[str, List[int]] = {}
+    for position, token in enumerate(tokens):
+        for gram in {token[start:start + length] for length in range(1, GRAM_LENGTH + 1)
+                     for start in range(len(token) - length + 1)}:
+            grams.setdefault(gram, []).append(position)
+    return {gram: np.array(positions, dtype=np.int64) for gram, positions in grams.items()}
+
+
+def _union(row_lists: List[np.ndarray]) -> np.ndarray:
+    if not row_lists:
+        return EMPTY_ROWS
+    if len(row_lists) == 1:
+        return row_lists[0]
+    return np.unique(np.concatenate(row_lists))
+
+
+def intersect(row_lists: Iterable[np.ndarray]) -> np.ndarray:
+    """Intersect sorted row lists, smallest first so the work shrinks early"""
+    ordered = sorted(row_lists, key=len)
+    if not ordered:
+        return EMPTY_ROWS
+    result = ordered[0]
+    for rows in ordered[1:]:
+        if len(result) == 0:
+            break
+        result = np.intersect1d(result, rows, assume_unique=True)
+    return result
+
+
+class CatalogIndex:
+    """Columnar index over the catalog, built once at load time.
+
+    Every filterable text column keeps an inverted list (sorted row positions)
+    per lowercased token. A substring filter is answered by finding the tokens
+    that contain the term through an n-gram index over the token vocabulary,
+    and unioning their postings. Because tokens are
+    split on whitespace, this gives the same rows as a case-insensitive
+    ``str.contains`` for any term without spaces; multi-word terms intersect
+    their words' postings and then confirm the phrase on those rows only.
+
+    Sizes and colors are also parsed into per-row bitmasks (see attributes.py)
+    so their filters test exact tokens instead of substrings.
+    """
+
+    def __init__(self, df: pd.DataFrame, postings: Dict[str, Dict[str, np.ndarray]] = None,
+                 price_order: Dict[str, np.ndarray] = None, compact: Optional[Dict[str, CompactColumn]] = None):
+        """Build the index from ``df``, or adopt ``postings``/``price_order`` precomputed by catalog_store.
+
+        ``compact`` holds the columns stored outside the frame (see compact.py).
+        """
+        self.df = df
+        self.compact = compact or {}
+        self.size = len(df)
+        self.all_rows = np.arange(self.size, dtype=np.int64)
+        self.gender = pd.Categorical(df['Gender']) if 'Gender' in df.columns else pd.Categorical([])
+        self.price = df['price'].to_numpy(dtype=np.float64) if 'price' in df.columns else np.full(self.size, np.nan)
+        self.postings = dict(postings) if postings is not None else {}
+        for field in TOKEN_COLUMNS:
+            if field not in self.postings:
+                # Also fills fields missing from artifacts compiled before they existed
+                values = field_values(df, field, self.compact)
+                self.postings[field] = _build_postings(values) if values is not None else {}
+        # Presorted price permutations (stable, unpriced rows last) for top-k walks
+        self.price_order = price_order if price_order is not None else {
+            'asc': np.argsort(self.price, kind='stable'),
+            'desc': np.argsort(-self.price, kind='stable')
+        }
+        # Rows without a shown color fall back to the colors they are offered in
+        shown = df['Colors'].notna().to_numpy() if 'Colors' in df.columns else np.zeros(self.size, dtype=bool)
+        self.attribute_masks = {
+            'size': size_masks(df.get('Sizes'), self.size),
+            'color': np.where(shown, color_masks(df.get('Colors'), self.size),
+                              color_masks(df.get('Colors Available'), self.size))
+        }
+        self._gender_rows = {
+            value: np.flatnonzero(self.gender.codes == code)
+            for code, value in enumerate(self.gender.categories)
+        }
+        self._term_cache: OrderedDict = OrderedDict()
+        # Per field: its tokens and their n-gram index, built on the field's first substring lookup
+        self._vocabulary: Dict[str, Tuple[List[str], Dict[str, np.ndarray]]] = {}
+        self._product_rows: Optional[pd.Series] = None
+        logger.info(
+            f"Built catalog index over {self.size} rows: "
+            + ", ".join(f"{len(tokens)} {field} tokens" for field, tokens in self.postings.items())
+        )
+
+    def gender_rows(self, gender: str) -> Optional[np.ndarray]:
+        """Rows for a user gender term, or None when the term is not a known gender"""
+        value = GENDER_VALUES.get(gender.lower())
+        if value is None:
+            return None
+        return self._gender_rows.get(value, EMPTY_ROWS)
+
+    def _cached_rows(self, key: tuple) -> Optional[np.ndarray]:
+        rows = self._term_cache.get(key)
+        if rows is not None:
+            self._term_cache.move_to_end(key)
+        return rows
+
+    def _cache_rows(self, key: tuple, rows: np.ndarray):
+        self._term_cache[key] = rows
+        self._term_cache.move_to_end(key)
+        while len(self._term_cache) > TERM_CACHE_SIZE:
+            self._term_cache.popitem(last=False)
+
+    def _word_rows(self, field: str, word: str) -> np.ndarray:
+        """Union of the postings of the ``field`` tokens containing ``word``"""
+        vocabulary = self._vocabulary.get(field)
+        if vocabulary is None:
+            tokens = list(self.postings[field])
+            vocabulary = self._vocabulary[field] = (tokens, _build_grams(tokens))
+        tokens, grams = vocabulary
+        if len(word) <= GRAM_LENGTH:
+            positions = grams.get(word, EMPTY_ROWS)
+        else:
+            positions = intersect(grams.get(word[start:start + GRAM_LENGTH], EMPTY_ROWS)
+                                  for start in range(len(word) - GRAM_LENGTH + 1))
+            positions = [position for position in positions if word in tokens[position]]
+        postings = self.postings[field]
+        return _union([postings[tokens[position]] for position in positions])
+
+    def _term_rows(self, field: str, term: str) -> np.ndarray:
+        key = (field, term)
+        cached = self._cached_rows(key)
+        if cached is not None:
+            return cached
+
+        words = term.split()
+        if len(words) == 1:
+            rows = self._word_rows(field, term)
+        else:
+            candidates = intersect(self._word_rows(field, word) for word in words)
+            column = field_values(self.df, field, self.compact, candidates)
+            rows = candidates[column.str.contains(term, case=False, regex=False, na=False).to_numpy()]
+
+        self._cache_rows(key, rows)
+        return rows
+
+    def contains(self, field: str, pattern: str) -> np.ndarray:
+        """Rows whose ``field`` column contains any ``|``-separated term, case-insensitively"""
+        terms = [term.strip().lower() for term in pattern.split('|') if term.strip()]
+        return _union([self._term_rows(field, term) for term in terms])
+
+    def _attribute_rows(self, field: str, term: str) -> np.ndarray:
+        key = ('=' + field, term)
+        cached = self._cached_rows(key)
+        if cached is not None:
+            return cached
+
+        bits = size_query(term) if field == 'size' else color_query(term)
+        if bits is not None:
+            masks = self.attribute_masks[field] & bits
+            # A size term names one size (any of its bits); a color term needs all its words
+            rows = np.flatnonzero(masks != 0 if field == 'size' else masks == bits)
+        else:
+            # Outside the vocabulary: substring candidates, kept where the term stands as whole words
+            candidates = self._term_rows(field, term)
+            column = field_values(self.df, field, self.compact, candidates)
+            pattern = rf'(?<![a-z0-9]){re.escape(term)}(?![a-z0-9])'
+            rows = candidates[column.str.contains(pattern, case=False, regex=True, na=False).to_numpy()]
+
+        self._cache_rows(key, rows)
+        return rows
+
+    def attribute(self, field: str, pattern: str) -> np.ndarray:
+        """Rows whose parsed ``field`` ('size' or 'color') holds any ``|``-separated term as an exact token.
+
+        Size terms name one size ('xl', 'm tall'); a multi-word color needs all its words ('heather grey').
+        """
+        terms = [term.strip().lower() for term in pattern.split('|') if term.strip()]
+        return _union([self._attribute_rows(field, term) for term in terms])
+
+    def search_word(self, word: str) -> np.ndarray:
+        """Rows whose title or description contains ``word``'s stem or one of its synonyms"""
+        root = stem(word)
+        terms = SEARCH_SYNONYMS.get(root) or SEARCH_SYNONYMS.get(word) or (root,)
+        return self.contains('text', '|'.join(terms))
+
+    def product_row(self, product_id: str) -> Optional[int]:
+        """Row of the first product with ``product_id``, or None"""
+        if self._product_rows is None:
+            ids = column_values(self.df, self.compact, 'ProductID')
+            ids = ids if ids is not None else pd.Series([], dtype='string')
+            first = ~ids.duplicated().to_numpy()
+            self._product_rows = pd.Series(np.flatnonzero(first), index=pd.Index(ids.to_numpy()[first]))
+        row = self._product_rows.get(product_id)
+        return None if row is None else int(row)
+
+    def price_range(self, rows: np.ndarray, min_price: float = None, max_price: float = None) -> np.ndarray:
+        """Keep the rows whose parsed price falls inside the given bounds"""
+        prices = self.price[rows]
+        keep = np.ones(len(rows), dtype=bool)
+        if min_price is not None:
+            keep &= prices >= min_price
+        if max_price is not None:
+            keep &= prices <= max_price
+        return rows[keep]
+
+    def sort_by_price(self, rows: np.ndarray, direction: str) -> np.ndarray:
+        """Order rows by price ('asc' or 'desc'), unpriced rows last"""
+        prices = self.price[rows]
+        if direction == 'asc':
+            return rows[np.argsort(prices, kind='stable')]
+        if direction == 'desc':
+            return rows[np.argsort(-prices, kind='stable')]
+        return rows
+
+    def _walk_price_order(self, rows: np.ndarray, direction: str, k: int) -> np.ndarray:
+        """First ``k`` of ``rows`` along the presorted permutation, tested against a membership mask"""
+        order = self.price_order[direction]
+        if len(rows) == self.size:
+            return order[:k]
+        member = np.zeros(self.size, dtype=bool)
+        member[rows] = True
+        picked, found, start, step = [], 0, 0, max(4 * k, 256)
+        while found < k and start < self.size:
+            chunk = order[start:start + step]
+            hits = chunk[member[chunk]]
+            picked.append(hits)
+            found += len(hits)
+            start += step
+            step *= 2
+        return np.concatenate(picked)[:k]
+
+    def top_k_by_price(self, rows: np.ndarray, direction: str, k: int) -> np.ndarray:
+        """The first ``k`` rows of ``sort_by_price(rows, direction)`` without sorting them all.
+
+        Dense candidate sets walk the presorted permutation, costing about
+        O(k * catalog / candidates); sparse ones use a partial selection,
+        O(candidates + k log k). Ties keep catalog order either way.
+        """
+        if direction not in self.price_order:
+            return rows[:k]
+        if k <= 0:
+            return EMPTY_ROWS
+        if k >= len(rows):
+            return self.sort_by_price(rows, direction)
+        if len(rows) >= PRICE_WALK_MIN_COVERAGE * self.size:
+            return self._walk_price_order(rows, direction, k)
+
+        keys = self.price[rows] if direction == 'asc' else -self.price[rows]
+        kth = np.partition(keys, k - 1)[k - 1]
+        if np.isnan(kth):
+            # Fewer than k priced rows: all priced rows, then unpriced ones in catalog order
+            priced = ~np.isnan(keys)
+            head = rows[priced][np.argsort(keys[priced], kind='stable')]
+            return np.concatenate([head, rows[~priced][:k - len(head)]])
+        take = keys < kth
+        ties = np.flatnonzero(keys == kth)[:k - int(take.sum())]
+        take[ties] = True
+        chosen = rows[take]
+        return chosen[np.argsort(keys[take], kind='stable')]
+
+    def match(self, gender: str = None, category: str = None, color: str = None, size: str = None,
+              min_price: float = None, max_price: float = None, within: np.ndarray = None) -> np.ndarray:
+        """Row positions matching every given filter, in catalog order.
+
+        ``within`` restricts the result to sorted rows already matched by
+        other filters, such as a gender and budget shared by several queries.
+        """
+        row_lists = [] if within is None else [within]
+
+        if gender:
+            gender_rows = self.gender_rows(gender)
+            if gender_rows is not None:
+                logger.info(f"Gender filter '{gender}': {len(gender_rows)} matches")
+                row_lists.append(gender_rows)
+
+        if category:
+            category_rows = self.contains('category', CATEGORY_PATTERNS.get(category.lower(), category.lower()))
+            logger.info(f"Category filter '{category}': {len(category_rows)} matches")
+            row_lists.append(category_rows)
+
+        if color:
+            color_rows = self.attribute('color', color)
+            logger.info(f"Color filter '{color}': {len(color_rows)} matches")
+            row_lists.append(color_rows)
+
+        if size:
+            size_rows = self.attribute('size', size)
+            logger.info(f"Size filter '{size}': {len(size_rows)} matches")
+            row_lists.append(size_rows)
+
+        rows = intersect(row_lists) if row_lists else self.all_rows
+
+        if (min_price is not None or max_price is not None) and len(rows) > 0:
+            rows = self.price_range(rows, min_price, max_price)
+            logger.info(f"Price filter ${min_price}-${max_price}: {len(rows)} matches")
+
+        return rows
@@ -0,0 +1,196 @@
+from functools import cached_property
+from typing import Any, Dict, Optional
+import hashlib
+import logging
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from catalog import CatalogIndex, normalize_catalog
+from catalog_store import MANIFEST_NAME, is_artifact, load_artifact, read_manifest
+from compact import column_values
+from embeddings import EmbeddingIndex, build_embeddings
+from ingest import ingest_catalog
+from recommendations import RecommendationTable
+from relevance import RelevanceIndex
+from serializer import ProductSerializer
+from spelling import SpellingIndex, vocabulary_from_texts
+
+logger = logging.getLogger(__name__)
+
+# Text columns whose words make up the typo-correction vocabulary
+VOCABULARY_COLUMNS = ('Category', 'Category.1', 'Detailed description', 'Colors')
+
+
+def file_version(path: str) -> str:
+    """Short content hash of the catalog file, identical on every replica serving it"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def catalog_version(path: str) -> str:
+    """Version of a CSV file, or the version recorded in a compiled artifact's manifest"""
+    if is_artifact(path):
+        return read_manifest(path)['version']
+    return file_version(path)
+
+
+def _file_signature(path: str) -> Optional[tuple]:
+    if is_artifact(path):
+        path = os.path.join(path, MANIFEST_NAME)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class CatalogSnapshot:
+    """An immutable, fully built catalog: the frame plus everything derived from it.
+
+    Tool calls grab one snapshot at the start and use only it, so a reload
+    swapping in a new snapshot never changes data under an in-flight call.
+    """
+
+    def __init__(self, df: pd.DataFrame, report: Dict[str, Any], version: Optional[str],
+                 index: Optional[CatalogIndex] = None, derived: Optional[Dict[str, np.ndarray]] = None):
+        self.df = df
+        self.report = report
+        self.version = version
+        self.loaded_at = time.time()
+        self.index = index if index is not None else CatalogIndex(df)
+        self.serializer = ProductSerializer(df, self.index.compact)
+        # Arrays precomputed by compile_catalog.py; anything missing is built on first use
+        self.derived = derived or {}
+
+    @property
+    def empty(self) -> bool:
+        return self.df.empty
+
+    @cached_property
+    def spelling(self) -> SpellingIndex:
+        """Typo lookup over the catalog's words, built on first use"""
+        columns = (column_values(self.df, self.index.compact, column) for column in VOCABULARY_COLUMNS)
+        vocabulary = vocabulary_from_texts(
+            text for values in columns if values is not None for text in values.dropna().astype(str)
+        )
+        logger.info(f"Built spelling index over {len(vocabulary)} words")
+        return SpellingIndex(vocabulary)
+
+    @cached_property
+    def relevance(self) -> RelevanceIndex:
+        """BM25 term scores for relevance-ranked results, built on first use"""
+        return RelevanceIndex(self.df, self.index)
+
+    @cached_property
+    def recommendations(self) -> RecommendationTable:
+        """Complementary products per ProductID, precomputed in the artifact or built on first use"""
+        return RecommendationTable(self.df, self.index, self.derived.get('recommendations'))
+
+    @cached_property
+    def embeddings(self) -> EmbeddingIndex:
+        """Product vectors for similarity search, mapped from the artifact or built on first use"""
+        arrays = {name[len('embeddings.'):]: array for name, array in self.derived.items() if name.startswith('embeddings.')}
+        return EmbeddingIndex(arrays or build_embeddings(self.df, compact=self.index.compact))
+
+
+class CatalogManager:
+    """Owns the current catalog snapshot and rebuilds it when the CSV changes.
+
+    ``path`` is either the CSV or an artifact directory produced by
+    ``compile_catalog.py``, which is memory-mapped instead of parsed.
+
+    Readers call ``current()`` without locking; a reload builds the new
+    snapshot off to the side and publishes it with a single reference swap.
+    With ``watch_interval`` > 0 a daemon thread polls the file and reloads
+    when its modification time or size changes.
+    """
+
+    def __init__(self, path: str, watch_interval: float = 0):
+        self.path = path
+        self.watch_interval = watch_interval
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._reload_lock = threading.Lock()
+        self._signature = _file_signature(path)
+        self._snapshot = self._build()
+        if watch_interval > 0:
+            threading.Thread(target=self._watch, name="catalog-watcher", daemon=True).start()
+
+    def current(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    def _build(self) -> CatalogSnapshot:
+        try:
+            if is_artifact(self.path):
+                df, report, version, index, derived = load_artifact(self.path)
+                logger.info(f"Mapped {len(df)} products from artifact {self.path} (version {version})")
+                return CatalogSnapshot(df, report, version, index, derived)
+            version = file_version(self.path)
+            df, report, index = ingest_catalog(self.path)
+            logger.info(f"Loaded {len(df)} products from {self.path} (version {version})")
+            return CatalogSnapshot(df, report, version, index)
+        except Exception as e:
+            logger.error(f"Error loading CSV: {e}")
+            self.last_error = str(e)
+            df, report = normalize_catalog(pd.DataFrame())
+            report.update({"path": self.path, "error": str(e)})
+            version = None
+        return CatalogSnapshot(df, report, version)
+
+    def reload(self, force: bool = False) -> Dict[str, Any]:
+        """Build a fresh snapshot and swap it in if the catalog content changed"""
+        with self._reload_lock:
+            previous = self._snapshot
+            self._signature = _file_signature(self.path)
+            try:
+                version = catalog_version(self.path)
+            except (OSError, ValueError) as e:
+                self.last_error = str(e)
+                logger.error(f"Catalog reload failed, keeping version {previous.version}: {e}")
+                return {"reloaded": False, "version": previous.version, "error": str(e)}
+            if version == previous.version and not force:
+                return {"reloaded": False, "version": previous.version}
+
+            snapshot = self._build()
+            if snapshot.empty and not previous.empty:
+                logger.error(f"Catalog reload produced no products, keeping version {previous.version}")
+                return {"reloaded": False, "version": previous.version, "error": self.last_error}
+
+            self._snapshot = snapshot
+            self.reloads += 1
+            self.last_error = None
+            logger.info(f"Catalog swapped from version {previous.version} to {snapshot.version}")
+            return {"reloaded": True, "version": snapshot.version, "previous_version": previous.version}
+
+    def reload_in_background(self, force: bool = False) -> threading.Thread:
+        thread = threading.Thread(target=self.reload, kwargs={"force": force}, name="catalog-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_interval)
+            signature = _file_signature(self.path)
+            if signature is not None and signature != self._signature:
+                logger.info(f"Detected change to {self.path}, reloading catalog")
+                try:
+                    self.reload()
+                except Exception as e:
+                    self.last_error = str(e)
+                    logger.error(f"Catalog reload failed: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version,
+            "loaded_at": snapshot.loaded_at,
+            "reloads": self.reloads,
+            "watch_interval": self.watch_interval,
+            "last_error": self.last_error,
+            **snapshot.report
+        }
@@ -0,0 +1,180 @@
+"""Binary columnar catalog artifact.
+
+``compile_catalog.py`` turns the CSV into a directory of NumPy arrays plus a
+JSON manifest: dictionary-encoded string columns (codes + distinct values),
+the typed numeric columns from the normalization stage, the compact
+URL and description columns (see compact.py), and the catalog index (token
+postings and price permutations). The backend memory-maps the
+arrays read-only at startup, so it skips CSV parsing and index building and
+every MCP process on a node shares the same page-cache pages. Arrays the
+compiler derives offline (the recommendation table, product embeddings)
+are stored and mapped the same way.
+"""
+from typing import Any, Dict, Optional, Tuple
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from catalog import CatalogIndex
+from compact import CompactColumn, TextColumn, URLColumn
+
+ARTIFACT_FORMAT = 1
+MANIFEST_NAME = 'manifest.json'
+
+# Typed columns written as plain numeric arrays rather than dictionary-encoded
+NUMERIC_COLUMNS = ('price', 'original_price', 'offer_pct', 'price_available')
+
+
+def is_artifact(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported catalog artifact format {manifest.get('format')} in {path}")
+    return manifest
+
+
+def _save(directory: str, name: str, array: np.ndarray) -> str:
+    np.save(os.path.join(directory, name), np.ascontiguousarray(array), allow_pickle=False)
+    return name
+
+
+def _load(path: str, name: str) -> np.ndarray:
+    return np.load(os.path.join(path, name), mmap_mode='r', allow_pickle=False)
+
+
+def _save_text(directory: str, stem: str, column: TextColumn) -> Dict[str, str]:
+    return {
+        'data': _save(directory, f"{stem}.data.npy", column.data),
+        'offsets': _save(directory, f"{stem}.offsets.npy", column.offsets),
+        'codes': _save(directory, f"{stem}.codes.npy", column.codes)
+    }
+
+
+def _load_text(path: str, spec: Dict[str, str]) -> TextColumn:
+    return TextColumn(_load(path, spec['data']), _load(path, spec['offsets']), _load(path, spec['codes']))
+
+
+def _save_compact(directory: str, stem: str, column: CompactColumn) -> Dict[str, Any]:
+    if isinstance(column, URLColumn):
+        return {
+            'kind': 'url',
+            'prefixes': column.prefixes,
+            'prefix_codes': _save(directory, f"{stem}.prefix_codes.npy", column.prefix_codes),
+            'suffixes': _save_text(directory, f"{stem}.suffixes", column.suffixes)
+        }
+    return {'kind': 'text', **_save_text(directory, stem, column)}
+
+
+def _load_compact(path: str, spec: Dict[str, Any]) -> CompactColumn:
+    if spec['kind'] == 'url':
+        return URLColumn(spec['prefixes'], _load(path, spec['prefix_codes']), _load_text(path, spec['suffixes']))
+    return _load_text(path, spec)
+
+
+def write_artifact(df: pd.DataFrame, report: Dict[str, Any], version: str, index: CatalogIndex, target: str,
+                   derived: Optional[Dict[str, np.ndarray]] = None):
+    """Write a normalized frame and its index to ``target``, replacing any previous artifact.
+
+    The new artifact is written next to the old one and renamed into place,
+    so a backend watching ``target`` never sees a half-written directory;
+    processes still mapping the old files keep reading them until they reload.
+    """
+    staging = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    columns = {}
+    for position, column in enumerate(df.columns):
+        stem = f"col{position}"
+        if column in NUMERIC_COLUMNS:
+            columns[column] = {'kind': 'numeric', 'file': _save(staging, f"{stem}.npy", df[column].to_numpy())}
+            continue
+        values = pd.Categorical(df[column].astype('string'))
+        with open(os.path.join(staging, f"{stem}.values.json"), 'w') as f:
+            json.dump([str(value) for value in values.categories], f)
+        columns[column] = {
+            'kind': 'category',
+            'codes': _save(staging, f"{stem}.codes.npy", values.codes),
+            'values': f"{stem}.values.json"
+        }
+
+    indexes = {}
+    for field, postings in index.postings.items():
+        tokens = list(postings.keys())
+        lengths = np.array([len(postings[token]) for token in tokens], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        rows = np.concatenate([postings[token] for token in tokens]) if tokens else np.empty(0, dtype=np.int64)
+        with open(os.path.join(staging, f"postings.{field}.tokens.json"), 'w') as f:
+            json.dump(tokens, f)
+        indexes[field] = {
+            'tokens': f"postings.{field}.tokens.json",
+            'rows': _save(staging, f"postings.{field}.rows.npy", rows.astype(np.int64)),
+            'offsets': _save(staging, f"postings.{field}.offsets.npy", offsets)
+        }
+
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'version': version,
+        'rows': len(df),
+        'column_order': list(df.columns),
+        'columns': columns,
+        'compact': {
+            column: _save_compact(staging, f"compact{position}", values)
+            for position, (column, values) in enumerate(index.compact.items())
+        },
+        'indexes': indexes,
+        'price_order': {
+            direction: _save(staging, f"price_order.{direction}.npy", order)
+            for direction, order in index.price_order.items()
+        },
+        'derived': {name: _save(staging, f"derived.{name}.npy", array) for name, array in (derived or {}).items()},
+        'report': report
+    }
+    with open(os.path.join(staging, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f)
+
+    previous = f"{target}.old-{os.getpid()}"
+    if os.path.exists(target):
+        os.rename(target, previous)
+    os.rename(staging, target)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def load_artifact(path: str) -> Tuple[pd.DataFrame, Dict[str, Any], str, CatalogIndex, Dict[str, np.ndarray]]:
+    """Map an artifact written by ``write_artifact``; returns (df, report, version, index, derived arrays)"""
+    manifest = read_manifest(path)
+
+    data = {}
+    for column in manifest['column_order']:
+        spec = manifest['columns'][column]
+        if spec['kind'] == 'numeric':
+            data[column] = _load(path, spec['file'])
+            continue
+        with open(os.path.join(path, spec['values'])) as f:
+            categories = json.load(f)
+        data[column] = pd.Categorical.from_codes(_load(path, spec['codes']), categories=pd.Index(categories, dtype='string'))
+    df = pd.DataFrame(data, copy=False)
+
+    postings = {}
+    for field, spec in manifest['indexes'].items():
+        with open(os.path.join(path, spec['tokens'])) as f:
+            tokens = json.load(f)
+        rows = _load(path, spec['rows'])
+        offsets = _load(path, spec['offsets'])
+        # Slices of the mapped array: no postings are copied into process memory
+        postings[field] = {token: rows[offsets[i]:offsets[i + 1]] for i, token in enumerate(tokens)}
+
+    price_order = {direction: _load(path, name) for direction, name in manifest['price_order'].items()}
+    # Mapped like every other array: a description is only paged in when its row is read
+    compact = {column: _load_compact(path, spec) for column, spec in manifest.get('compact', {}).items()}
+    index = CatalogIndex(df, postings=postings, price_order=price_order, compact=compact)
+
+    derived = {name: _load(path, file) for name, file in manifest.get('derived', {}).items()}
+
+    report = dict(manifest['report'], path=path)
+    return df, report, manifest['version'], index, derived
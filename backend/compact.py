@@ -0,0 +1,208 @@
+"""Compact storage for the catalog's long, mostly unique string columns.
+
+Dictionary encoding (a categorical column) stores each distinct value once,
+which is all short repeated columns like Gender or Sizes need. It does
+nothing for values that differ on nearly every row. Those columns are kept
+out of the frame instead:
+
+* URL columns as a code into a small table of shared prefixes
+  ("https://www.nike.com/t/") plus the rest of the URL;
+* descriptions, which only the text search and the serializer read, and
+  ProductIDs as one UTF-8 buffer of their distinct values with row offsets.
+
+Both live in NumPy buffers rather than one Python string per row, and in a
+compiled artifact they are memory-mapped, so a description is only paged
+in when a row is actually read.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+
+# Columns stored as a UTF-8 buffer outside the frame
+TEXT_COLUMNS = ('ProductID', 'Detailed description')
+
+# Columns stored as a shared prefix plus a suffix buffer
+URL_COLUMNS = ('Image Url', 'Product page url')
+
+# A '/'-terminated prefix enters a URL column's prefix table when at least this
+# share of the first PREFIX_SAMPLE URLs start with it
+PREFIX_MIN_SHARE = 0.01
+PREFIX_SAMPLE = 10000
+
+# Key of the second hash that confirms a value matched by pandas' default one while building
+HASH_KEY = 'compact-column-2'
+
+
+class TextColumn:
+    """Distinct strings in one UTF-8 buffer with offsets, plus each row's code into them"""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, codes: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+        self.codes = codes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.offsets.nbytes + self.codes.nbytes
+
+    def strings(self, codes: Iterable[int]) -> List[str]:
+        data, offsets = self.data, self.offsets
+        return [bytes(data[offsets[code]:offsets[code + 1]]).decode('utf-8') for code in codes]
+
+    def take(self, rows: List[int]) -> List[str]:
+        return self.strings(self.codes[rows].tolist())
+
+
+class URLColumn:
+    """URLs as a code into a shared prefix table (code 0 is the empty prefix) plus their suffixes.
+
+    ``prefix_codes`` has one entry per distinct URL, alongside the suffixes' distinct values.
+    """
+
+    def __init__(self, prefixes: List[str], prefix_codes: np.ndarray, suffixes: TextColumn):
+        self.prefixes = prefixes
+        self.prefix_codes = prefix_codes
+        self.suffixes = suffixes
+
+    def __len__(self) -> int:
+        return len(self.suffixes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.prefix_codes.nbytes + self.suffixes.nbytes + sum(len(prefix) for prefix in self.prefixes)
+
+    def take(self, rows: List[int]) -> List[str]:
+        codes = self.suffixes.codes[rows].tolist()
+        prefixes = [self.prefixes[code] for code in self.prefix_codes[codes].tolist()]
+        return [prefix + suffix for prefix, suffix in zip(prefixes, self.suffixes.strings(codes))]
+
+
+CompactColumn = Union[TextColumn, URLColumn]
+
+
+def url_prefixes(values: pd.Series) -> List[str]:
+    """Prefix table for a URL column: '' plus the '/'-terminated prefixes shared by PREFIX_MIN_SHARE of sampled URLs.
+
+    A prefix that every URL under it extends further ("https://static.nike.com/"
+    before ".../a/images/") is left out; the longer one always wins the match.
+    """
+    sample = values.head(PREFIX_SAMPLE).dropna()
+    counts: Dict[str, int] = {}
+    for url in sample:
+        # Directory prefixes after the scheme's '//'
+        position = url.find('//') + 2 if '//' in url else 0
+        while True:
+            position = url.find('/', position) + 1
+            if position <= 0:
+                break
+            counts[url[:position]] = counts.get(url[:position], 0) + 1
+    shared = {prefix: count for prefix, count in counts.items() if count >= max(PREFIX_MIN_SHARE * len(sample), 2)}
+    return [''] + sorted(
+        prefix for prefix, count in shared.items()
+        if not any(other != prefix and other.startswith(prefix) and shared[other] == count for other in shared)
+    )
+
+
+def split_urls(urls: List[str], prefixes: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """Each URL's code of its longest prefix in ``prefixes``, and the suffix left after it"""
+    series = pd.Series(urls, dtype='string')
+    prefix_codes = np.zeros(len(urls), dtype=np.int16 if len(prefixes) < 2 ** 15 else np.int32)
+    for code in sorted(range(1, len(prefixes)), key=lambda code: -len(prefixes[code])):
+        prefix_codes[(prefix_codes == 0) & series.str.startswith(prefixes[code]).to_numpy(dtype=bool)] = code
+    lengths = np.array([len(prefix) for prefix in prefixes])[prefix_codes]
+    return prefix_codes, [url[length:] for url, length in zip(urls, lengths.tolist())]
+
+
+class CompactColumnBuilder:
+    """Builds a TextColumn, or a URLColumn when given a prefix table, one chunk of rows at a time.
+
+    A chunk's new distinct values are appended straight to one growing UTF-8
+    buffer. Values from earlier chunks are recognized by a 64-bit hash kept in
+    a sorted array and confirmed by a second, independent one, so nothing
+    outlives its chunk as a Python string and the lookup costs 20 bytes per
+    distinct value. A value whose first hash collides with a different one is
+    simply stored again.
+    """
+
+    def __init__(self, prefixes: Optional[List[str]] = None):
+        self.prefixes = prefixes
+        self.distinct = 0
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._checks = np.empty(0, dtype=np.uint64)
+        self._ids = np.empty(0, dtype=np.int32)
+        self._data = bytearray()
+        self._lengths: List[np.ndarray] = []
+        self._prefix_codes: List[np.ndarray] = []
+        self._codes: List[np.ndarray] = []
+
+    def _register(self, hashes: np.ndarray, checks: np.ndarray, ids: np.ndarray):
+        hashes, first = np.unique(hashes, return_index=True)
+        positions = np.searchsorted(self._hashes, hashes)
+        self._hashes = np.insert(self._hashes, positions, hashes)
+        self._checks = np.insert(self._checks, positions, checks[first])
+        self._ids = np.insert(self._ids, positions, ids[first])
+
+    def add(self, values: pd.Series):
+        codes, uniques = pd.factorize(values.to_numpy(dtype=object))
+        uniques = np.asarray(uniques, dtype=object)
+        hashes = pd.util.hash_array(uniques)
+        checks = pd.util.hash_array(uniques, hash_key=HASH_KEY)
+        positions = np.minimum(np.searchsorted(self._hashes, hashes), max(len(self._hashes) - 1, 0))
+        known = np.zeros(len(uniques), dtype=bool)
+        if len(self._hashes):
+            known = self._hashes[positions] == hashes
+        seen = known.copy()
+        seen[known] = self._checks[positions[known]] == checks[known]
+        new = np.flatnonzero(~seen)
+        ids = np.empty(len(uniques), dtype=np.int32)
+        ids[seen] = self._ids[positions[seen]]
+        ids[new] = self.distinct + np.arange(len(new), dtype=np.int32)
+        # Values whose first hash is taken by a different value stay out of the lookup
+        fresh = new[~known[new]]
+        self._register(hashes[fresh], checks[fresh], ids[fresh])
+        strings = uniques[new].tolist()
+        if self.prefixes is not None:
+            prefix_codes, strings = split_urls(strings, self.prefixes)
+            self._prefix_codes.append(prefix_codes)
+        encoded = [string.encode('utf-8') for string in strings]
+        self._data += b''.join(encoded)
+        self._lengths.append(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)))
+        # Missing values factorize to -1 and keep it until finish()
+        self._codes.append(np.where(codes >= 0, ids[codes] if len(ids) else -1, -1).astype(np.int32))
+        self.distinct += len(new)
+
+    def finish(self) -> CompactColumn:
+        """The column over every added row; missing values read as ''"""
+        codes = np.concatenate(self._codes) if self._codes else np.empty(0, dtype=np.int32)
+        lengths = np.concatenate(self._lengths) if self._lengths else np.empty(0, dtype=np.int64)
+        prefix_codes = np.concatenate(self._prefix_codes) if self._prefix_codes else np.empty(0, dtype=np.int16)
+        if (codes < 0).any():
+            # One empty value after the distinct ones, with the empty prefix
+            lengths = np.append(lengths, 0)
+            prefix_codes = np.append(prefix_codes, 0).astype(prefix_codes.dtype)
+            codes = np.where(codes < 0, self.distinct, codes).astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        text = TextColumn(np.frombuffer(self._data, dtype=np.uint8), offsets, codes)
+        self._hashes, self._checks, self._ids = self._hashes[:0], self._checks[:0], self._ids[:0]
+        self._codes, self._lengths, self._prefix_codes = [], [], []
+        if self.prefixes is None:
+            return text
+        return URLColumn(self.prefixes, prefix_codes, text)
+
+
+def column_values(df: pd.DataFrame, compact: Optional[Dict[str, CompactColumn]], column: str,
+                  rows: Optional[np.ndarray] = None) -> Optional[pd.Series]:
+    """A catalog column as strings indexed by row position, read from the frame or the compact store.
+
+    ``rows`` selects positions (all rows when None); None when the catalog has no such column.
+    """
+    if compact and column in compact:
+        rows = np.arange(len(compact[column])) if rows is None else np.asarray(rows)
+        return pd.Series(compact[column].take(rows.tolist()), index=rows, dtype='string')
+    if column not in df.columns:
+        return None
+    values = df[column] if rows is None else df[column].iloc[rows]
+    return values.astype('string')
@@ -0,0 +1,45 @@
+"""Compile the catalog CSV into a memory-mappable artifact.
+
+    python compile_catalog.py ./data/nike.csv ./data/nike.catalog
+
+Point the backend at the output with CATALOG_ARTIFACT_PATH. Re-running the
+command replaces the artifact in place; backends watching it pick up the
+new version on their next check.
+
+The artifact also carries the precomputed recommendation table and the
+product embeddings, so those offline jobs run here rather than in the
+serving processes.
+"""
+import argparse
+import logging
+import time
+from catalog_manager import file_version
+from catalog_store import write_artifact
+from embeddings import build_embeddings
+from ingest import CSV_CHUNK_ROWS, ingest_catalog
+from recommendations import build_table
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def compile_catalog(csv_path: str, target: str, chunk_rows: int = CSV_CHUNK_ROWS) -> str:
+    start = time.perf_counter()
+    version = file_version(csv_path)
+    df, report, index = ingest_catalog(csv_path, chunk_rows)
+    if df.empty:
+        raise SystemExit(f"No products loaded from {csv_path}")
+    derived = {'recommendations': build_table(df, index)}
+    derived.update({f"embeddings.{name}": array for name, array in build_embeddings(df, compact=index.compact).items()})
+    write_artifact(df, report, version, index, target, derived=derived)
+    logger.info(f"Compiled {len(df)} products (version {version}) to {target} in {time.perf_counter() - start:.2f}s")
+    return version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the catalog CSV into a memory-mappable artifact")
+    parser.add_argument("csv_path", help="Source catalog CSV")
+    parser.add_argument("target", help="Artifact directory to write")
+    parser.add_argument("--chunk-rows", type=int, default=CSV_CHUNK_ROWS, help="CSV rows parsed per step")
+    args = parser.parse_args()
+    compile_catalog(args.csv_path, args.target, args.chunk_rows)
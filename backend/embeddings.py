@@ -0,0 +1,200 @@
+from typing import Dict, Optional, Tuple
+import logging
+import numpy as np
+import pandas as pd
+from catalog import EMPTY_ROWS
+from compact import CompactColumn
+from relevance import analyze, term_frequencies
+
+logger = logging.getLogger(__name__)
+
+# Text embedded per product and the weight of a word in each column
+EMBEDDING_FIELDS = {
+    'Category.1': 2.0,
+    'Detailed description': 1.0
+}
+
+# Dimensions kept from the TF-IDF SVD (LSA); terms in fewer rows than this are dropped
+EMBEDDING_DIM = 64
+MIN_DOCUMENT_FREQUENCY = 2
+
+# Randomized SVD: extra sampled dimensions, power iterations and a fixed seed so
+# every compile of the same catalog produces the same vectors
+SVD_OVERSAMPLE = 16
+SVD_POWER_ITERATIONS = 2
+RANDOM_SEED = 0
+
+# Catalogs up to this size are searched exhaustively (one matrix-vector product);
+# larger ones get an IVF index: k-means cells, of which the nearest IVF_PROBES are scanned
+BRUTE_FORCE_MAX_ROWS = 50000
+IVF_PROBES = 16
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 100000
+
+# Rows scored per block when a step would otherwise materialize a rows x cells matrix
+BLOCK_ROWS = 65536
+
+
+def _sparse_dot(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, dense: np.ndarray, size: int) -> np.ndarray:
+    """``X @ dense`` for the sparse X given as (rows, cols, values) triples, with ``size`` output rows"""
+    out = np.empty((size, dense.shape[1]), dtype=np.float64)
+    # Column-major copy, so each column's gather reads contiguous memory
+    for j, column in enumerate(np.ascontiguousarray(dense.T)):
+        out[:, j] = np.bincount(rows, weights=values * column[cols], minlength=size)
+    return out
+
+
+def _tfidf(df: pd.DataFrame, compact: Optional[Dict[str, CompactColumn]] = None
+           ) -> Tuple[Dict[str, int], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Row-normalized TF-IDF as sparse triples: (term columns, idf, rows, cols, values)"""
+    terms, codes, rows, frequency = term_frequencies(df, EMBEDDING_FIELDS, compact)
+    document_frequency = np.bincount(codes, minlength=len(terms))
+    kept = np.flatnonzero(document_frequency >= MIN_DOCUMENT_FREQUENCY)
+    columns = np.full(len(terms), -1, dtype=np.int64)
+    columns[kept] = np.arange(len(kept))
+    idf = np.log((1 + len(df)) / (1 + document_frequency[kept])) + 1
+
+    keep = columns[codes] >= 0
+    rows, cols = rows[keep], columns[codes[keep]]
+    values = (1 + np.log(frequency[keep])) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(df)))
+    values = values / np.where(norms > 0, norms, 1)[rows]
+    return {terms[code]: int(column) for code, column in zip(kept, range(len(kept)))}, idf, rows, cols, values
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return (vectors / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+
+def _kmeans(vectors: np.ndarray, cells: int, rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means centroids over a sample of the unit ``vectors``"""
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), KMEANS_SAMPLE), replace=False)]
+    centroids = sample[rng.choice(len(sample), cells, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.stack([np.bincount(assignment, weights=column, minlength=cells) for column in sample.T], axis=1)
+        empty = np.flatnonzero(np.bincount(assignment, minlength=cells) == 0)
+        # Cells that lost every member restart at a random sample point
+        sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def build_embeddings(df: pd.DataFrame, ivf: Optional[bool] = None,
+                     compact: Optional[Dict[str, CompactColumn]] = None) -> Dict[str, np.ndarray]:
+    """Product vectors plus what is needed to embed queries and search them, as named arrays.
+
+    Vectors are LSA: the TF-IDF matrix of title and description projected on
+    its top EMBEDDING_DIM singular vectors (randomized SVD over the sparse
+    matrix, so no dense rows x terms matrix is ever built), then normalized
+    so a dot product is the cosine similarity. Catalogs above
+    BRUTE_FORCE_MAX_ROWS also get the IVF cells (``ivf`` overrides).
+    ``compact`` holds the text columns stored outside the frame.
+    """
+    size = len(df)
+    rng = np.random.default_rng(RANDOM_SEED)
+    columns, idf, rows, cols, values = _tfidf(df, compact)
+    width = min(EMBEDDING_DIM + SVD_OVERSAMPLE, len(columns), size)
+    if width == 0:
+        return {}
+
+    # Range of X (size x terms), refined by power iterations, then the SVD of its small projection
+    sample = _sparse_dot(rows, cols, values, rng.standard_normal((len(columns), width)), size)
+    basis, _ = np.linalg.qr(sample)
+    for _ in range(SVD_POWER_ITERATIONS):
+        basis, _ = np.linalg.qr(_sparse_dot(cols, rows, values, basis, len(columns)))
+        basis, _ = np.linalg.qr(_sparse_dot(rows, cols, values, basis, size))
+    projected = _sparse_dot(cols, rows, values, basis, len(columns)).T
+    _, singular, right = np.linalg.svd(projected, full_matrices=False)
+    dim = min(EMBEDDING_DIM, len(singular))
+    components = right[:dim].T.astype(np.float32)
+
+    arrays = {
+        'vectors': _normalize(_sparse_dot(rows, cols, values, components.astype(np.float64), size)),
+        'components': components,
+        'idf': idf.astype(np.float32),
+        'terms': np.array(sorted(columns, key=columns.get), dtype=str)
+    }
+    if (size > BRUTE_FORCE_MAX_ROWS) if ivf is None else ivf:
+        centroids = _kmeans(arrays['vectors'], int(np.sqrt(size)), rng)
+        assignment = np.concatenate([
+            np.argmax(arrays['vectors'][start:start + BLOCK_ROWS] @ centroids.T, axis=1)
+            for start in range(0, size, BLOCK_ROWS)
+        ])
+        arrays['ivf_centroids'] = centroids
+        arrays['ivf_rows'] = np.argsort(assignment, kind='stable')
+        arrays['ivf_offsets'] = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=len(centroids)))])
+    logger.info(f"Built {dim}-dimensional embeddings over {size} rows from {len(columns)} terms"
+                + (f", {len(arrays.get('ivf_centroids', ()))} IVF cells" if 'ivf_centroids' in arrays else ""))
+    return arrays
+
+
+class EmbeddingIndex:
+    """Nearest-neighbour search over the product embeddings.
+
+    ``arrays`` come from ``build_embeddings``, either just built or memory
+    mapped from the catalog artifact. Small catalogs are scanned exhaustively
+    with one BLAS matrix-vector product; catalogs with IVF cells score only
+    the rows of the cells closest to the query.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.vectors = arrays.get('vectors', np.empty((0, 0), dtype=np.float32))
+        self.components = arrays.get('components')
+        self.idf = arrays.get('idf')
+        self.columns = {str(term): column for column, term in enumerate(arrays.get('terms', ()))}
+        self.centroids = arrays.get('ivf_centroids')
+        self.cell_rows = arrays.get('ivf_rows')
+        self.cell_offsets = arrays.get('ivf_offsets')
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def embed_text(self, text: str) -> Optional[np.ndarray]:
+        """Unit vector for free text in the product space, or None when it shares no catalog term"""
+        counts: Dict[int, int] = {}
+        for term in analyze(text):
+            if term in self.columns:
+                counts[self.columns[term]] = counts.get(self.columns[term], 0) + 1
+        if not counts:
+            return None
+        cols = np.array(list(counts))
+        weights = (1 + np.log(np.array(list(counts.values()), dtype=np.float64))) * self.idf[cols]
+        vector = weights @ self.components[cols]
+        return _normalize(vector) if np.any(vector) else None
+
+    def _candidates(self, query: np.ndarray, probes: int) -> np.ndarray:
+        scores = self.centroids @ query
+        cells = np.argpartition(-scores, probes - 1)[:probes] if probes < len(scores) else np.arange(len(scores))
+        return np.concatenate([self.cell_rows[self.cell_offsets[cell]:self.cell_offsets[cell + 1]] for cell in cells])
+
+    def search(self, query: np.ndarray, k: int, allowed: Optional[np.ndarray] = None,
+               exclude: Optional[int] = None, probes: int = IVF_PROBES, exact: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """The ``k`` rows most similar to the unit vector ``query``, best first, with their cosine scores.
+
+        ``allowed`` is a sorted array of candidate rows (None for the whole
+        catalog) and ``exclude`` a row never returned, such as the query
+        product itself. With IVF cells, more cells are probed until k allowed
+        rows are found; ``exact`` forces the exhaustive scan.
+        """
+        if k <= 0 or len(self) == 0:
+            return EMPTY_ROWS, np.empty(0, dtype=np.float32)
+        if self.centroids is None or exact:
+            rows = np.arange(len(self)) if allowed is None else np.asarray(allowed, dtype=np.int64)
+        else:
+            while True:
+                rows = np.sort(self._candidates(query, probes))
+                if allowed is not None:
+                    rows = rows[np.isin(rows, allowed, assume_unique=True)]
+                if len(rows) > k or probes >= len(self.centroids):
+                    break
+                probes *= 2
+        if exclude is not None:
+            rows = rows[rows != exclude]
+        scores = self.vectors[rows] @ query if len(rows) < len(self) else self.vectors @ query
+        if len(rows) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        order = np.lexsort((rows, -scores))
+        return rows[order], scores[order]
@@ -0,0 +1,161 @@
+"""Chunked catalog ingestion.
+
+The CSV is streamed ``chunk_rows`` rows at a time instead of being read into
+one frame of Python strings. Each chunk is normalized (typed prices, report
+of unparseable values), its short string columns are dictionary-encoded
+against vocabularies shared by all chunks, and its tokens are appended to
+the postings as integer (token, row) pairs. Descriptions, URLs and
+ProductIDs, which are nearly unique per row, go to the compact store (see
+compact.py) instead: each chunk's new distinct values are appended to a
+UTF-8 buffer as bytes, never kept as Python strings. Peak memory is one raw
+chunk plus the encoded catalog (int32 codes per column, the short columns'
+distinct values, the compact buffers and the postings), which still grows
+with the catalog but holds its text once, as bytes.
+"""
+from typing import Any, Dict, List, Tuple
+import logging
+import numpy as np
+import pandas as pd
+from catalog import REPORT_SAMPLE_SIZE, TOKEN_COLUMNS, CatalogIndex, field_values, normalize_catalog
+from compact import TEXT_COLUMNS, URL_COLUMNS, CompactColumnBuilder, url_prefixes
+
+logger = logging.getLogger(__name__)
+
+# Rows parsed per step; bounds the raw strings (and their exploded tokens) alive at any time
+CSV_CHUNK_ROWS = 10000
+
+# Typed columns normalize_catalog adds; kept as arrays rather than dictionary-encoded
+TYPED_COLUMNS = ('price', 'original_price', 'offer_pct', 'price_available')
+
+# Columns looked up by exact value, stripped of stray whitespace; every other value is kept as read
+KEY_COLUMNS = ('ProductID', 'Gender')
+
+
+def _merge_unparsed(total: Dict[str, Any], chunk: Dict[str, Any]):
+    total['count'] += chunk['count']
+    for value, count in chunk['values'].items():
+        total['values'][value] = total['values'].get(value, 0) + count
+    total['product_ids'].extend(chunk['product_ids'][:REPORT_SAMPLE_SIZE - len(total['product_ids'])])
+
+
+class CatalogBuilder:
+    """Accumulates normalized chunks into a dictionary-encoded frame, its compact columns and its token postings"""
+
+    def __init__(self):
+        self.rows = 0
+        self.report: Dict[str, Any] = {'rows': 0, 'unparsed': {}, 'priced_rows': 0}
+        self._columns: List[str] = []
+        self._vocabularies: Dict[str, Dict[str, int]] = {}
+        self._codes: Dict[str, List[np.ndarray]] = {}
+        self._typed: Dict[str, List[np.ndarray]] = {}
+        self._compact: Dict[str, CompactColumnBuilder] = {}
+        self._tokens: Dict[str, Dict[str, int]] = {field: {} for field in TOKEN_COLUMNS}
+        self._token_ids: Dict[str, List[np.ndarray]] = {field: [] for field in TOKEN_COLUMNS}
+        self._token_rows: Dict[str, List[np.ndarray]] = {field: [] for field in TOKEN_COLUMNS}
+
+    def _encode(self, column: str, values: pd.Series) -> np.ndarray:
+        codes, uniques = pd.factorize(values.to_numpy(dtype=object))
+        vocabulary = self._vocabularies.setdefault(column, {})
+        ids = np.array([vocabulary.setdefault(value, len(vocabulary)) for value in uniques], dtype=np.int32)
+        # Missing values factorize to -1 and stay -1, the categorical code for NA
+        return np.where(codes >= 0, ids[codes] if len(ids) else -1, -1).astype(np.int32)
+
+    def _index(self, field: str, chunk: pd.DataFrame):
+        values = field_values(chunk, field)
+        if values is None:
+            return
+        tokens = values.str.lower().str.split().explode().dropna()
+        pairs = pd.DataFrame({'token': tokens.to_numpy(dtype=object), 'row': tokens.index.to_numpy(dtype=np.int64)})
+        pairs = pairs.drop_duplicates()
+        codes, uniques = pd.factorize(pairs['token'].to_numpy(dtype=object))
+        vocabulary = self._tokens[field]
+        ids = np.array([vocabulary.setdefault(token, len(vocabulary)) for token in uniques], dtype=np.int32)
+        self._token_ids[field].append(ids[codes] if len(ids) else np.empty(0, dtype=np.int32))
+        self._token_rows[field].append((pairs['row'].to_numpy(dtype=np.int64) + self.rows).astype(np.int32))
+
+    def add(self, raw: pd.DataFrame):
+        """Normalize, encode and index the next chunk of CSV rows"""
+        chunk, report = normalize_catalog(raw)
+        for source, failures in report['unparsed'].items():
+            total = self.report['unparsed'].setdefault(source, {'count': 0, 'values': {}, 'product_ids': []})
+            _merge_unparsed(total, failures)
+        self.report['priced_rows'] += report['priced_rows']
+
+        if not self._columns:
+            self._columns = list(chunk.columns)
+        for column in self._columns:
+            if column in TYPED_COLUMNS:
+                self._typed.setdefault(column, []).append(chunk[column].to_numpy())
+                continue
+            values = chunk[column].astype('string')
+            if column in KEY_COLUMNS:
+                values = values.str.strip()
+            if column in TEXT_COLUMNS or column in URL_COLUMNS:
+                if column not in self._compact:
+                    # The first chunk's URLs pick the column's prefix table
+                    self._compact[column] = CompactColumnBuilder(url_prefixes(values) if column in URL_COLUMNS else None)
+                self._compact[column].add(values)
+                continue
+            self._codes.setdefault(column, []).append(self._encode(column, values))
+        for field in TOKEN_COLUMNS:
+            self._index(field, chunk)
+        self.rows += len(chunk)
+
+    def _postings(self, field: str) -> Dict[str, np.ndarray]:
+        tokens = list(self._tokens[field])
+        if not tokens:
+            return {}
+        id_chunks, row_chunks = self._token_ids.pop(field), self._token_rows.pop(field)
+        counts = sum(np.bincount(ids, minlength=len(tokens)) for ids in id_chunks)
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        rows = np.empty(bounds[-1], dtype=np.int64)
+        # Counting sort a chunk at a time, releasing each chunk's pairs once placed: chunks cover
+        # ascending row ranges, so every token's rows land in order without a catalog-sized sort
+        fill = bounds[:-1].copy()
+        while id_chunks:
+            ids, chunk_rows = id_chunks.pop(0), row_chunks.pop(0)
+            order = np.argsort(ids, kind='stable')
+            ids = ids[order]
+            chunk_counts = np.bincount(ids, minlength=len(tokens))
+            starts = np.cumsum(chunk_counts) - chunk_counts
+            rows[fill[ids] + np.arange(len(ids)) - starts[ids]] = chunk_rows[order]
+            fill += chunk_counts
+        return {token: rows[bounds[i]:bounds[i + 1]] for i, token in enumerate(tokens)}
+
+    def finish(self) -> Tuple[pd.DataFrame, Dict[str, Any], CatalogIndex]:
+        """The encoded frame (string columns categorical, typed columns numeric), the load report and the index"""
+        data = {}
+        # Long mostly-unique text lives outside the frame, in the compact store
+        compact = {column: builder.finish() for column, builder in self._compact.items()}
+        for column in self._columns:
+            if column in TYPED_COLUMNS:
+                data[column] = np.concatenate(self._typed[column])
+                continue
+            if column in compact:
+                continue
+            codes = np.concatenate(self._codes.pop(column))
+            values = list(self._vocabularies.pop(column, {}))
+            data[column] = pd.Categorical.from_codes(codes, categories=pd.Index(values, dtype='string'))
+        df = pd.DataFrame(data, copy=False) if data else normalize_catalog(pd.DataFrame())[0]
+        for failures in self.report['unparsed'].values():
+            top = sorted(failures['values'].items(), key=lambda item: -item[1])[:REPORT_SAMPLE_SIZE]
+            failures['values'] = dict(top)
+        self.report['rows'] = self.rows
+
+        postings = {field: self._postings(field) for field in TOKEN_COLUMNS}
+        return df, self.report, CatalogIndex(df, postings=postings, compact=compact)
+
+
+def ingest_catalog(path: str, chunk_rows: int = CSV_CHUNK_ROWS) -> Tuple[pd.DataFrame, Dict[str, Any], CatalogIndex]:
+    """Stream the catalog CSV into an encoded frame, its load report and its index"""
+    builder = CatalogBuilder()
+    # Every column read as text so chunks agree on types; prices are parsed by normalize_catalog
+    for raw in pd.read_csv(path, chunksize=chunk_rows, dtype=str):
+        builder.add(raw)
+    df, report, index = builder.finish()
+    report['path'] = path
+    for column, failures in report['unparsed'].items():
+        if failures['count']:
+            logger.warning(f"{failures['count']} rows with unparseable '{column}': {failures['values']}")
+    logger.info(f"Ingested {len(df)} rows from {path} in chunks of {chunk_rows}")
+    return df, report, index
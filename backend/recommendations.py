@@ -0,0 +1,193 @@
+from typing import Dict, List, Optional
+import logging
+import numpy as np
+import pandas as pd
+from catalog import EMPTY_ROWS, CatalogIndex
+from spelling import stem, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Garment families by title word (stemmed); a title takes the first family with a matching word,
+# so "Fleece Joggers" is a bottom and "Hooded Jacket" outerwear
+ITEM_FAMILIES = (
+    ('dress', ('dress', 'skirt')),
+    ('outerwear', ('jacket', 'coat', 'blazer', 'cardigan', 'vest', 'parka', 'anorak')),
+    ('bottom', ('pant', 'legging', 'sweatpant', 'jogger', 'short', 'trouser', 'tight', 'skort')),
+    ('top', ('hoodie', 'sweatshirt', 'crew', 'fleece', 'sweater', 'top', 'shirt', 'tee', 'tank', 'bra', 'polo'))
+)
+FAMILY_NAMES = [family for family, _ in ITEM_FAMILIES]
+
+# Families that complete an outfit with each family; products of no known family
+# are paired with every family
+COMPLEMENTS = {
+    'top': ('bottom',),
+    'bottom': ('top',),
+    'dress': ('outerwear',),
+    'outerwear': ('bottom', 'top')
+}
+
+# Color words folded into the families the pairing rules are written for
+COLOR_FAMILIES = {
+    'black': 'black', 'navy': 'navy', 'white': 'white', 'cream': 'cream', 'ivory': 'cream', 'sail': 'cream',
+    'blue': 'blue', 'teal': 'blue', 'pink': 'pink', 'red': 'red', 'burgundy': 'red', 'gray': 'gray',
+    'grey': 'gray', 'charcoal': 'gray', 'heather': 'gray', 'beige': 'beige', 'tan': 'beige', 'khaki': 'beige',
+    'brown': 'brown', 'green': 'green', 'olive': 'green', 'purple': 'purple', 'yellow': 'yellow',
+    'orange': 'orange'
+}
+COLOR_NAMES = sorted(set(COLOR_FAMILIES.values()))
+
+# Colors that go with each color family; families without a rule pair with the neutrals
+COLOR_PAIRS = {
+    'black': ('white', 'gray', 'beige', 'cream'),
+    'navy': ('white', 'gray', 'beige', 'cream'),
+    'white': ('black', 'navy', 'brown', 'gray'),
+    'cream': ('black', 'navy', 'brown', 'gray'),
+    'blue': ('black', 'white', 'gray', 'navy'),
+    'pink': ('black', 'white', 'gray', 'navy'),
+    'red': ('black', 'white', 'gray', 'navy')
+}
+NEUTRAL_COLORS = ('black', 'white', 'gray', 'navy')
+
+# Title and description words that describe how a product is worn; products
+# sharing more of them make a more coherent outfit
+STYLE_TERMS = (
+    'fleece', 'running', 'training', 'yoga', 'lifestyle', 'oversized', 'cropped', 'loose', 'slim', 'woven',
+    'knit', 'waterproof', 'lightweight', 'therma', 'dri-fit', 'high-waisted'
+)
+
+# Catalog price quantiles separating the budget, mid and premium bands
+PRICE_BAND_QUANTILES = (1 / 3, 2 / 3)
+
+# Score of a candidate: paired color + same (or adjacent) price band + shared style words
+COLOR_WEIGHT = 1.0
+PRICE_BAND_WEIGHT = 1.0
+ADJACENT_BAND_WEIGHT = 0.5
+STYLE_WEIGHT = 1.0
+
+# Recommendations stored per product, and at most this many from one group of
+# interchangeable candidates (same gender, family, color, band and style) before the next group
+TABLE_SIZE = 12
+MAX_PER_GROUP = 1
+
+# Set bits in every style mask value
+_POPCOUNT = np.array([bin(mask).count('1') for mask in range(1 << len(STYLE_TERMS))], dtype=np.float64)
+
+
+def _codes(df: pd.DataFrame, index: CatalogIndex) -> Dict[str, np.ndarray]:
+    """Per-row integer attributes the pairing rules read; -1 where a row has none"""
+    size = len(df)
+    titles = df['Category.1'].astype('string').fillna('') if 'Category.1' in df.columns else pd.Series([''] * size)
+    families = {word: position for position, (_, words) in enumerate(ITEM_FAMILIES) for word in words}
+    family = np.array([
+        min((families[stem(token)] for token in tokenize(title) if stem(token) in families), default=-1)
+        for title in titles
+    ], dtype=np.int64)
+
+    colors = df['Colors'].astype('string').fillna('') if 'Colors' in df.columns else pd.Series([''] * size)
+    color = np.array([
+        next((COLOR_NAMES.index(COLOR_FAMILIES[token]) for token in tokenize(text) if token in COLOR_FAMILIES), -1)
+        for text in colors
+    ], dtype=np.int64)
+
+    band = np.full(size, -1, dtype=np.int64)
+    priced = ~np.isnan(index.price)
+    if priced.any():
+        edges = np.quantile(index.price[priced], PRICE_BAND_QUANTILES)
+        band[priced] = np.searchsorted(edges, index.price[priced], side='right')
+
+    style = np.zeros(size, dtype=np.int64)
+    for bit, term in enumerate(STYLE_TERMS):
+        style[index.contains('text', term)] |= 1 << bit
+
+    return {'gender': index.gender.codes.astype(np.int64) if len(index.gender) else np.full(size, -1),
+            'family': family, 'color': color, 'band': band, 'style': style}
+
+
+def _pair_matrix() -> np.ndarray:
+    pairs = np.zeros((len(COLOR_NAMES) + 1, len(COLOR_NAMES) + 1), dtype=np.float64)
+    for source, name in enumerate(COLOR_NAMES):
+        for target in COLOR_PAIRS.get(name, NEUTRAL_COLORS):
+            pairs[source, COLOR_NAMES.index(target)] = 1.0
+    # Unknown source colors (last row) pair with the neutrals; unknown candidates (last column) with nothing
+    for target in NEUTRAL_COLORS:
+        pairs[-1, COLOR_NAMES.index(target)] = 1.0
+    return pairs
+
+
+def build_table(df: pd.DataFrame, index: CatalogIndex) -> np.ndarray:
+    """Ranked complementary rows for every catalog row: shape (rows, TABLE_SIZE), -1 padded.
+
+    Every score term depends only on a product's (gender, family, color,
+    price band, style) group, so scores are computed once per pair of groups
+    rather than per pair of products, and every product in a group shares
+    its group's list. Within a scored group candidates keep catalog order.
+    """
+    size = len(df)
+    table = np.full((size, TABLE_SIZE), -1, dtype=np.int32 if size < 2 ** 31 else np.int64)
+    if size == 0:
+        return table
+    codes = _codes(df, index)
+    keys = pd.DataFrame(codes)
+    groups = keys.groupby(list(codes), sort=False).indices
+    group_keys = np.array(list(groups.keys()), dtype=np.int64).reshape(-1, len(codes))
+    group_rows = [np.asarray(rows, dtype=np.int64) for rows in groups.values()]
+    gender, family, color, band, style = group_keys.T
+    first_row = np.array([rows[0] for rows in group_rows])
+    pairs = _pair_matrix()
+
+    for source, rows in enumerate(group_rows):
+        complements = COMPLEMENTS.get(FAMILY_NAMES[family[source]], ()) if family[source] >= 0 else FAMILY_NAMES
+        candidates = (gender == gender[source]) & np.isin(family, [FAMILY_NAMES.index(name) for name in complements])
+        candidates = np.flatnonzero(candidates)
+        if len(candidates) == 0:
+            continue
+
+        score = COLOR_WEIGHT * pairs[color[source], color[candidates]]
+        gap = np.abs(band[candidates] - band[source])
+        priced = (band[candidates] >= 0) & (band[source] >= 0)
+        score += np.where(priced & (gap == 0), PRICE_BAND_WEIGHT, np.where(priced & (gap == 1), ADJACENT_BAND_WEIGHT, 0.0))
+        shared = _POPCOUNT[style[candidates] & style[source]]
+        either = _POPCOUNT[style[candidates] | style[source]]
+        score += STYLE_WEIGHT * np.divide(shared, either, out=np.zeros(len(candidates)), where=either > 0)
+
+        ranked = candidates[np.lexsort((first_row[candidates], -score))]
+        picked = _fill(ranked, group_rows)
+        table[rows, :len(picked)] = picked
+
+    logger.info(f"Built recommendation table over {size} rows from {len(group_rows)} product groups")
+    return table
+
+
+def _fill(ranked_groups: np.ndarray, group_rows: List[np.ndarray]) -> np.ndarray:
+    """TABLE_SIZE rows from the ranked groups, MAX_PER_GROUP per group first, then the remainder in rank order"""
+    picked: List[int] = []
+    for group in ranked_groups:
+        picked.extend(group_rows[group][:MAX_PER_GROUP][:TABLE_SIZE - len(picked)])
+        if len(picked) == TABLE_SIZE:
+            return np.array(picked, dtype=np.int64)
+    for group in ranked_groups:
+        picked.extend(group_rows[group][MAX_PER_GROUP:][:TABLE_SIZE - len(picked)])
+        if len(picked) == TABLE_SIZE:
+            break
+    return np.array(picked, dtype=np.int64)
+
+
+class RecommendationTable:
+    """Complementary products for every catalog product, looked up by ProductID.
+
+    The table is computed by ``build_table`` at artifact compile time (or on
+    first use for a CSV catalog); serving a product's recommendations is a
+    hash lookup of its ProductID and one row of the table.
+    """
+
+    def __init__(self, df: pd.DataFrame, index: CatalogIndex, table: Optional[np.ndarray] = None):
+        self.index = index
+        self.table = table if table is not None else build_table(df, index)
+
+    def lookup(self, product_id: str) -> np.ndarray:
+        """Ranked complementary rows for ``product_id``; empty for unknown products"""
+        row = self.index.product_row(product_id)
+        if row is None:
+            return EMPTY_ROWS
+        entries = self.table[row]
+        return entries[entries >= 0].astype(np.int64)
@@ -0,0 +1,164 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import numpy as np
+import pandas as pd
+from catalog import EMPTY_ROWS, SEARCH_SYNONYMS, CatalogIndex
+from compact import CompactColumn, column_values
+from spelling import TOKEN_PATTERN, stem, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Columns scored for relevance and how much one occurrence of a word in each counts;
+# product titles say what the item is, descriptions mention many things in passing
+FIELD_WEIGHTS = {
+    'Category.1': 2.0,
+    'Category': 2.0,
+    'Detailed description': 1.0
+}
+
+# BM25 parameters: term-frequency saturation and document-length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Rows tokenized per step while building the index
+BUILD_CHUNK_ROWS = 50000
+
+
+def analyze(text: str) -> List[str]:
+    """Query words as the relevance index stores them: tokenized and stemmed"""
+    return [stem(token) for token in tokenize(text)]
+
+
+def term_frequencies(df: pd.DataFrame, field_weights: Dict[str, float] = FIELD_WEIGHTS,
+                     compact: Optional[Dict[str, CompactColumn]] = None
+                     ) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Field-weighted frequency of every analyzed term in every row: (terms, term codes, rows, frequencies).
+
+    Entries are grouped by term code (an index into terms) and sorted by row
+    within each term. Rows are tokenized a chunk at a time with terms as
+    integer ids, so the tokens of a large catalog never all exist as strings.
+    """
+    vocabulary: Dict[str, int] = {}
+    term_chunks, row_chunks, tf_chunks = [], [], []
+    columns = [(column, weight) for column, weight in field_weights.items()
+               if column in df.columns or column in (compact or {})]
+    for start in range(0, len(df), BUILD_CHUNK_ROWS):
+        parts = []
+        chunk = np.arange(start, min(start + BUILD_CHUNK_ROWS, len(df)))
+        for column, weight in columns:
+            tokens = column_values(df, compact, column, chunk).str.lower() \
+                .str.findall(TOKEN_PATTERN.pattern).explode().dropna()
+            codes, uniques = pd.factorize(tokens.to_numpy(dtype=object))
+            term_ids = np.array([vocabulary.setdefault(analyze(token)[0], len(vocabulary)) for token in uniques],
+                                dtype=np.int64)
+            parts.append(pd.DataFrame({'term': term_ids[codes], 'row': tokens.index.to_numpy(dtype=np.int64),
+                                       'weight': weight}))
+        if not parts:
+            break
+        tf = pd.concat(parts, ignore_index=True).groupby(['term', 'row'], sort=True)['weight'].sum()
+        term_chunks.append(tf.index.get_level_values('term').to_numpy(dtype=np.int64))
+        row_chunks.append(tf.index.get_level_values('row').to_numpy(dtype=np.int64))
+        tf_chunks.append(tf.to_numpy(dtype=np.float64))
+    if not term_chunks:
+        return [], EMPTY_ROWS, EMPTY_ROWS, np.empty(0, dtype=np.float64)
+
+    # Chunks cover ascending row ranges, so a stable sort by term keeps rows ordered within each term
+    order = np.argsort(np.concatenate(term_chunks), kind='stable')
+    return (sorted(vocabulary, key=vocabulary.get), np.concatenate(term_chunks)[order],
+            np.concatenate(row_chunks)[order], np.concatenate(tf_chunks)[order])
+
+
+class RelevanceIndex:
+    """BM25 over the product title and description, with every term's score precomputed.
+
+    A term's BM25 contribution to a row depends only on the catalog (its
+    frequency in the row, the row's length and the term's document
+    frequency), so each posting stores it directly. Scoring a query is then
+    a gather and a sum over the query terms' postings: no per-query pass
+    over the catalog, whatever its size.
+    """
+
+    def __init__(self, df: pd.DataFrame, index: CatalogIndex):
+        self.size = len(df)
+        self.index = index
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+        term_values, term_codes, rows, frequency = term_frequencies(df, compact=index.compact)
+        if not term_values:
+            return
+        lengths = np.bincount(rows, weights=frequency, minlength=self.size)
+        average_length = lengths.mean() or 1.0
+
+        document_frequency = np.bincount(term_codes, minlength=len(term_values))
+        idf = np.log1p((self.size - document_frequency + 0.5) / (document_frequency + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / average_length)
+        impact = (idf[term_codes] * frequency * (BM25_K1 + 1) / (frequency + norm)).astype(np.float32)
+
+        # Entries are grouped by term and sorted by row within each term
+        bounds = np.concatenate([[0], np.cumsum(document_frequency)])
+        self.postings = {
+            term: (rows[bounds[i]:bounds[i + 1]], impact[bounds[i]:bounds[i + 1]])
+            for i, term in enumerate(term_values)
+        }
+        logger.info(f"Built relevance index over {self.size} rows: {len(self.postings)} terms")
+
+    def query_terms(self, words: Iterable[str]) -> List[str]:
+        """Stemmed query terms plus their synonyms, limited to terms the catalog contains"""
+        terms = []
+        for word in words:
+            for term in analyze(word):
+                for candidate in SEARCH_SYNONYMS.get(term, (term,)):
+                    if candidate in self.postings and candidate not in terms:
+                        terms.append(candidate)
+        return terms
+
+    def score(self, rows: np.ndarray, terms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 scores of the sorted candidate ``rows`` that contain at least one of ``terms``"""
+        if len(rows) == 0:
+            return EMPTY_ROWS, np.empty(0, dtype=np.float64)
+        matched_rows, impacts = [], []
+        for term in terms:
+            term_rows, term_impacts = self.postings[term]
+            if len(rows) < self.size:
+                # Keep the postings that fall on candidate rows (binary search, no catalog-sized mask)
+                positions = np.minimum(np.searchsorted(rows, term_rows), len(rows) - 1)
+                keep = rows[positions] == term_rows
+                term_rows, term_impacts = term_rows[keep], term_impacts[keep]
+            matched_rows.append(term_rows)
+            impacts.append(term_impacts)
+        if not matched_rows:
+            return EMPTY_ROWS, np.empty(0, dtype=np.float64)
+        matched, inverse = np.unique(np.concatenate(matched_rows), return_inverse=True)
+        return matched, np.bincount(inverse, weights=np.concatenate(impacts), minlength=len(matched))
+
+    def _price_key(self, rows: np.ndarray, direction: Optional[str]) -> np.ndarray:
+        prices = self.index.price[rows]
+        key = prices if direction == 'asc' else -prices if direction == 'desc' else np.zeros(len(rows))
+        # Unpriced rows go last, as in the price sort
+        return np.where(np.isnan(key), np.inf, key)
+
+    def top_k(self, rows: np.ndarray, words: Iterable[str], k: int, price_direction: Optional[str] = None) -> np.ndarray:
+        """The ``k`` best of the sorted candidate ``rows`` for the query ``words``.
+
+        Rows rank by BM25 score, then by price in ``price_direction`` when
+        given, then in catalog order. Candidates matching no query term come
+        after every scored row, in the same tiebreak order. Selection is a
+        partial partition on the scores, so the cost is linear in the matched
+        rows plus k log k for ordering the winners.
+        """
+        if k <= 0:
+            return EMPTY_ROWS
+        rows = np.asarray(rows, dtype=np.int64)
+        matched, scores = self.score(rows, self.query_terms(words))
+        if len(matched) > k:
+            kth = np.partition(-scores, k - 1)[k - 1]
+            # Rows tied with the k-th score all compete on the tiebreak
+            keep = -scores <= kth
+            matched, scores = matched[keep], scores[keep]
+        order = np.lexsort((matched, self._price_key(matched, price_direction), -scores))
+        best = matched[order][:k]
+        if len(best) < k:
+            rest = np.setdiff1d(rows, matched, assume_unique=True)
+            rest = self.index.top_k_by_price(rest, price_direction, k - len(best)) if price_direction else rest[:k - len(best)]
+            best = np.concatenate([best, rest])
+        return best
@@ -0,0 +1,153 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+import numpy as np
+from catalog import CATEGORY_PATTERNS, GENDER_VALUES
+
+# Bytes of the HMAC-SHA256 signature kept in a cursor
+CURSOR_SIGNATURE_BYTES = 16
+
+
+def _terms(pattern: Optional[str]) -> Optional[tuple]:
+    """The ``|``-separated terms CatalogIndex.contains would look up, order-free"""
+    if not pattern:
+        return None
+    return tuple(sorted({term.strip().lower() for term in pattern.split('|') if term.strip()}))
+
+
+def _bound(price: Optional[float]) -> Optional[float]:
+    # Exact bounds: nothing guarantees catalog prices are whole cents, so snapping could merge queries
+    return None if price is None else float(price)
+
+
+def filter_key(gender: str = None, category: str = None, color: str = None, size: str = None,
+               search_term: str = None, min_price: float = None, max_price: float = None,
+               sort_by_price: str = None, limit: int = 100, sort_by_relevance: bool = False) -> tuple:
+    """Canonical form of filter_products arguments; equal keys always select the same rows.
+
+    Gender synonyms collapse to the Gender column value (unknown genders do
+    not filter, so they key like no gender), categories go through
+    CATEGORY_PATTERNS, ``|`` terms are order-free, search words are a set
+    (filter_products deduplicates and sorts them the same way before
+    searching), and price bounds are compared as floats (20 and 20.0 key alike).
+    """
+    gender_value = GENDER_VALUES.get(gender.lower()) if gender else None
+    category_terms = _terms(CATEGORY_PATTERNS.get(category.lower(), category.lower())) if category else None
+    # filter_products only searches on words longer than two characters
+    search_words = tuple(sorted({word for word in search_term.lower().split() if len(word) > 2})) if search_term else ()
+    return (
+        gender_value,
+        category_terms,
+        _terms(color),
+        _terms(size),
+        search_words or None,
+        _bound(min_price),
+        _bound(max_price),
+        sort_by_price.lower() if sort_by_price else None,
+        limit,
+        bool(sort_by_relevance)
+    )
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signature(secret: bytes, payload: bytes) -> bytes:
+    return hmac.new(secret, payload, hashlib.sha256).digest()[:CURSOR_SIGNATURE_BYTES]
+
+
+def encode_cursor(version: str, filters: Dict[str, Any], offset: int, page_size: int, secret: bytes) -> str:
+    """Opaque filter_products page cursor: the snapshot version, the call's filters and the next page, signed with ``secret``"""
+    payload = json.dumps({'v': version, 'f': filters, 'o': offset, 'n': page_size}, separators=(',', ':')).encode('utf-8')
+    return f"{_b64(payload)}.{_b64(_signature(secret, payload))}"
+
+
+def decode_cursor(cursor: str, secret: bytes) -> Tuple[str, Dict[str, Any], int, int]:
+    """(version, filters, offset, page_size) of an ``encode_cursor`` cursor; ValueError when malformed or not signed with ``secret``"""
+    try:
+        body, signature = cursor.split('.')
+        payload = _unb64(body)
+        if not hmac.compare_digest(_unb64(signature), _signature(secret, payload)):
+            raise ValueError("bad signature")
+        fields = json.loads(payload)
+        return str(fields['v']), dict(fields['f']), int(fields['o']), int(fields['n'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+class ResultCache:
+    """LRU cache of filter_products result rows with a time-to-live.
+
+    Entries are row positions into one catalog snapshot, so the cache is
+    emptied whenever a different snapshot is passed in. Responses are still
+    built per call, which keeps the echoed filters and schema per request.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _bind(self, snapshot: Any):
+        if snapshot is not self._snapshot:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._snapshot = snapshot
+
+    def get(self, snapshot: Any, key: tuple) -> Optional[np.ndarray]:
+        with self._lock:
+            self._bind(snapshot)
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, snapshot: Any, key: tuple, rows: np.ndarray):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._bind(snapshot)
+            self._entries[key] = (time.monotonic(), rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,162 @@
+from typing import Any, Dict, List, Optional, Union
+import json
+import numpy as np
+import pandas as pd
+from compact import CompactColumn, column_values
+
+# Response schema versions: 1 is the original product dict with alias keys,
+# 2 is the compact dict without aliases that clients opt into
+FULL_SCHEMA = 1
+COMPACT_SCHEMA = 2
+SCHEMA_VERSIONS = (FULL_SCHEMA, COMPACT_SCHEMA)
+
+DEFAULT_BRAND = 'Nike'
+
+# (output key, source column) in output order; a None column emits DEFAULT_BRAND
+PRODUCT_FIELDS = {
+    FULL_SCHEMA: [
+        ("id", 'ProductID'),
+        ("name", 'Category'),
+        ("brand", None),
+        ("vendor", 'Vendor'),
+        ("description", 'Category.1'),
+        ("detailed_description", 'Detailed description'),
+        ("price", 'Current Price'),
+        ("current_price", 'Current Price'),
+        ("original_price", 'Original Price'),
+        ("image_url", 'Image Url'),
+        ("Image_Url", 'Image Url'),
+        ("product_url", 'Product page url'),
+        ("product_page_url", 'Product page url'),
+        ("sizes", 'Sizes'),
+        ("Sizes", 'Sizes'),
+        ("colors", 'Colors'),
+        ("Colors", 'Colors'),
+        ("colors_available", 'Colors Available'),
+        ("Colors_Available", 'Colors Available'),
+        ("messaging", 'productcard_messaging'),
+        ("productcard_messaging", 'productcard_messaging'),
+        ("offer_percent", 'Offer %'),
+        ("gender", 'Gender'),
+        ("category", 'Category'),
+        ("Category", 'Category')
+    ],
+    COMPACT_SCHEMA: [
+        ("id", 'ProductID'),
+        ("name", 'Category'),
+        ("brand", None),
+        ("vendor", 'Vendor'),
+        ("description", 'Category.1'),
+        ("detailed_description", 'Detailed description'),
+        ("price", 'Current Price'),
+        ("original_price", 'Original Price'),
+        ("image_url", 'Image Url'),
+        ("product_url", 'Product page url'),
+        ("sizes", 'Sizes'),
+        ("colors", 'Colors'),
+        ("colors_available", 'Colors Available'),
+        ("messaging", 'productcard_messaging'),
+        ("offer_percent", 'Offer %'),
+        ("gender", 'Gender')
+    ]
+}
+
+# Recommendations keep their historical shape in schema 1: a 1-based position
+# as "id" (spliced in per response) and no aliases
+RECOMMENDATION_FIELDS = {
+    FULL_SCHEMA: [
+        ("name", 'Category'),
+        ("vendor", 'Vendor'),
+        ("description", 'Category.1'),
+        ("detailed_description", 'Detailed description'),
+        ("price", 'Current Price'),
+        ("original_price", 'Original Price'),
+        ("image_url", 'Image Url'),
+        ("product_url", 'Product page url'),
+        ("sizes", 'Sizes'),
+        ("colors", 'Colors'),
+        ("messaging", 'productcard_messaging'),
+        ("offer_percent", 'Offer %'),
+        ("gender", 'Gender')
+    ],
+    COMPACT_SCHEMA: PRODUCT_FIELDS[COMPACT_SCHEMA]
+}
+
+# Encoded fragments kept per field set; cleared wholesale when full
+FRAGMENT_CACHE_SIZE = 50000
+
+
+def dumps_with_fragments(payload: Dict[str, Any], key: str, fragments: Union[List[str], Dict[str, str]]) -> str:
+    """``json.dumps(payload)`` with ``payload[key]`` spliced in from pre-encoded JSON fragments:
+    an array of a list of fragments, or an object of a dict of fragments by key"""
+    rest = json.dumps({k: v for k, v in payload.items() if k != key})
+    if isinstance(fragments, dict):
+        value = "{" + ", ".join(f"{json.dumps(name)}: {fragment}" for name, fragment in fragments.items()) + "}"
+    else:
+        value = "[" + ", ".join(fragments) + "]"
+    if rest == "{}":
+        return f'{{{json.dumps(key)}: {value}}}'
+    return f'{{{json.dumps(key)}: {value}, {rest[1:]}'
+
+
+class ProductSerializer:
+    """Turns catalog row positions into JSON product objects.
+
+    Each product is encoded once per field set and the JSON fragment cached,
+    so repeated results are assembled by string joins instead of building
+    a dict per row on every call.
+    """
+
+    def __init__(self, df: pd.DataFrame, compact: Optional[Dict[str, CompactColumn]] = None):
+        self.df = df
+        self.compact = compact or {}
+        urls = column_values(df, self.compact, 'Product page url')
+        urls = urls.str.strip() if urls is not None else pd.Series([], dtype='string')
+        # Empty or missing URLs factorize to -1 and are never returned
+        self.url_codes, _ = pd.factorize(urls.mask(urls == ''))
+        self._fragments: Dict[tuple, Dict[int, str]] = {}
+
+    def unique_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Drop rows without a product URL and repeats of an earlier row's URL, keeping order"""
+        rows = np.asarray(rows, dtype=np.int64)
+        codes = self.url_codes[rows]
+        rows, codes = rows[codes >= 0], codes[codes >= 0]
+        _, first = np.unique(codes, return_index=True)
+        return rows[np.sort(first)]
+
+    def _encode(self, rows: np.ndarray, fields: tuple) -> List[str]:
+        columns = list(dict.fromkeys(column for _, column in fields if column is not None))
+        values = self.df.iloc[rows][[column for column in columns if column in self.df.columns]].astype('string').fillna('')
+        for column in columns:
+            if column in self.compact:
+                values[column] = self.compact[column].take(rows.tolist())
+        records = values.to_dict('records')
+        return [
+            json.dumps({
+                key: DEFAULT_BRAND if column is None else str(record.get(column, ''))
+                for key, column in fields
+            })
+            for record in records
+        ]
+
+    def fragments(self, rows: np.ndarray, fields: List[tuple]) -> List[str]:
+        """JSON fragments for ``rows`` over ``fields``, encoding only cache misses"""
+        fields = tuple(fields)
+        cache = self._fragments.setdefault(fields, {})
+        missing = np.array([row for row in rows if row not in cache], dtype=np.int64)
+        if len(missing):
+            if len(cache) + len(missing) > FRAGMENT_CACHE_SIZE:
+                cache.clear()
+            cache.update(zip(missing.tolist(), self._encode(missing, fields)))
+        return [cache[row] for row in rows.tolist()]
+
+    def products(self, rows: np.ndarray, schema_version: int = FULL_SCHEMA) -> List[str]:
+        """Encoded product objects for filter_products results"""
+        return self.fragments(rows, PRODUCT_FIELDS[schema_version])
+
+    def recommendations(self, rows: np.ndarray, schema_version: int = FULL_SCHEMA) -> List[str]:
+        """Encoded product objects for get_similar_products results"""
+        fragments = self.fragments(rows, RECOMMENDATION_FIELDS[schema_version])
+        if schema_version != FULL_SCHEMA:
+            return fragments
+        return [f'{{"id": {position}, {fragment[1:]}' for position, fragment in enumerate(fragments, start=1)]
@@ -0,0 +1,189 @@
+"""Tokenizer and typo correction shared by the MCP server and the chat frontend.
+
+Standard library only. backend/spelling.py and frontend_python/spelling.py
+are identical copies, since each app is built from its own directory; the
+frontend builds its index from the vocabulary the server reports through
+the ``spelling_vocabulary`` tool.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import re
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Query words the catalog text may not contain but which are never typos
+DOMAIN_WORDS = (
+    'men', 'women', 'male', 'female', 'mens', 'womens', 'ladies', 'hoodie', 'hoody', 'pants', 'pant', 'trousers',
+    'shirt', 'tshirt', 't-shirt', 'sweatshirt', 'jacket', 'top', 'sweater', 'jeans', 'dress', 'shoes', 'sneakers',
+    'boots', 'leggings', 'shorts', 'tank', 'black', 'white', 'blue', 'red', 'pink', 'brown', 'gray', 'grey', 'navy',
+    'green', 'small', 'medium', 'large', 'cheap', 'cheapest', 'expensive', 'budget', 'affordable', 'me', 'show',
+    'find', 'want', 'need', 'looking', 'under', 'below', 'above', 'over', 'than', 'less', 'more', 'size', 'price'
+)
+
+# Everyday English that chat messages are full of; never "corrected" into a catalog word
+# ("would" is not "world", "wedding" is not "wearing") even when the catalog lacks it
+COMMON_WORDS = frozenset((
+    'a', 'about', 'after', 'again', 'all', 'also', 'am', 'an', 'and', 'any', 'anything', 'are', 'around', 'as', 'at',
+    'be', 'because', 'been', 'before', 'being', 'best', 'better', 'between', 'both', 'but', 'buy', 'by', 'can',
+    'could', 'did', 'do', 'does', 'doing', 'done', 'each', 'else', 'enough', 'even', 'every', 'for', 'from', 'get',
+    'give', 'go', 'going', 'good', 'got', 'had', 'has', 'have', 'having', 'he', 'hello', 'help', 'her', 'here',
+    'hers', 'hey', 'hi', 'him', 'his', 'how', 'i', 'if', 'in', 'into', 'is', 'it', 'its', 'just', 'know', 'like',
+    'likes', 'love', 'make', 'many', 'may', 'maybe', 'might', 'mine', 'more', 'most', 'much', 'must', 'my', 'myself',
+    'new', 'next', 'nice', 'no', 'not', 'now', 'of', 'off', 'ok', 'okay', 'on', 'once', 'one', 'only', 'or',
+    'other', 'our', 'out', 'own', 'perhaps', 'please', 'pretty', 'prefer', 'probably', 'put', 'really', 'recommend',
+    'right', 'same', 'say', 'see', 'she', 'should', 'similar', 'so', 'some', 'something', 'such', 'suggest',
+    'suggestion', 'suggestions', 'sure', 'take', 'tell', 'thank', 'thanks', 'that', 'the', 'their', 'them', 'then',
+    'there', 'these', 'they', 'thing', 'things', 'think', 'this', 'those', 'though', 'through', 'to', 'too', 'try',
+    'us', 'use', 'very', 'was', 'way', 'we', 'well', 'were', 'what', 'when', 'where', 'which', 'while', 'who',
+    'whom', 'why', 'will', 'wish', 'with', 'without', 'would', 'yes', 'yet', 'you', 'your', 'yours',
+    # Shopping and occasion words
+    'birthday', 'bright', 'casual', 'cheaper', 'color', 'colour', 'cool', 'cute', 'dark', 'date', 'day', 'dinner',
+    'event', 'fancy', 'formal', 'friend', 'gift', 'girlfriend', 'boyfriend', 'husband', 'wife', 'holiday', 'kid',
+    'kids', 'look', 'nicer', 'night', 'office', 'outfit', 'pair', 'party', 'present', 'season', 'style', 'stylish',
+    'summer', 'winter', 'spring', 'autumn', 'fall', 'trip', 'vacation', 'wear', 'wedding', 'weekend', 'work'
+))
+
+# Words this short are left alone: one edit turns them into too many other words
+MIN_CORRECTABLE_LENGTH = 4
+
+# Words shorter than this are corrected at distance 1 only; two edits of a short
+# word reach too many unrelated catalog words ("gift" -> "lift", "dark" -> "park")
+FULL_DISTANCE_MIN_LENGTH = 6
+
+# Looked-up words remembered per index; cleared wholesale when full
+CORRECTION_CACHE_SIZE = 4096
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; possessive "'s" is dropped so "women's" is "women\""""
+    return [token[:-2] if token.endswith("'s") else token for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+def stem(word: str) -> str:
+    """Strip a plural ending ("hoodies" -> "hoodie", "pants" -> "pant"); other words are returned as is"""
+    if len(word) <= 3 or not word.endswith('s') or word.endswith(('ss', 'us', "'s")):
+        return word
+    if word.endswith('sses'):
+        return word[:-2]
+    return word[:-1]
+
+
+def vocabulary_from_texts(texts: Iterable[str]) -> Dict[str, int]:
+    """Token frequencies over ``texts``, plus DOMAIN_WORDS"""
+    counts: Dict[str, int] = {}
+    for text in texts:
+        for token in tokenize(text):
+            counts[token] = counts.get(token, 0) + 1
+    for word in DOMAIN_WORDS:
+        counts.setdefault(word, 1)
+    return counts
+
+
+def _deletes(word: str, distance: int) -> set:
+    """``word`` with up to ``distance`` characters removed"""
+    results = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {candidate[:i] + candidate[i + 1:] for candidate in frontier for i in range(len(candidate))}
+        results |= frontier
+    return results
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Optimal-string-alignment distance (adjacent transpositions count once).
+
+    Bit-parallel (Hyyrö 2003): one machine word holds a whole column of the
+    edit matrix for ``a``, so each character of ``b`` costs a few integer ops.
+    """
+    m = len(a)
+    if not m:
+        return len(b)
+    positions: Dict[str, int] = {}
+    for i, ch in enumerate(a):
+        positions[ch] = positions.get(ch, 0) | (1 << i)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    vp, vn, d0, previous, distance = mask, 0, 0, 0, m
+    for ch in b:
+        pm = positions.get(ch, 0)
+        transposed = (((~d0) & pm) << 1) & previous
+        d0 = ((((pm & vp) + vp) ^ vp) | pm | vn | transposed) & mask
+        hp = vn | (~(d0 | vp) & mask)
+        hn = d0 & vp
+        if hp & last:
+            distance += 1
+        elif hn & last:
+            distance -= 1
+        hp = ((hp << 1) | 1) & mask
+        hn = (hn << 1) & mask
+        vp = hn | (~(d0 | hp) & mask)
+        vn = hp & d0
+        previous = pm
+    return distance
+
+
+class SpellingIndex:
+    """Symmetric-delete typo lookup over a word vocabulary.
+
+    Every vocabulary word is stored under each string reachable by deleting
+    up to ``max_distance`` characters. A query word generates its own
+    deletes the same way; vocabulary words sharing one of them are the only
+    candidates, so a lookup costs a few dozen dict probes and a handful of
+    exact distance checks regardless of vocabulary size.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], max_distance: int = 2):
+        self.vocabulary = vocabulary
+        self.max_distance = max_distance
+        self._deletes: Dict[str, List[str]] = {}
+        self._corrections: Dict[str, Optional[str]] = {}
+        for word in vocabulary:
+            if len(word) < MIN_CORRECTABLE_LENGTH - 1:
+                continue
+            for deleted in _deletes(word, max_distance):
+                self._deletes.setdefault(deleted, []).append(word)
+
+    def __len__(self) -> int:
+        return len(self.vocabulary)
+
+    def is_known(self, word: str) -> bool:
+        # Plurals of known words are not typos
+        return word in self.vocabulary or (word.endswith('s') and word[:-1] in self.vocabulary)
+
+    def correct(self, word: str) -> Optional[str]:
+        """The closest, most frequent vocabulary word to an unknown ``word``, or None"""
+        if len(word) < MIN_CORRECTABLE_LENGTH or not word.isalpha() or self.is_known(word) or word in COMMON_WORDS:
+            return None
+        if word in self._corrections:
+            return self._corrections[word]
+        limit = self.max_distance if len(word) >= FULL_DISTANCE_MIN_LENGTH else min(self.max_distance, 1)
+        candidates = {candidate for deleted in _deletes(word, limit)
+                      for candidate in self._deletes.get(deleted, ())}
+        best: Optional[Tuple[int, bool, int, str]] = None
+        # Closest lengths first, so a good match found early tightens the distance bound for the rest
+        for candidate in sorted(candidates, key=lambda c: abs(len(c) - len(word))):
+            if abs(len(candidate) - len(word)) > limit:
+                break
+            distance = edit_distance(word, candidate)
+            if distance <= limit:
+                # Typos rarely change the first letter ("jean" is "jeans", not "mean")
+                key = (distance, candidate[0] != word[0], -self.vocabulary[candidate], candidate)
+                if best is None or key < best:
+                    best = key
+                    limit = distance
+        correction = best[-1] if best else None
+        if len(self._corrections) >= CORRECTION_CACHE_SIZE:
+            self._corrections.clear()
+        self._corrections[word] = correction
+        return correction
+
+    def correct_tokens(self, tokens: List[str]) -> Tuple[List[str], List[Tuple[str, str]]]:
+        """``tokens`` with typos replaced, and the (typo, correction) pairs applied"""
+        corrected, corrections = [], []
+        for token in tokens:
+            replacement = self.correct(token)
+            if replacement:
+                corrections.append((token, replacement))
+                corrected.append(replacement)
+            else:
+                corrected.append(token)
+        return corrected, corrections
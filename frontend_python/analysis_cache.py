@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def analysis_key(product_id: str, model: str, prompt: str) -> str:
+    """Cache key: the product plus a hash of everything the analysis prompt was built from"""
+    digest = hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()[:24]
+    return f"{product_id}:{digest}"
+
+
+class AnalysisCache:
+    """Claude product analyses kept on local disk, with a TTL and a bounded entry count.
+
+    Entries live in a SQLite file so they survive restarts and are shared by
+    the worker processes on a host. Past ``max_entries`` the least recently
+    used entries are evicted. Concurrent lookups of a key that is not cached
+    share a single in-flight call (single flight), so a burst of clicks on
+    one product costs one Claude request.
+    """
+
+    def __init__(self, path: str, ttl: float, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if max_entries > 0:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analyses (key TEXT PRIMARY KEY, product_id TEXT, analysis TEXT, "
+                "created_at REAL, accessed_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS analyses_accessed ON analyses (accessed_at)")
+
+    @property
+    def enabled(self) -> bool:
+        return self._db is not None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT analysis, created_at FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE analyses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, product_id: str, analysis: Dict[str, Any]):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?)",
+                (key, product_id, json.dumps(analysis), now, now)
+            )
+            expired = self._db.execute("DELETE FROM analyses WHERE created_at < ?", (now - self.ttl,)).rowcount
+            # Least recently used entries beyond the bound
+            overflow = self._db.execute(
+                "DELETE FROM analyses WHERE key IN (SELECT key FROM analyses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            self.evictions += max(expired, 0) + max(overflow, 0)
+
+    async def get_or_compute(self, key: str, product_id: str,
+                             compute: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        """The cached analysis for ``key``, or the result of ``compute()`` (cached unless None)"""
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        pending = asyncio.ensure_future(self._compute(key, product_id, compute))
+        self._inflight[key] = pending
+        pending.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A caller that goes away does not cancel the call other callers are waiting on
+        return await asyncio.shield(pending)
+
+    async def _compute(self, key: str, product_id: str,
+                       compute: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        analysis = await compute()
+        if analysis is not None:
+            self.put(key, product_id, analysis)
+        return analysis
+
+    def stats(self) -> Dict[str, Any]:
+        entries = 0
+        if self.enabled:
+            with self._lock:
+                entries = self._db.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else None
+        }
@@ -1,74 +1,226 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 import asyncio
 import json
 import re
-from typing import Dict, List, Any
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 import anthropic
+import httpx
 from mcp_client import mcp_client
-from config import ANTHROPIC_API_KEY
+from chat_context import UsageTracker, compact_history, drop_stale_tool_results
+from query_parser import FastPathStats, fast_path_miss, parse_query
+from spelling_client import CatalogSpeller
+from analysis_cache import AnalysisCache, analysis_key
+from config import (
+    ANTHROPIC_API_KEY,
+    ANTHROPIC_BASE_URL,
+    ANTHROPIC_MAX_CONNECTIONS,
+    ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS,
+    ANTHROPIC_KEEPALIVE_EXPIRY,
+    ANTHROPIC_CONNECT_TIMEOUT,
+    ANTHROPIC_TIMEOUT,
+    ANTHROPIC_MAX_RETRIES,
+    CHAT_MAX_TOOL_ROUNDS,
+    CHAT_TIME_BUDGET,
+    CHAT_TOOL_RESULT_PRODUCTS,
+    CHAT_HISTORY_TOKEN_BUDGET,
+    CHAT_HISTORY_KEEP_MESSAGES,
+    CHAT_FAST_PATH,
+    CHAT_FAST_PATH_MIN_CONFIDENCE,
+    RECOMMENDATION_LLM_ANALYSIS,
+    ANALYSIS_CACHE_PATH,
+    ANALYSIS_CACHE_TTL,
+    ANALYSIS_CACHE_SIZE,
+)
 import os
 
 # Create Flask app
 app = Flask(__name__)
 
-# Initialize Anthropic client
-def get_anthropic_client():
-    return anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+# Anthropic clients shared by every request, one per event loop: a client's connection
+# pool belongs to the loop that created it. Never evicted while their loop is open
+# (the Flask loop thread and the ASGI server's loop); dropped once it is closed
+_anthropic_clients: Dict[asyncio.AbstractEventLoop, anthropic.AsyncAnthropic] = {}
+
+def get_anthropic_client() -> anthropic.AsyncAnthropic:
+    loop = asyncio.get_running_loop()
+    client = _anthropic_clients.get(loop)
+    if client is None:
+        for closed in [other for other in _anthropic_clients if other.is_closed()]:
+            del _anthropic_clients[closed]
+        # Keep-alive connections are reused across chats instead of a TLS handshake per call
+        http_client = anthropic.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=ANTHROPIC_MAX_CONNECTIONS,
+                max_keepalive_connections=ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=ANTHROPIC_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(ANTHROPIC_TIMEOUT, connect=ANTHROPIC_CONNECT_TIMEOUT)
+        )
+        client = _anthropic_clients[loop] = anthropic.AsyncAnthropic(
+            api_key=ANTHROPIC_API_KEY,
+            base_url=ANTHROPIC_BASE_URL,
+            max_retries=ANTHROPIC_MAX_RETRIES,
+            timeout=httpx.Timeout(ANTHROPIC_TIMEOUT, connect=ANTHROPIC_CONNECT_TIMEOUT),
+            http_client=http_client
+        )
+    return client
 
-# Routes
-@app.route('/')
-def index():
-    return render_template('index.html')
+# Token usage of chat requests, reported by /api/metrics
+chat_usage = UsageTracker()
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
+# Chat messages answered by the local query parser, reported by /api/metrics
+fast_path = FastPathStats()
+
+# Typo correction for chat messages, against the vocabulary of the MCP server's catalog
+speller = CatalogSpeller()
+
+# Claude product analyses for recommendations, persisted on local disk
+PRODUCT_ANALYSIS_MODEL = "claude-sonnet-4-5-20250929"
+analysis_cache = AnalysisCache(ANALYSIS_CACHE_PATH, ttl=ANALYSIS_CACHE_TTL, max_entries=ANALYSIS_CACHE_SIZE)
+
+# Flask views are sync: their coroutines all run on one long-lived loop
+# instead of a new loop per request (asgi.py serves them natively)
+_loop = None
+_loop_lock = threading.Lock()
+
+def run_async(coro):
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="flask-async", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+def iter_async(agen: AsyncIterator):
+    """Drive an async generator on the shared loop from a sync (streaming) Flask view"""
+    async def _next():
+        try:
+            return True, await agen.__anext__()
+        except StopAsyncIteration:
+            return False, None
+    try:
+        while True:
+            more, item = run_async(_next())
+            if not more:
+                return
+            yield item
+    finally:
+        # Also reached through GeneratorExit when the client disconnects mid-stream: close the
+        # async generator on its loop so its Anthropic stream and tool tasks are released
+        run_async(agen.aclose())
+
+async def cancel_tasks(tasks):
+    """Cancel whichever of ``tasks`` are still running and wait for all of them, retrieving their errors"""
+    tasks = list(tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+# Request handlers shared by the Flask views below and the ASGI app in asgi.py;
+# each returns (JSON payload, HTTP status)
+async def handle_chat(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
     """Handle chat messages and return AI response with products"""
     try:
-        data = request.get_json()
         user_message = data.get('message', '')
         conversation_history = data.get('conversationHistory', [])
         image_data = data.get('imageData', None)  # Optional image data from Virtual Try On
         
         if not user_message:
-            return jsonify({'error': 'No message provided'}), 400
+            return {'error': 'No message provided'}, 400
         
-        # Call LLM with tools (sync) and conversation history, pass image if provided
-        response = asyncio.run(call_llm_with_tools(user_message, conversation_history, image_data))
+        # Call LLM with tools and conversation history, pass image if provided
+        response = await call_llm_with_tools(user_message, conversation_history, image_data)
         
-        return jsonify({
+        return {
             'message': response['message'],
             'products': response.get('products', []),
             'is_clarification': response.get('is_clarification', False)
-        })
+        }, 200
         
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+        return {'error': f'Internal server error: {str(e)}'}, 500
 
-@app.route('/api/recommendations', methods=['POST'])
-def get_recommendations():
+async def handle_recommendations(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
     """Get product recommendations"""
     try:
-        data = request.get_json()
         product = data.get('product', {})
         search_context = data.get('searchContext', {})
         
         if not product:
-            return jsonify({'error': 'No product provided'}), 400
+            return {'error': 'No product provided'}, 400
         
-        # Get recommendations using MCP client (sync) with search context
-        recommendations = asyncio.run(get_similar_products(product, search_context))
+        # Get recommendations using MCP client with search context
+        recommendations = await get_similar_products(product, search_context)
         
-        return jsonify({
+        return {
             'success': True,
             'recommendations': recommendations
-        })
+        }, 200
         
     except Exception as e:
         print(f"Error in recommendations endpoint: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return {'error': 'Internal server error'}, 500
+
+def format_sse(event: str, payload: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+async def stream_chat_events(data: Dict[str, Any]) -> AsyncIterator[str]:
+    """Server-Sent Events for a chat turn: text deltas, early products, then the final response"""
+    try:
+        async for event, payload in stream_llm_with_tools(
+            data.get('message', ''), data.get('conversationHistory', []), data.get('imageData', None)
+        ):
+            if event == 'done':
+                payload = {
+                    'message': payload['message'],
+                    'products': payload.get('products', []),
+                    'is_clarification': payload.get('is_clarification', False)
+                }
+            yield format_sse(event, payload)
+    except Exception as e:
+        print(f"Error in chat stream: {e}")
+        yield format_sse('error', {'error': f'Internal server error: {str(e)}'})
+
+def get_metrics() -> Dict[str, Any]:
+    """Report runtime metrics for capacity tuning"""
+    return {
+        'mcp_pool': mcp_client.stats(),
+        'chat': chat_usage.stats(),
+        'fast_path': fast_path.stats(),
+        'analysis_cache': analysis_cache.stats()
+    }
+
+# Routes
+@app.route('/')
+def index():
+    return render_template('index.html')
+
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    payload, status = run_async(handle_chat(request.get_json(silent=True) or {}))
+    return jsonify(payload), status
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.get_json(silent=True) or {}
+    if not data.get('message'):
+        return jsonify({'error': 'No message provided'}), 400
+    return Response(iter_async(stream_chat_events(data)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/recommendations', methods=['POST'])
+def get_recommendations():
+    payload, status = run_async(handle_recommendations(request.get_json(silent=True) or {}))
+    return jsonify(payload), status
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    return jsonify(get_metrics())
 
 
 def extract_entities_from_conversation(messages):
@@ -90,14 +242,12 @@ def extract_entities_from_conversation(messages):
 def style_quiz_removed():
     return jsonify({'error': 'Deprecated. Use /api/style_agent'}), 410
 
-@app.route('/api/style_agent', methods=['POST'])
-def style_agent():
+async def handle_style_agent(data: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
     """Fashion preference agent using Claude.
     Request: { messages: [{role:'user'|'assistant', content:str}] }
     Response: { assistant: str, done: bool, preferences?: object, summary?: str }
     """
     try:
-        data = request.get_json() or {}
         messages = data.get('messages') or []
 
         # Count assistant questions asked
@@ -139,7 +289,7 @@ When you're ready to finish (after 6-7 questions):
             formatted_messages = [{ 'role': 'user', 'content': 'Start by introducing yourself and asking the first question.' }]
 
         client = get_anthropic_client()
-        resp = client.messages.create(
+        resp = await client.messages.create(
             model="claude-sonnet-4-5-20250929",
             max_tokens=600,
             system=system_prompt,
@@ -180,17 +330,22 @@ When you're ready to finish (after 6-7 questions):
             # Remove [DONE] marker from displayed text
             text = text.replace('[DONE]', '').replace('[done]', '').strip()
 
-        return jsonify({ 
+        return { 
             'assistant': text or 'Hello! I\'d love to understand your fashion preferences. What colors do you usually gravitate toward?', 
             'done': done,
             'summary': summary if done else None
-        })
+        }, 200
 
     except Exception as e:
         print('style_agent error:', e)
         import traceback
         traceback.print_exc()
-        return jsonify({ 'assistant': f'Sorry, something went wrong: {str(e)}', 'done': False }), 200
+        return { 'assistant': f'Sorry, something went wrong: {str(e)}', 'done': False }, 200
+
+@app.route('/api/style_agent', methods=['POST'])
+def style_agent():
+    payload, status = run_async(handle_style_agent(request.get_json(silent=True) or {}))
+    return jsonify(payload), status
 
 def detect_confirmation_response(message: str) -> bool:
     """Detect if user is confirming a previous correction or suggestion"""
@@ -203,75 +358,89 @@ def detect_confirmation_response(message: str) -> bool:
     message_lower = message.lower().strip()
     return message_lower in confirmation_words or any(word in message_lower for word in confirmation_words)
 
-def detect_and_correct_fashion_typos(text: str) -> str:
-    """Detect and suggest corrections for common fashion-related typos"""
-    common_typos = {
-        'woem': 'women',
-        'womrn': 'women', 
-        'womens': 'women\'s',
-        'mens': 'men\'s',
-        'hoodie': 'hoodie',
-        'hoody': 'hoodie',
-        'hoodies': 'hoodies',
-        'sweater': 'sweater',
-        'sweaters': 'sweaters',
-        'pants': 'pants',
-        'pant': 'pants',
-        'jeans': 'jeans',
-        'jean': 'jeans',
-        'shirt': 'shirt',
-        'shirts': 'shirts',
-        'dress': 'dress',
-        'dresses': 'dresses',
-        'jacket': 'jacket',
-        'jackets': 'jackets',
-        'shoes': 'shoes',
-        'shoe': 'shoes',
-        'sneaker': 'sneakers',
-        'sneakers': 'sneakers',
-        'boots': 'boots',
-        'boot': 'boots',
-        'leggings': 'leggings',
-        'legging': 'leggings',
-        'shorts': 'shorts',
-        'short': 'shorts',
-        'tank': 'tank top',
-        'tanks': 'tank tops',
-        'tshirt': 't-shirt',
-        'tshirts': 't-shirts',
-        't-shirt': 't-shirt',
-        't-shirts': 't-shirts'
-    }
-    
-    corrected_text = text.lower()
-    corrections_made = []
+async def detect_and_correct_fashion_typos(text: str) -> Tuple[str, List[str]]:
+    """Detect and suggest corrections for fashion-related typos using the catalog vocabulary"""
+    return await speller.correct(mcp_client, text)
+
+# Product fields Claude sees in tool results; the cards get the full objects
+LLM_PRODUCT_FIELDS = ('id', 'name', 'description', 'price', 'original_price', 'colors', 'sizes', 'gender')
+
+def _trim_tool_result(tool_result: Dict[str, Any]) -> Dict[str, Any]:
+    summary = {}
+    for key, value in tool_result.items():
+        if key in ('products', 'recommendations') and isinstance(value, list):
+            summary[key] = [
+                {field: item[field] for field in LLM_PRODUCT_FIELDS if field in item}
+                for item in value[:CHAT_TOOL_RESULT_PRODUCTS]
+            ]
+        elif key == 'results' and isinstance(value, dict):
+            # filter_products_batch: one filter_products result per spec
+            summary[key] = {name: _trim_tool_result(result) for name, result in value.items()}
+        else:
+            summary[key] = value
+    return summary
+
+def summarize_tool_result(tool_result: Dict[str, Any]) -> str:
+    """Tool output as fed back to Claude, with product lists trimmed to what it reasons about"""
+    return json.dumps(_trim_tool_result(tool_result))
+
+def result_products(tool_name: str, tool_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Product cards a search tool returned, in order; batch results are taken spec by spec"""
+    if not tool_result.get("success"):
+        return []
+    if tool_name in ("filter_products", "find_similar_products"):
+        return tool_result.get("products", [])
+    if tool_name == "filter_products_batch":
+        return [
+            product
+            for result in tool_result.get("results", {}).values() if result.get("success")
+            for product in result.get("products", [])
+        ]
+    return []
+
+def merge_products(shown: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Append new product cards, skipping ones already shown"""
+    seen = {product.get('product_url') or product.get('id') for product in shown}
+    merged = list(shown)
+    for product in new:
+        key = product.get('product_url') or product.get('id')
+        if key not in seen:
+            seen.add(key)
+            merged.append(product)
+    return merged
+
+async def answer_from_parsed_query(user_message: str) -> Optional[Dict[str, Any]]:
+    """Answer a simple search by calling filter_products with locally parsed filters.
+
+    Returns the final response, or None when the message needs Claude (the
+    parser is unsure, a category or gender is missing, or the tool fails).
+    """
+    started = time.monotonic()
+    parsed = parse_query(user_message)
+    miss = fast_path_miss(parsed, CHAT_FAST_PATH_MIN_CONFIDENCE)
+    if miss:
+        fast_path.record_miss(miss)
+        return None
     
-    for typo, correction in common_typos.items():
-        if typo in corrected_text:
-            corrected_text = corrected_text.replace(typo, correction)
-            corrections_made.append(f"'{typo}' → '{correction}'")
+    print(f"Fast path filters: {parsed['filters']}")
+    tool_result = await mcp_client.call_tool("filter_products", parsed['filters'])
+    if not tool_result.get("success"):
+        fast_path.record_miss('tool_error')
+        return None
     
-    return corrected_text, corrections_made
+    products = merge_products([], tool_result.get("products", []))
+    if products:
+        message = f"I found {len(products)} products that match your request! Here are some great options:"
+    else:
+        message = tool_result.get("message") or "I couldn't find any products matching your search. Could you try different keywords or adjust your filters?"
+    fast_path.record_hit(started)
+    return {
+        'message': message,
+        'products': products
+    }
 
-async def call_llm_with_tools(user_message: str, conversation_history: list = None, image_data: str = None) -> Dict[str, Any]:
-    """Call Anthropic Claude with MCP tools, optionally with image support"""
-    anthropic_client = get_anthropic_client()
-    
-    try:
-        # Check for typos and prepare enhanced message
-        corrected_text, corrections_made = detect_and_correct_fashion_typos(user_message)
-        
-        # If corrections were made, include them in the context
-        enhanced_message = user_message
-        if corrections_made:
-            correction_note = f"Note: I detected some potential typos and will use the corrected terms: {', '.join(corrections_made)}"
-            enhanced_message = f"{user_message}\n\n{correction_note}"
-        
-        # Get available tools
-        tools = await mcp_client.get_tools_for_llm()
-        
-        # Create the system prompt
-        system_prompt = """You are Sara, a professional AI fashion assistant and stylist. Your role is to:
+# System prompt of the shopping chat
+CHAT_SYSTEM_PROMPT = """You are Sara, a professional AI fashion assistant and stylist. Your role is to:
 1. Provide personalized fashion advice and feedback to customers
 2. Filter and recommend products based on their specific needs
 3. Combine fashion expertise with practical product recommendations
@@ -392,6 +561,7 @@ IMPORTANT CONVERSATION RULES:
 - Make the conversation feel natural and helpful
 - CRITICAL: When user confirms with "yes", "ok", etc., you MUST immediately call the appropriate tool (filter_products or get_similar_products)
 - Don't just say you'll search - actually call the tool!
+- When one request needs several kinds of items (e.g. a top, pants and a jacket for an outfit), make ONE filter_products_batch call with a spec per item instead of several filter_products calls
 - CRITICAL: For follow-up questions about existing results (e.g., "which one for dark skin", "cheaper ones"), ALWAYS use filter_products to show filtered products, NEVER just give text advice
 - IMPORTANT: When calling filter_products for recommendation questions (asking which works better, which suits them):
   * Your message MUST include a brief explanation of WHY these items work for them
@@ -401,6 +571,42 @@ IMPORTANT CONVERSATION RULES:
 
 Always be encouraging, helpful, and focus on helping the customer find exactly what they're looking for. If you're unsure about their request, ask questions to better understand their needs."""
 
+async def stream_llm_with_tools(user_message: str, conversation_history: list = None,
+                                image_data: str = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Call Anthropic Claude with MCP tools, yielding (event, payload) pairs as the answer forms.
+
+    'text' carries Claude's text deltas as they arrive, 'products' is sent
+    with every product card found so far each time a round of filter_products
+    calls returns, and the last event, 'done', carries the final response
+    (message, products, is_clarification). Simple first-turn searches the
+    local query parser fully understands are answered without calling Claude.
+    """
+    # Typos are corrected first, so the fast path reads the same words Claude is told about
+    corrected_text, corrections_made = await detect_and_correct_fashion_typos(user_message)
+    if CHAT_FAST_PATH and not image_data:
+        if conversation_history:
+            # A follow-up ("cheaper ones", "in black") depends on earlier turns only Claude sees
+            fast_path.record_miss('follow_up')
+        else:
+            fast_response = await answer_from_parsed_query(corrected_text)
+            if fast_response:
+                yield 'products', {'products': fast_response['products']}
+                yield 'done', fast_response
+                return
+    
+    anthropic_client = get_anthropic_client()
+    usage = chat_usage.start_request()
+    
+    try:
+        # If corrections were made, include them in the context
+        enhanced_message = user_message
+        if corrections_made:
+            correction_note = f"Note: I detected some potential typos and will use the corrected terms: {', '.join(corrections_made)}"
+            enhanced_message = f"{user_message}\n\n{correction_note}"
+        
+        # Get available tools
+        tools = await mcp_client.get_tools_for_llm()
+        
         print(f"Calling Claude with {len(tools)} tools")
         print(f"Tools: {[tool['name'] for tool in tools]}")
         
@@ -414,6 +620,12 @@ Always be encouraging, helpful, and focus on helping the customer find exactly w
                     "role": msg.get("role", "user"),
                     "content": msg.get("content", "")
                 })
+            
+            # Past the token budget, older turns are folded into a short summary
+            messages, compaction = compact_history(messages, CHAT_HISTORY_TOKEN_BUDGET, CHAT_HISTORY_KEEP_MESSAGES)
+            if compaction:
+                usage["history_tokens_saved"] = compaction["before"] - compaction["after"]
+                print(f"Compacted history from ~{compaction['before']} to ~{compaction['after']} tokens")
         
         # Add current message - with image if provided
         if image_data:
@@ -455,94 +667,96 @@ Always be encouraging, helpful, and focus on helping the customer find exactly w
             "content": message_content
         })
         
-        # Call Claude with tool calling
-        response = anthropic_client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=4000,
-            system=system_prompt,
-            messages=messages,
-            tools=tools
-        )
-        
-        # Process the response
-        print(f"Claude response: {response}")
-        print(f"Response content: {response.content}")
-        print(f"Number of content blocks: {len(response.content)}")
-        
-        if response.content:
-            # Check if there are multiple content blocks
-            tool_use_found = False
-            text_response = ""
+        # Agentic tool loop: stream a turn, run all of its tool calls concurrently,
+        # feed the results back and let Claude continue, within the round and time budgets
+        deadline = time.monotonic() + CHAT_TIME_BUDGET
+        products = []       # product cards shown so far, across rounds
+        texts = []          # Claude's text from every turn
+        last_tool = None    # (name, result) of the most recent tool call
+        tools_used = False
+        round_number = 0
+        while True:
+            follow_up = round_number > 0
+            # On the last allowed round Claude has to answer from the results it already has
+            tool_choice = {"type": "none"} if round_number >= CHAT_MAX_TOOL_ROUNDS else {"type": "auto"}
+            options = {"tool_choice": tool_choice} if tools else {}
+            if follow_up:
+                # Follow-up turns only get what is left of the time budget, and earlier
+                # rounds' product payloads once the context outgrows its budget
+                options["timeout"] = max(deadline - time.monotonic(), 1.0)
+                usage["tool_results_dropped"] += drop_stale_tool_results(messages, CHAT_HISTORY_TOKEN_BUDGET)
+            tool_tasks = {}
+            if follow_up and texts:
+                yield 'text', {'delta': ' '}
+            try:
+                try:
+                    async with anthropic_client.messages.stream(
+                        model="claude-sonnet-4-5-20250929",
+                        max_tokens=4000,
+                        # The system prompt and tool definitions are identical on every call; cache them
+                        system=[{"type": "text", "text": CHAT_SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}],
+                        messages=messages,
+                        tools=tools,
+                        **options
+                    ) as stream:
+                        async for event in stream:
+                            if event.type == 'text':
+                                yield 'text', {'delta': event.text}
+                            elif event.type == 'content_block_stop' and event.content_block.type == 'tool_use':
+                                # Start each tool call as soon as its block is complete, while Claude keeps writing
+                                block = event.content_block
+                                print(f"Tool use detected: {block.name}")
+                                print(f"Tool input: {block.input}")
+                                tool_tasks[block.id] = asyncio.create_task(mcp_client.call_tool(block.name, block.input))
+                        response = await stream.get_final_message()
+                    chat_usage.add_call(usage, response.usage)
+                except anthropic.APITimeoutError:
+                    if not follow_up:
+                        raise
+                    print("Chat time budget spent waiting for Claude; answering from the tool results so far")
+                    break
             
-            for i, message_content in enumerate(response.content):
-                print(f"Content block {i}: {message_content}")
-                print(f"Content type: {type(message_content)}")
-                
-                if hasattr(message_content, 'type') and message_content.type == 'tool_use':
-                    # Tool calling response
-                    tool_name = message_content.name
-                    tool_input = message_content.input
-                    
-                    print(f"Tool use detected: {tool_name}")
-                    print(f"Tool input: {tool_input}")
-                    
-                    # Call the MCP tool
-                    tool_result = await mcp_client.call_tool(tool_name, tool_input)
-                    
+                print(f"Claude response (round {round_number}): {response}")
+                turn_text = " ".join(block.text for block in response.content if block.type == 'text').strip()
+                if turn_text:
+                    texts.append(turn_text)
+                tool_uses = [block for block in response.content if block.type == 'tool_use']
+                if not tool_uses:
+                    break
+            
+                tools_used = True
+                results = await asyncio.gather(*(
+                    tool_tasks.get(block.id) or mcp_client.call_tool(block.name, block.input) for block in tool_uses
+                ))
+                for block, tool_result in zip(tool_uses, results):
                     print(f"Tool result: {tool_result}")
-                    
-                    # Return response based on tool
-                    if tool_name == "filter_products" and tool_result.get("success"):
-                        product_count = len(tool_result.get("products", []))
-                        if product_count > 0:
-                            # Check if there was text response before the tool use
-                            advice_text = ""
-                            # Look for text content before the tool use
-                            for j in range(i-1, -1, -1):
-                                if hasattr(response.content[j], 'text'):
-                                    advice_text = response.content[j].text
-                                    break
-                            
-                            # If no advice text, use default message
-                            if not advice_text:
-                                advice_text = f"I found {product_count} products that match your request! Here are some great options:"
-                            
-                            return {
-                                'message': advice_text,
-                                'products': tool_result.get("products", [])
-                            }
-                        else:
-                            # No results found - provide helpful suggestions
-                            backend_message = tool_result.get("message", "")
-                            if backend_message:
-                                return {
-                                    'message': backend_message,
-                                    'products': []
-                                }
-                            else:
-                                # Provide helpful suggestions when no results - keep it short (max 2 sentences)
-                                return {
-                                    'message': "I couldn't find any products matching your search. Could you try different keywords or adjust your filters?",
-                                    'products': []
-                                }
-                    elif tool_name == "get_similar_products":
-                        rec_count = len(tool_result.get("recommendations", []))
-                        return {
-                            'message': f"I found {rec_count} similar products for you!",
-                            'products': []
-                        }
-                    else:
-                        return {
-                            'message': f"I used the {tool_name} tool to help with your request.",
-                            'products': []
-                        }
-                
-                elif hasattr(message_content, 'text'):
-                    text_response += message_content.text + " "
+                    last_tool = (block.name, tool_result)
+                    products = merge_products(products, result_products(block.name, tool_result))
+            finally:
+                # Tool calls started mid-stream must not outlive a round that timed out or failed
+                await cancel_tasks(tool_tasks.values())
+            if products:
+                yield 'products', {'products': products}
             
-            # If we get here, it was a text-only response
-            if text_response.strip():
-                print(f"Text-only response: {text_response}")
+            messages.append({"role": "assistant", "content": response.content})
+            messages.append({"role": "user", "content": [
+                {
+                    "type": "tool_result",
+                    "tool_use_id": block.id,
+                    "content": summarize_tool_result(tool_result),
+                    "is_error": not tool_result.get("success", False)
+                }
+                for block, tool_result in zip(tool_uses, results)
+            ]})
+            round_number += 1
+            if time.monotonic() >= deadline:
+                print("Chat time budget spent; answering from the tool results so far")
+                break
+        
+        message = " ".join(texts).strip()
+        if not tools_used:
+            if message:
+                print(f"Text-only response: {message}")
                 
                 # Check if this looks like a clarification question or typo correction
                 clarification_indicators = [
@@ -553,32 +767,86 @@ Always be encouraging, helpful, and focus on helping the customer find exactly w
                     "are you looking for", "what's your budget", "what occasion"
                 ]
                 
-                is_clarification = any(indicator in text_response.lower() for indicator in clarification_indicators)
+                is_clarification = any(indicator in message.lower() for indicator in clarification_indicators)
                 
-                return {
-                    'message': text_response.strip(),
+                yield 'done', {
+                    'message': message,
                     'products': [],
                     'is_clarification': is_clarification
                 }
+                return
+            
+            print("No valid content in response")
+            yield 'done', {
+                'message': "I'm sorry, I couldn't process your request right now.",
+                'products': []
+            }
+            return
+        
+        if not message:
+            # Claude said nothing around its tool calls; describe the last result instead
+            tool_name, tool_result = last_tool
+            if products:
+                message = f"I found {len(products)} products that match your request! Here are some great options:"
+            elif tool_name in ("filter_products", "filter_products_batch"):
+                # No results found - keep it short (max 2 sentences)
+                message = tool_result.get("message") or "I couldn't find any products matching your search. Could you try different keywords or adjust your filters?"
+            elif tool_name == "get_similar_products":
+                message = f"I found {len(tool_result.get('recommendations', []))} similar products for you!"
+            else:
+                message = f"I used the {tool_name} tool to help with your request."
         
-        print("No valid content in response")
-        return {
-            'message': "I'm sorry, I couldn't process your request right now.",
-            'products': []
+        yield 'done', {
+            'message': message,
+            'products': products
         }
         
     except Exception as e:
         print(f"Error calling LLM: {e}")
         import traceback
         traceback.print_exc()
-        return {
+        yield 'done', {
             'message': "I'm sorry, I'm having trouble processing your request right now.",
             'products': []
         }
+    finally:
+        chat_usage.finish_request(usage)
+        print(f"Chat token usage: {usage}")
+
+async def call_llm_with_tools(user_message: str, conversation_history: list = None, image_data: str = None) -> Dict[str, Any]:
+    """Call Anthropic Claude with MCP tools, optionally with image support"""
+    async for event, payload in stream_llm_with_tools(user_message, conversation_history, image_data):
+        if event == 'done':
+            return payload
+
+def search_context_price_filters(search_context: Dict[str, Any] = None) -> Dict[str, float]:
+    """The price bounds of the user's original search, as get_similar_products arguments"""
+    filters = {}
+    search_filters = (search_context or {}).get('filtersApplied') or {}
+    for key in ('max_price', 'min_price'):
+        if search_filters.get(key):
+            filters[key] = search_filters[key]
+            print(f"Applied search context {key}: ${search_filters[key]}")
+    return filters
 
 async def get_similar_products(product: Dict[str, Any], search_context: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-    """Get recommendations for a product using AI analysis and search context"""
+    """Get recommendations for a product from the precomputed table, or using AI analysis and search context"""
     try:
+        # Catalog products carry their ProductID as "id" (recommendation cards carry a position instead)
+        product_id = product.get('id') if isinstance(product.get('id'), str) else None
+        if product_id and not RECOMMENDATION_LLM_ANALYSIS:
+            result = await mcp_client.call_tool("get_similar_products", {
+                "product_description": product.get("description", ""),
+                "current_product": json.dumps(product),
+                "product_id": product_id,
+                "limit": 4,
+                **search_context_price_filters(search_context)
+            })
+            if result.get("success") and result.get("source") == "table":
+                recommendations = result.get("recommendations", [])
+                print(f"Found {len(recommendations)} precomputed recommendations for {product_id}")
+                return recommendations
+        
         # Use Claude to analyze the product and determine appropriate filters for recommendations
         anthropic_client = get_anthropic_client()
         
@@ -628,39 +896,37 @@ Return your analysis as a JSON object with these fields:
 
 Focus on practical, stylish combinations that customers would actually want to buy together, while respecting their original price constraints."""
 
-        # Get Claude's analysis
-        analysis_response = anthropic_client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=1000,
-            messages=[{"role": "user", "content": analysis_prompt}]
-        )
-        
-        # Parse Claude's response
-        analysis_text = analysis_response.content[0].text
-        print(f"Claude's product analysis: {analysis_text}")
-        
-        # Extract JSON from Claude's response
-        try:
-            # Find JSON in the response
-            import re
+        # Claude's analysis, cached per product and prompt; concurrent clicks share one call
+        async def request_analysis() -> Optional[Dict[str, Any]]:
+            analysis_response = await anthropic_client.messages.create(
+                model=PRODUCT_ANALYSIS_MODEL,
+                max_tokens=1000,
+                messages=[{"role": "user", "content": analysis_prompt}]
+            )
+            
+            # Parse Claude's response
+            analysis_text = analysis_response.content[0].text
+            print(f"Claude's product analysis: {analysis_text}")
+            
+            # Extract JSON from Claude's response; None when it has none, so it is not cached
             json_match = re.search(r'\{.*\}', analysis_text, re.DOTALL)
-            if json_match:
+            if not json_match:
+                return None
+            try:
                 analysis = json.loads(json_match.group())
-            else:
-                # Fallback analysis if JSON parsing fails
-                analysis = {
-                    "item_type": "top",
-                    "complementary_category": "pants",
-                    "suggested_colors": ["black", "white"],
-                    "gender_match": product.get('gender', 'women').lower(),
-                    "price_range": "mid",
-                    "reasoning": "Complementary items for styling"
-                }
-        except:
-            # Fallback analysis
+            except ValueError:
+                return None
+            return analysis if isinstance(analysis, dict) else None
+        
+        cache_id = product_id or product.get('name', '')
+        analysis = await analysis_cache.get_or_compute(
+            analysis_key(cache_id, PRODUCT_ANALYSIS_MODEL, analysis_prompt), cache_id, request_analysis
+        )
+        if analysis is None:
+            # Fallback analysis if JSON parsing fails
             analysis = {
                 "item_type": "top",
-                "complementary_category": "pants", 
+                "complementary_category": "pants",
                 "suggested_colors": ["black", "white"],
                 "gender_match": product.get('gender', 'women').lower(),
                 "price_range": "mid",
@@ -677,6 +943,9 @@ Focus on practical, stylish combinations that customers would actually want to b
             "category": analysis.get("complementary_category"),
             "limit": 4
         }
+        if product_id:
+            # Narrow the product's precomputed recommendations with Claude's filters
+            filters["product_id"] = product_id
         
         # Add color filter if suggested
         suggested_colors = analysis.get("suggested_colors", [])
@@ -685,13 +954,7 @@ Focus on practical, stylish combinations that customers would actually want to b
         
         # Add price constraints from search context (priority over analysis)
         if search_context and search_context.get('filtersApplied'):
-            search_filters = search_context['filtersApplied']
-            if search_filters.get('max_price'):
-                filters["max_price"] = search_filters['max_price']
-                print(f"Applied search context max_price: ${search_filters['max_price']}")
-            if search_filters.get('min_price'):
-                filters["min_price"] = search_filters['min_price']
-                print(f"Applied search context min_price: ${search_filters['min_price']}")
+            filters.update(search_context_price_filters(search_context))
         else:
             # Fallback to analysis-based price range if no search context
             price_range = analysis.get("price_range", "mid")
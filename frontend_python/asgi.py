@@ -0,0 +1,67 @@
+"""ASGI serving mode for the frontend.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8503
+
+Serves the same routes as the Flask app, but the request handlers are
+awaited on the server's event loop, so one worker multiplexes many chats
+that are waiting on Claude or the MCP server. The Anthropic client and the
+MCP session pool are shared by all requests.
+"""
+import os
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+from app import get_metrics, handle_chat, handle_recommendations, handle_style_agent, stream_chat_events
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+templates = Jinja2Templates(directory=os.path.join(BASE_DIR, 'templates'))
+
+
+async def _json_body(request: Request) -> dict:
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _json_endpoint(handler):
+    async def endpoint(request: Request) -> JSONResponse:
+        payload, status = await handler(await _json_body(request))
+        return JSONResponse(payload, status_code=status)
+    return endpoint
+
+
+async def chat_stream(request: Request):
+    data = await _json_body(request)
+    if not data.get('message'):
+        return JSONResponse({'error': 'No message provided'}, status_code=400)
+    return StreamingResponse(stream_chat_events(data), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def index(request: Request):
+    return templates.TemplateResponse(request, 'index.html')
+
+
+async def style_quiz_removed(request: Request) -> JSONResponse:
+    return JSONResponse({'error': 'Deprecated. Use /api/style_agent'}, status_code=410)
+
+
+async def metrics(request: Request) -> JSONResponse:
+    return JSONResponse(get_metrics())
+
+
+app = Starlette(routes=[
+    Route('/', index),
+    Route('/api/chat', _json_endpoint(handle_chat), methods=['POST']),
+    Route('/api/chat/stream', chat_stream, methods=['POST']),
+    Route('/api/recommendations', _json_endpoint(handle_recommendations), methods=['POST']),
+    Route('/api/style_quiz', style_quiz_removed, methods=['POST']),
+    Route('/api/style_agent', _json_endpoint(handle_style_agent), methods=['POST']),
+    Route('/api/metrics', metrics, methods=['GET']),
+    Mount('/static', app=StaticFiles(directory=os.path.join(BASE_DIR, 'static')), name='static'),
+])
@@ -0,0 +1,87 @@
+"""Connections opened by the shared Anthropic client, against a local stub Messages API.
+
+    python benchmarks/check_connection_reuse.py --calls 20
+
+A stub HTTP/1.1 server on localhost answers every POST /v1/messages with a
+fixed reply and counts the TCP connections it accepts. The calls are made
+sequentially through get_anthropic_client(): on the Flask views' shared
+loop (run_async), then on a second loop as the ASGI server would, then on
+the shared loop again. With pooling, each loop opens one keep-alive
+connection and the shared loop's client is still there on its return; the
+script exits non-zero otherwise. No API key is needed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+REPLY = json.dumps({
+    "id": "msg_stub", "type": "message", "role": "assistant", "model": "stub",
+    "content": [{"type": "text", "text": "ok"}], "stop_reason": "end_turn", "stop_sequence": None,
+    "usage": {"input_tokens": 1, "output_tokens": 1}
+}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+        # One handler instance per accepted connection; keep-alive requests reuse it
+        super().setup()
+        StubHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+    def log_message(self, *args):
+        pass
+
+
+async def send(calls: int) -> int:
+    """Connections the stub accepted while ``calls`` messages were sent on the running loop"""
+    from app import get_anthropic_client
+    before = StubHandler.connections
+    for _ in range(calls):
+        await get_anthropic_client().messages.create(
+            model="stub", max_tokens=1, messages=[{"role": "user", "content": "ping"}]
+        )
+    return StubHandler.connections - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # config.py reads these at import
+    os.environ['ANTHROPIC_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'stub')
+    sys.path.insert(0, FRONTEND_DIR)
+    from app import run_async
+
+    results = {
+        'shared loop': run_async(send(args.calls)),
+        'second loop': asyncio.run(send(args.calls)),
+        'shared again': run_async(send(args.calls))
+    }
+    server.shutdown()
+    for name, connections in results.items():
+        print(f"{name:<13} {args.calls} calls, {connections} connections")
+    sys.exit(0 if list(results.values()) == [1, 1, 0] else 1)
+
+
+if __name__ == '__main__':
+    main()
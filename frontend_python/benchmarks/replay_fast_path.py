@@ -0,0 +1,111 @@
+"""Fast-path hit rate and agreement with Claude on a replay set of chat messages.
+
+    python benchmarks/replay_fast_path.py benchmarks/fast_path_queries.txt
+
+Every message is parsed locally and also sent to Claude once with the chat
+system prompt and tools, as a first chat turn. For the messages the fast
+path would answer, the parsed filters are compared with the arguments of
+Claude's first filter_products call; a clarifying question or a different
+tool counts as a disagreement. Needs ANTHROPIC_API_KEY and the MCP server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Paging arguments; any other argument Claude sets (e.g. search_term) must match the parser's
+IGNORED_ARGS = ('limit', 'schema_version')
+
+
+def normalize(filters: dict) -> dict:
+    from query_parser import GENDER_TERMS, SIZE_TERMS
+    normalized = {}
+    for field, value in filters.items():
+        if value in (None, ''):
+            continue
+        if isinstance(value, str):
+            value = value.strip().lower()
+            if field == 'gender':
+                value = GENDER_TERMS.get(value, value)
+            elif field == 'size':
+                value = SIZE_TERMS.get(value, value).upper()
+            elif field == 'color' and value == 'grey':
+                value = 'gray'
+        elif field in ('min_price', 'max_price'):
+            value = float(value)
+        normalized[field] = value
+    return normalized
+
+
+async def llm_filters(client, tools, system_prompt: str, message: str):
+    """Arguments of Claude's first filter_products call for ``message``, or None"""
+    response = await client.messages.create(
+        model="claude-sonnet-4-5-20250929",
+        max_tokens=1000,
+        system=system_prompt,
+        messages=[{"role": "user", "content": message}],
+        tools=tools
+    )
+    for block in response.content:
+        if block.type == 'tool_use' and block.name == 'filter_products':
+            return dict(block.input)
+    return None
+
+
+async def replay(messages, min_confidence: float):
+    from app import CHAT_SYSTEM_PROMPT, get_anthropic_client
+    from mcp_client import mcp_client
+    from query_parser import fast_path_miss, parse_query
+
+    client = get_anthropic_client()
+    tools = [{key: value for key, value in tool.items() if key != 'cache_control'}
+             for tool in await mcp_client.get_tools_for_llm()]
+    hits = agreed = 0
+    field_disagreements = {}
+    for message in messages:
+        parsed = parse_query(message)
+        miss = fast_path_miss(parsed, min_confidence)
+        if miss:
+            print(f"miss ({miss:<13}) {message!r}")
+            continue
+        hits += 1
+        llm = await llm_filters(client, tools, CHAT_SYSTEM_PROMPT, message)
+        local = normalize(parsed['filters'])
+        remote = normalize({k: v for k, v in (llm or {}).items() if k not in IGNORED_ARGS})
+        if local == remote:
+            agreed += 1
+            print(f"agree              {message!r}: {local}")
+            continue
+        for field in set(local) | set(remote):
+            if local.get(field) != remote.get(field):
+                field_disagreements[field] = field_disagreements.get(field, 0) + 1
+        print(f"DISAGREE           {message!r}: local={local} llm={remote if llm is not None else 'no filter_products call'}")
+
+    print()
+    print(f"messages:        {len(messages)}")
+    print(f"fast-path hits:  {hits} ({hits / len(messages):.0%})" if messages else "fast-path hits:  0")
+    if hits:
+        print(f"agreement:       {agreed}/{hits} ({agreed / hits:.0%})")
+        print(f"disagreeing fields: {json.dumps(field_disagreements)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('replay_set', nargs='?', default=os.path.join(os.path.dirname(__file__), 'fast_path_queries.txt'))
+    parser.add_argument('--min-confidence', type=float, default=None)
+    args = parser.parse_args()
+
+    sys.path.insert(0, FRONTEND_DIR)
+    from config import CHAT_FAST_PATH_MIN_CONFIDENCE
+
+    with open(args.replay_set) as f:
+        messages = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    min_confidence = args.min_confidence if args.min_confidence is not None else CHAT_FAST_PATH_MIN_CONFIDENCE
+    asyncio.run(replay(messages, min_confidence))
+
+
+if __name__ == '__main__':
+    main()
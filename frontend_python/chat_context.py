@@ -0,0 +1,166 @@
+import collections
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Rough characters-per-token ratio for English text and JSON; only used to decide when to compact
+CHARS_PER_TOKEN = 4
+
+# Longest excerpt of each older message kept in the summary of earlier turns
+SUMMARY_EXCERPT_CHARS = 160
+
+# Stand-in for tool output Claude has already acted on
+STALE_TOOL_RESULT = "[Earlier tool result omitted; the products were already shown to the user]"
+
+# Per-request usage records kept for /api/metrics
+RECENT_REQUESTS = 50
+
+
+def _content_chars(content: Any) -> int:
+    if isinstance(content, str):
+        return len(content)
+    if isinstance(content, list):
+        total = 0
+        for block in content:
+            if isinstance(block, dict):
+                if block.get("type") == "image":
+                    # Images are billed by size, not by their base64 length
+                    total += 1600 * CHARS_PER_TOKEN
+                else:
+                    total += len(json.dumps(block.get("text") or block.get("content") or block.get("input") or ""))
+            else:
+                total += len(str(getattr(block, "text", "") or getattr(block, "input", "")))
+        return total
+    return len(str(content))
+
+
+def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(_content_chars(message.get("content", "")) for message in messages) // CHARS_PER_TOKEN
+
+
+def _excerpt(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= SUMMARY_EXCERPT_CHARS else text[:SUMMARY_EXCERPT_CHARS].rsplit(" ", 1)[0] + "..."
+
+
+def compact_history(history: List[Dict[str, Any]], token_budget: int,
+                    keep_recent: int) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, int]]]:
+    """Fit conversation history into ``token_budget`` by summarizing older turns.
+
+    The last ``keep_recent`` messages are kept verbatim; everything before
+    them is folded into one short summary of what the user asked for and
+    how the assistant answered. Returns the history to send and, when it
+    was compacted, the estimated token counts before and after.
+    """
+    before = estimate_tokens(history)
+    if before <= token_budget or len(history) <= keep_recent:
+        return history, None
+
+    split = len(history) - keep_recent
+    older, recent = history[:split], history[split:]
+    lines = []
+    for message in older:
+        content = message.get("content", "")
+        if not isinstance(content, str) or not content.strip():
+            continue
+        speaker = "User" if message.get("role") == "user" else "You"
+        lines.append(f"- {speaker}: {_excerpt(content)}")
+    summary = "Summary of the earlier conversation:\n" + "\n".join(lines)
+
+    recent = [dict(message) for message in recent]
+    if recent and recent[0].get("role") == "user" and isinstance(recent[0].get("content"), str):
+        recent[0]["content"] = f"{summary}\n\n{recent[0]['content']}"
+        compacted = recent
+    else:
+        compacted = [{"role": "user", "content": summary}] + recent
+    return compacted, {"before": before, "after": estimate_tokens(compacted)}
+
+
+def drop_stale_tool_results(messages: List[Dict[str, Any]], token_budget: int) -> int:
+    """Replace the output of tool rounds before the latest one once ``messages`` exceed ``token_budget``.
+
+    Claude has already answered from those results and the products are on
+    screen, so only the latest round's output is kept. Edits in place and
+    returns the number of tool results dropped.
+    """
+    if estimate_tokens(messages) <= token_budget:
+        return 0
+    latest = max((i for i, message in enumerate(messages) if _tool_results(message)), default=None)
+    dropped = 0
+    for i, message in enumerate(messages):
+        if i == latest:
+            continue
+        for block in _tool_results(message):
+            if block.get("content") != STALE_TOOL_RESULT:
+                block["content"] = STALE_TOOL_RESULT
+                dropped += 1
+    return dropped
+
+
+def _tool_results(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+    content = message.get("content")
+    if message.get("role") != "user" or not isinstance(content, list):
+        return []
+    return [block for block in content if isinstance(block, dict) and block.get("type") == "tool_result"]
+
+
+class UsageTracker:
+    """Input/output token counts per chat request, including prompt-cache reads and writes"""
+
+    def __init__(self):
+        self.requests = 0
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.cache_read_input_tokens = 0
+        self.cache_creation_input_tokens = 0
+        self.output_tokens = 0
+        self.compactions = 0
+        self.compacted_tokens_saved = 0
+        self.tool_results_dropped = 0
+        self._recent = collections.deque(maxlen=RECENT_REQUESTS)
+        self._lock = threading.Lock()
+
+    def start_request(self) -> Dict[str, int]:
+        return {"llm_calls": 0, "input_tokens": 0, "cache_read_input_tokens": 0,
+                "cache_creation_input_tokens": 0, "output_tokens": 0, "history_tokens_saved": 0,
+                "tool_results_dropped": 0}
+
+    def add_call(self, request: Dict[str, int], usage: Any):
+        request["llm_calls"] += 1
+        request["input_tokens"] += usage.input_tokens or 0
+        request["cache_read_input_tokens"] += getattr(usage, "cache_read_input_tokens", None) or 0
+        request["cache_creation_input_tokens"] += getattr(usage, "cache_creation_input_tokens", None) or 0
+        request["output_tokens"] += usage.output_tokens or 0
+
+    def finish_request(self, request: Dict[str, int]):
+        with self._lock:
+            self.requests += 1
+            self.llm_calls += request["llm_calls"]
+            self.input_tokens += request["input_tokens"]
+            self.cache_read_input_tokens += request["cache_read_input_tokens"]
+            self.cache_creation_input_tokens += request["cache_creation_input_tokens"]
+            self.output_tokens += request["output_tokens"]
+            if request["history_tokens_saved"]:
+                self.compactions += 1
+                self.compacted_tokens_saved += request["history_tokens_saved"]
+            self.tool_results_dropped += request["tool_results_dropped"]
+            self._recent.append(dict(request))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            # input_tokens excludes cached tokens; the total is what the prompt would cost uncached
+            prompt_tokens = self.input_tokens + self.cache_read_input_tokens + self.cache_creation_input_tokens
+            return {
+                "requests": self.requests,
+                "llm_calls": self.llm_calls,
+                "input_tokens": self.input_tokens,
+                "cache_read_input_tokens": self.cache_read_input_tokens,
+                "cache_creation_input_tokens": self.cache_creation_input_tokens,
+                "output_tokens": self.output_tokens,
+                "cache_hit_rate": round(self.cache_read_input_tokens / prompt_tokens, 3) if prompt_tokens else None,
+                "avg_prompt_tokens_per_request": round(prompt_tokens / self.requests, 1) if self.requests else None,
+                "history_compactions": self.compactions,
+                "history_tokens_saved": self.compacted_tokens_saved,
+                "tool_results_dropped": self.tool_results_dropped,
+                "recent_requests": list(self._recent)
+            }
@@ -4,4 +4,57 @@ from dotenv import load_dotenv
 load_dotenv()
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+
+# Anthropic HTTP client, created once per process and reused by every request
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL")  # unset uses the SDK default endpoint
+ANTHROPIC_MAX_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "100"))
+ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS", "20"))
+ANTHROPIC_KEEPALIVE_EXPIRY = float(os.getenv("ANTHROPIC_KEEPALIVE_EXPIRY", "60"))
+ANTHROPIC_CONNECT_TIMEOUT = float(os.getenv("ANTHROPIC_CONNECT_TIMEOUT", "5"))
+ANTHROPIC_TIMEOUT = float(os.getenv("ANTHROPIC_TIMEOUT", "120"))
+# Retries on connection errors, 408/409/429 and 5xx with exponential backoff (honours Retry-After)
+ANTHROPIC_MAX_RETRIES = int(os.getenv("ANTHROPIC_MAX_RETRIES", "3"))
 MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://localhost:8000/mcp")
+
+# Chat tool loop: follow-up rounds of tool calls per message and the wall-clock budget (seconds)
+CHAT_MAX_TOOL_ROUNDS = int(os.getenv("CHAT_MAX_TOOL_ROUNDS", "3"))
+CHAT_TIME_BUDGET = float(os.getenv("CHAT_TIME_BUDGET", "45"))
+# Products per tool result sent back to Claude (the UI still receives all of them)
+CHAT_TOOL_RESULT_PRODUCTS = int(os.getenv("CHAT_TOOL_RESULT_PRODUCTS", "10"))
+# Estimated tokens of conversation context before older turns are summarized and stale tool output dropped
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+# Most recent history messages always sent verbatim
+CHAT_HISTORY_KEEP_MESSAGES = int(os.getenv("CHAT_HISTORY_KEEP_MESSAGES", "6"))
+# Simple searches parsed locally call filter_products directly instead of going through Claude
+CHAT_FAST_PATH = os.getenv("CHAT_FAST_PATH", "true").lower() in ("1", "true", "yes")
+# Share of the message's words the parser must understand to take the fast path
+CHAT_FAST_PATH_MIN_CONFIDENCE = float(os.getenv("CHAT_FAST_PATH_MIN_CONFIDENCE", "1.0"))
+# Recommendations for a product with a ProductID come from the backend's precomputed table;
+# enable to also have Claude analyze the product and narrow the table with its suggested filters
+RECOMMENDATION_LLM_ANALYSIS = os.getenv("RECOMMENDATION_LLM_ANALYSIS", "false").lower() in ("1", "true", "yes")
+# On-disk cache of Claude product analyses: SQLite file, seconds an analysis stays valid, entries kept (0 disables)
+ANALYSIS_CACHE_PATH = os.getenv(
+    "ANALYSIS_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "product_analyses.sqlite3")
+)
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "604800"))
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "10000"))
+
+# MCP server process launched over STDIO by the session pool
+MCP_SERVER_COMMAND = os.getenv("MCP_SERVER_COMMAND", "uv")
+MCP_SERVER_ARGS = os.getenv("MCP_SERVER_ARGS", "run python app.py").split()
+MCP_SERVER_CWD = os.getenv(
+    "MCP_SERVER_CWD",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+)
+
+# Seconds before the chat typo corrector checks the MCP server for a new catalog vocabulary
+SPELLING_REFRESH_INTERVAL = float(os.getenv("SPELLING_REFRESH_INTERVAL", "300"))
+
+# MCP session pool tuning
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+MCP_HEALTHCHECK_INTERVAL = float(os.getenv("MCP_HEALTHCHECK_INTERVAL", "30"))
+MCP_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "30"))
+
+# Product response schema requested from the MCP tools (1 = full with alias keys, 2 = compact, opt-in)
+PRODUCT_SCHEMA_VERSION = int(os.getenv("PRODUCT_SCHEMA_VERSION", "1"))
@@ -1,109 +1,333 @@
 import asyncio
+import atexit
+import collections
 import json
+import threading
+import time
 from typing import Dict, List, Any, Optional
-from contextlib import AsyncExitStack
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from config import (
+    MCP_SERVER_COMMAND,
+    MCP_SERVER_ARGS,
+    MCP_SERVER_CWD,
+    MCP_POOL_SIZE,
+    MCP_HEALTHCHECK_INTERVAL,
+    MCP_CALL_TIMEOUT,
+    PRODUCT_SCHEMA_VERSION,
+)
+
+# Operational tools the backend exposes that are never offered to the LLM
+INTERNAL_TOOLS = {"catalog_status", "reload_catalog", "spelling_vocabulary"}
+
+# Tool parameters set by the client rather than the LLM; hidden from the tool schemas sent to Claude
+CLIENT_TOOL_PARAMS = {
+    "schema_version": PRODUCT_SCHEMA_VERSION
+}
+
+
+class PooledSession:
+    """One long-lived MCP server process and the ClientSession talking to it.
+
+    The stdio transport and session are entered and exited inside a single
+    task, as anyio requires, so the session can be restarted in place.
+    """
+
+    def __init__(self, server_params: StdioServerParameters, slot: int):
+        self.server_params = server_params
+        self.slot = slot
+        self.session: Optional[ClientSession] = None
+        self.in_use = False
+        self.healthy = False
+        self.restart_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def start(self):
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        if not self.alive:
+            raise RuntimeError(f"MCP session {self.slot} failed to start")
+        self.healthy = True
+
+    async def _run(self):
+        try:
+            async with stdio_client(self.server_params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._stop.wait()
+        except Exception as e:
+            print(f"MCP session {self.slot} exited: {e}")
+        finally:
+            self.session = None
+            self.healthy = False
+            self._ready.set()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except Exception:
+            self._task.cancel()
+        self._task = None
+
+
+class MCPSessionPool:
+    """Pool of persistent MCP sessions shared by every request in the process.
+
+    The sessions live on a dedicated event loop thread, so callers running on
+    any loop (including short-lived ``asyncio.run`` loops) can borrow them.
+    A background task pings idle sessions and restarts any that have crashed.
+    """
+
+    def __init__(self, server_params: StdioServerParameters, size: int = 2,
+                 healthcheck_interval: float = 30, call_timeout: float = 30):
+        self.server_params = server_params
+        self.size = max(1, size)
+        self.healthcheck_interval = healthcheck_interval
+        self.call_timeout = call_timeout
+        self._sessions: List[PooledSession] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._started = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self._waits = collections.deque(maxlen=1000)
+        self._counters = collections.Counter()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="mcp-session-pool", daemon=True).start()
+                self._started = asyncio.run_coroutine_threadsafe(self._start_sessions(), self._loop)
+            return self._started
+
+    async def _start_sessions(self):
+        self._idle = asyncio.Queue()
+        for slot in range(self.size):
+            pooled = PooledSession(self.server_params, slot)
+            self._sessions.append(pooled)
+            try:
+                await pooled.start()
+            except Exception as e:
+                # Left in the pool; it is restarted when next acquired
+                print(f"Error starting MCP session {slot}: {e}")
+            self._idle.put_nowait(pooled)
+        self._health_task = asyncio.create_task(self._health_loop())
+        print(f"MCP session pool started with {self.size} sessions")
+
+    async def run(self, fn):
+        """Run ``fn(session)`` on a pooled session from any event loop"""
+        await asyncio.wrap_future(self._ensure_started())
+        future = asyncio.run_coroutine_threadsafe(self._with_session(fn), self._loop)
+        return await asyncio.wrap_future(future)
+
+    async def _restart(self, pooled: PooledSession):
+        async with pooled.restart_lock:
+            if pooled.alive and pooled.healthy:
+                return
+            self._counters["restarts"] += 1
+            print(f"Restarting MCP session {pooled.slot}")
+            await pooled.stop()
+            await pooled.start()
+
+    async def _acquire(self) -> PooledSession:
+        wait_started = time.perf_counter()
+        pooled = await self._idle.get()
+        self._waits.append(time.perf_counter() - wait_started)
+        self._counters["acquisitions"] += 1
+        pooled.in_use = True
+        if not (pooled.alive and pooled.healthy):
+            try:
+                await self._restart(pooled)
+            except Exception:
+                self._release(pooled)
+                raise
+        return pooled
+
+    def _release(self, pooled: PooledSession):
+        pooled.in_use = False
+        self._idle.put_nowait(pooled)
+
+    async def _with_session(self, fn):
+        pooled = await self._acquire()
+        try:
+            return await asyncio.wait_for(fn(pooled.session), timeout=self.call_timeout)
+        except Exception:
+            # The server may have crashed or wedged mid-call; never hand it out again as-is
+            self._counters["call_errors"] += 1
+            pooled.healthy = False
+            raise
+        finally:
+            self._release(pooled)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.healthcheck_interval)
+            for pooled in self._sessions:
+                if pooled.in_use:
+                    continue
+                try:
+                    if pooled.alive:
+                        await asyncio.wait_for(pooled.session.send_ping(), timeout=5)
+                        pooled.healthy = True
+                        continue
+                except Exception as e:
+                    print(f"MCP session {pooled.slot} failed health check: {e}")
+                    pooled.healthy = False
+                self._counters["failed_health_checks"] += 1
+                if pooled.in_use:
+                    # Borrowed while we were pinging; the borrower restarts it on next acquire
+                    continue
+                try:
+                    await self._restart(pooled)
+                except Exception as e:
+                    print(f"Error restarting MCP session {pooled.slot}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size and acquire wait-time metrics"""
+        waits_ms = sorted(w * 1000 for w in self._waits)
+        return {
+            "size": self.size,
+            "alive": sum(1 for s in self._sessions if s.alive),
+            "in_use": sum(1 for s in self._sessions if s.in_use),
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "acquisitions": self._counters["acquisitions"],
+            "restarts": self._counters["restarts"],
+            "call_errors": self._counters["call_errors"],
+            "failed_health_checks": self._counters["failed_health_checks"],
+            "wait_ms_avg": round(sum(waits_ms) / len(waits_ms), 3) if waits_ms else 0.0,
+            "wait_ms_p95": round(waits_ms[int(len(waits_ms) * 0.95) - 1], 3) if waits_ms else 0.0,
+            "wait_ms_max": round(waits_ms[-1], 3) if waits_ms else 0.0,
+        }
+
+    def close(self):
+        """Stop every server process; called at interpreter exit"""
+        if self._loop is None or not self._loop.is_running():
+            return
+
+        async def _stop_all():
+            if self._health_task is not None:
+                self._health_task.cancel()
+            await asyncio.gather(*(s.stop() for s in self._sessions), return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_stop_all(), self._loop).result(timeout=10)
+        except Exception as e:
+            print(f"Error closing MCP session pool: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
 
 class MCPClient:
     def __init__(self):
         self.tools = []
         self._tools_cached = False
-    
+        self.pool = MCPSessionPool(
+            StdioServerParameters(
+                command=MCP_SERVER_COMMAND,
+                args=MCP_SERVER_ARGS,
+                cwd=MCP_SERVER_CWD
+            ),
+            size=MCP_POOL_SIZE,
+            healthcheck_interval=MCP_HEALTHCHECK_INTERVAL,
+            call_timeout=MCP_CALL_TIMEOUT
+        )
+        atexit.register(self.pool.close)
+
     async def _get_tools(self) -> List[Dict[str, Any]]:
         """Get tools from MCP server"""
         if self._tools_cached:
             return self.tools
-            
+
         try:
-            # Start the MCP server process
-            server_params = StdioServerParameters(
-                command="uv",
-                args=["run", "python", "app.py"],
-                cwd="/Users/srivinothinevadivel/Documents/GoFaGo2/backend"
-            )
-            
-            # Connect to the server using AsyncExitStack
-            async with AsyncExitStack() as exit_stack:
-                stdio_transport = await exit_stack.enter_async_context(stdio_client(server_params))
-                stdio, write = stdio_transport
-                session = await exit_stack.enter_async_context(ClientSession(stdio, write))
-                
-                # Initialize the session
-                await session.initialize()
-                
-                # List available tools
-                response = await session.list_tools()
-                self.tools = response.tools
-                self._tools_cached = True
-                
-                return self.tools
-                    
+            response = await self.pool.run(lambda session: session.list_tools())
+            self.tools = response.tools
+            self._tools_cached = True
+
+            return self.tools
+
         except Exception as e:
             print(f"Error getting tools from MCP server: {e}")
             import traceback
             traceback.print_exc()
             return []
-    
+
     async def call_tool(self, tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Call an MCP tool with given parameters"""
         try:
-            # Start the MCP server process
-            server_params = StdioServerParameters(
-                command="uv",
-                args=["run", "python", "app.py"],
-                cwd="/Users/srivinothinevadivel/Documents/GoFaGo2/backend"
-            )
-            
-            # Connect to the server using AsyncExitStack
-            async with AsyncExitStack() as exit_stack:
-                stdio_transport = await exit_stack.enter_async_context(stdio_client(server_params))
-                stdio, write = stdio_transport
-                session = await exit_stack.enter_async_context(ClientSession(stdio, write))
-                
-                # Initialize the session
-                await session.initialize()
-                
-                print(f"Calling tool {tool_name} with parameters: {parameters}")
-                # Call the tool
-                result = await session.call_tool(tool_name, parameters)
-                print(f"Tool result: {result}")
-                
-                # Parse the JSON result
-                if result.content and len(result.content) > 0:
-                    content = result.content[0]
-                    if hasattr(content, 'text'):
-                        result_text = content.text
-                        print(f"Tool result text: {result_text}")
-                        return json.loads(result_text)
-                
-                return {"success": False, "error": "No result from tool"}
-            
+            parameters = await self._with_client_params(tool_name, parameters)
+            print(f"Calling tool {tool_name} with parameters: {parameters}")
+            # Call the tool on a pooled session
+            result = await self.pool.run(lambda session: session.call_tool(tool_name, parameters))
+            print(f"Tool result: {result}")
+
+            # Parse the JSON result
+            if result.content and len(result.content) > 0:
+                content = result.content[0]
+                if hasattr(content, 'text'):
+                    result_text = content.text
+                    print(f"Tool result text: {result_text}")
+                    return json.loads(result_text)
+
+            return {"success": False, "error": "No result from tool"}
+
         except Exception as e:
             print(f"Error calling tool {tool_name}: {e}")
             import traceback
             traceback.print_exc()
             return {"success": False, "error": str(e)}
-    
+
+    async def _with_client_params(self, tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in client-controlled parameters the tool accepts"""
+        tools = await self._get_tools()
+        properties = next((tool.inputSchema.get("properties", {}) for tool in tools if tool.name == tool_name), {})
+        extra = {name: value for name, value in CLIENT_TOOL_PARAMS.items() if name in properties and name not in parameters}
+        return {**parameters, **extra} if extra else parameters
+
     async def get_tools_for_llm(self) -> List[Dict[str, Any]]:
         """Get tools formatted for LLM tool calling"""
         tools = await self._get_tools()
         llm_tools = []
-        
+
         for tool in tools:
+            if tool.name in INTERNAL_TOOLS:
+                continue
+            properties = {
+                name: schema for name, schema in tool.inputSchema.get("properties", {}).items()
+                if name not in CLIENT_TOOL_PARAMS
+            }
             # Convert MCP tool to Anthropic format
             llm_tool = {
                 "name": tool.name,
                 "description": tool.description,
                 "input_schema": {
                     "type": "object",
-                    "properties": tool.inputSchema.get("properties", {}),
+                    "properties": properties,
                     "required": tool.inputSchema.get("required", [])
                 }
             }
             llm_tools.append(llm_tool)
-        
+
+        if llm_tools:
+            # Prompt-cache breakpoint: the tool definitions are the same on every request
+            llm_tools[-1]["cache_control"] = {"type": "ephemeral"}
         return llm_tools
 
+    def stats(self) -> Dict[str, Any]:
+        """Session pool metrics"""
+        return self.pool.stats()
+
 # Global MCP client instance
 mcp_client = MCPClient()
\ No newline at end of file
@@ -0,0 +1,152 @@
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Lexicon for the entity grammar documented on the filter_products tool;
+# every surface form maps to the value Claude would pass for it
+GENDER_TERMS = {
+    'men': 'men', "men's": 'men', 'mens': 'men', 'man': 'men', 'male': 'men',
+    'women': 'women', "women's": 'women', 'womens': 'women', 'woman': 'women', 'female': 'women',
+    'ladies': 'women'
+}
+
+CATEGORY_TERMS = {
+    'hoodie': 'hoodie', 'hoodies': 'hoodie', 'hoody': 'hoodie',
+    'pants': 'pants', 'pant': 'pants', 'trousers': 'pants',
+    'shirt': 'shirt', 'shirts': 'shirt',
+    'sweatshirt': 'sweatshirt', 'sweatshirts': 'sweatshirt',
+    'jacket': 'jacket', 'jackets': 'jacket',
+    'top': 'top', 'tops': 'top'
+}
+
+COLOR_TERMS = {
+    'black', 'white', 'blue', 'red', 'pink', 'brown', 'gray', 'grey', 'green', 'navy', 'purple', 'yellow',
+    'orange', 'beige'
+}
+
+# Size words on their own; letter sizes count only after "size" ("size m")
+SIZE_TERMS = {
+    'small': 'S', 'medium': 'M', 'large': 'L', 'xs': 'XS', 'xxs': 'XXS', 'xl': 'XL', 'xxl': 'XXL'
+}
+SIZE_CODES = {'xxs', 'xs', 's', 'm', 'l', 'xl', 'xxl'}
+
+SORT_TERMS = {
+    'cheapest': 'asc', 'cheap': 'asc', 'budget': 'asc', 'affordable': 'asc', 'inexpensive': 'asc',
+    'expensive': 'desc', 'priciest': 'desc', 'premium': 'desc'
+}
+
+# Words that carry no filter; anything else (negations, styles, occasions, typos)
+# is left for Claude to interpret
+FILLER_TERMS = {
+    'show', 'me', 'find', 'get', 'give', 'i', 'want', 'need', 'looking', 'look', 'for', 'some', 'a', 'an',
+    'the', 'any', 'please', 'in', 'with', 'of', 'and', 'most', 'nike', 'options', 'items', 'search', 'size',
+    "i'm", 'im', 'am', 'all', 'do', 'you', 'have', 'got', 'color', 'colour', 'can', 'see'
+}
+
+_AMOUNT = r'\$?\s*(\d+(?:\.\d+)?)\s*(?:\$|dollars?|usd|bucks)?'
+PRICE_PATTERNS = [
+    (re.compile(rf'\bbetween\s+{_AMOUNT}\s+(?:and|to)\s+{_AMOUNT}'), ('min_price', 'max_price')),
+    (re.compile(rf'(?<![\w.])\$\s*(\d+(?:\.\d+)?)\s*(?:-|to)\s*{_AMOUNT}'), ('min_price', 'max_price')),
+    (re.compile(rf'\b(?:under|below|less\s+than|cheaper\s+than|up\s+to|at\s+most|max(?:imum)?|within)\s+{_AMOUNT}'),
+     ('max_price',)),
+    (re.compile(rf'\b(?:over|above|more\s+than|at\s+least|min(?:imum)?)\s+{_AMOUNT}'), ('min_price',)),
+]
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9$']+")
+
+
+def parse_query(text: str) -> Dict[str, Any]:
+    """Extract filter_products arguments from a shopping query with the local lexicon.
+
+    Returns the ``filters`` found, the words nothing in the lexicon
+    accounts for (``unknown``) and a ``confidence`` equal to the share of
+    words that were understood.
+    """
+    text = text.lower().replace('’', "'")
+    filters: Dict[str, Any] = {}
+
+    for pattern, fields in PRICE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            for field, amount in zip(fields, match.groups()):
+                filters.setdefault(field, float(amount))
+            text = text[:match.start()] + ' ' + text[match.end():]
+
+    tokens = TOKEN_PATTERN.findall(text)
+    unknown: List[str] = []
+    previous = None
+    for token in tokens:
+        if token in GENDER_TERMS:
+            _assign(filters, 'gender', GENDER_TERMS[token], unknown, token)
+        elif token in CATEGORY_TERMS:
+            _assign(filters, 'category', CATEGORY_TERMS[token], unknown, token)
+        elif token in COLOR_TERMS:
+            _assign(filters, 'color', token, unknown, token)
+        elif token in SIZE_TERMS:
+            _assign(filters, 'size', SIZE_TERMS[token], unknown, token)
+        elif previous == 'size' and token in SIZE_CODES:
+            _assign(filters, 'size', token.upper(), unknown, token)
+        elif token in SORT_TERMS:
+            _assign(filters, 'sort_by_price', SORT_TERMS[token], unknown, token)
+        elif token not in FILLER_TERMS:
+            unknown.append(token)
+        previous = token
+
+    confidence = (len(tokens) - len(unknown)) / len(tokens) if tokens else 0.0
+    return {'filters': filters, 'unknown': unknown, 'confidence': round(confidence, 3)}
+
+
+def _assign(filters: Dict[str, Any], field: str, value: Any, unknown: List[str], token: str):
+    # A second, different value for the same field ("black or white") is Claude's to resolve
+    if filters.get(field, value) != value:
+        unknown.append(token)
+    else:
+        filters[field] = value
+
+
+def fast_path_miss(parsed: Dict[str, Any], min_confidence: float) -> Optional[str]:
+    """Why ``parsed`` must go to Claude, or None when filter_products can be called directly.
+
+    Besides understanding the query, the fast path needs a category and a
+    gender: without them the chat prompt has Claude ask a clarifying question.
+    """
+    if parsed['confidence'] < min_confidence:
+        return 'unknown_terms'
+    if 'category' not in parsed['filters']:
+        return 'no_category'
+    if 'gender' not in parsed['filters']:
+        return 'no_gender'
+    return None
+
+
+class FastPathStats:
+    """How many chat messages the local parser answered without calling Claude"""
+
+    def __init__(self):
+        self.queries = 0
+        self.hits = 0
+        self.misses: Dict[str, int] = {}
+        self.hit_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_miss(self, reason: str):
+        with self._lock:
+            self.queries += 1
+            self.misses[reason] = self.misses.get(reason, 0) + 1
+
+    def record_hit(self, started: float):
+        with self._lock:
+            self.queries += 1
+            self.hits += 1
+            self.hit_seconds += time.monotonic() - started
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.queries, 3) if self.queries else None,
+                "avg_hit_ms": round(self.hit_seconds * 1000 / self.hits, 1) if self.hits else None,
+                "misses": dict(self.misses)
+            }
@@ -0,0 +1,52 @@
+import re
+import time
+from typing import List, Tuple
+import spelling
+from config import SPELLING_REFRESH_INTERVAL
+
+# Words of a message as typed, matched like spelling.tokenize matches lowercased text
+WORD_PATTERN = re.compile(spelling.TOKEN_PATTERN.pattern, re.IGNORECASE)
+
+
+class CatalogSpeller:
+    """Typo correction for chat messages against the catalog's vocabulary.
+
+    The vocabulary comes from the MCP server's ``spelling_vocabulary`` tool
+    and is fetched again after ``refresh_interval`` seconds if the catalog
+    version changed; until the first fetch succeeds only the built-in
+    domain words are known.
+    """
+
+    def __init__(self, refresh_interval: float = SPELLING_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.catalog_version = None
+        self.index = spelling.SpellingIndex(spelling.vocabulary_from_texts([]))
+        self._fetched_at = None
+
+    async def _refresh(self, mcp_client):
+        if self._fetched_at is not None and time.monotonic() - self._fetched_at < self.refresh_interval:
+            return
+        self._fetched_at = time.monotonic()
+        result = await mcp_client.call_tool("spelling_vocabulary", {})
+        if not result.get("success"):
+            print(f"Spelling vocabulary unavailable: {result.get('error')}")
+            return
+        if result.get("catalog_version") != self.catalog_version:
+            self.index = spelling.SpellingIndex(result["vocabulary"])
+            self.catalog_version = result.get("catalog_version")
+            print(f"Loaded spelling vocabulary of {len(self.index)} words (catalog {self.catalog_version})")
+
+    async def correct(self, mcp_client, text: str) -> Tuple[str, List[str]]:
+        """``text`` with its typos replaced in place (punctuation and prices kept), and a description of each correction"""
+        await self._refresh(mcp_client)
+        _, corrections = self.index.correct_tokens(spelling.tokenize(text))
+        replacements = dict(corrections)
+
+        def replace(match):
+            word = match.group(0)
+            # tokenize drops a possessive "'s", so "womrn's" is corrected as "womrn"
+            base = word[:-2] if word.lower().endswith("'s") else word
+            correction = replacements.get(base.lower())
+            return correction + word[len(base):] if correction else word
+
+        return WORD_PATTERN.sub(replace, text), [f"'{typo}' → '{correction}'" for typo, correction in corrections]
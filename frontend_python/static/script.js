@@ -422,44 +422,19 @@ class StyleAI {
         this.autoScroll();
 
         try {
-            // Send message to backend with image data
+            // Send message to backend with image data and stream the reply
             // Note: In production, you'd want to send the image as a separate field or use FormData
             // For now, we'll include it as base64 in the request
-            const response = await fetch('/api/chat', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ 
-                    message: messageForBackend,
-                    conversationHistory: this.conversationHistory,
-                    imageData: imageData // Include image data
-                })
+            const { data, contentEl, productsShown } = await this.streamAssistantReply(chatMessages, loadingMessage, {
+                message: messageForBackend,
+                conversationHistory: this.conversationHistory,
+                imageData: imageData // Include image data
             });
-
-            if (!response.ok) {
-                const errorData = await response.json().catch(() => ({ error: `HTTP ${response.status}: ${response.statusText}` }));
-                throw new Error(errorData.error || `Server error: ${response.status} ${response.statusText}`);
-            }
-
-            const data = await response.json();
             console.log('Server response:', data);
 
-            // Remove loading message
-            loadingMessage.remove();
-
-            // Add AI response
-            const aiResponse = document.createElement('div');
-            aiResponse.className = 'ai-message';
+            // Replace the streamed text with the final message
             const aiText = data.message || `I found results based on your image! Here are the top picks:`;
-
-            aiResponse.innerHTML = `
-                <div class="message-content"></div>
-            `;
-            chatMessages.appendChild(aiResponse);
-
-            // Type out the message
-            await this.typeMessage(aiResponse.querySelector('.message-content'), aiText);
+            contentEl.textContent = aiText;
             this.autoScroll();
 
             // Add AI response to conversation history
@@ -488,8 +463,8 @@ class StyleAI {
             // Save session
             this.saveCurrentSession();
 
-            // Display products if any
-            if (data.products && data.products.length > 0) {
+            // Display products if any (unless they already arrived mid-stream)
+            if (!productsShown && data.products && data.products.length > 0) {
                 this.displayProducts(data.products);
             }
 
@@ -565,31 +540,14 @@ class StyleAI {
         this.autoScroll();
         
         try {
-            const response = await fetch('/api/chat', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ 
-                    message: messageForBackend,
-                    conversationHistory: this.conversationHistory
-                })
+            const { data, contentEl, productsShown } = await this.streamAssistantReply(chatMessages, loadingMessage, {
+                message: messageForBackend,
+                conversationHistory: this.conversationHistory
             });
             
-            // Check if response is OK
-            if (!response.ok) {
-                const errorData = await response.json().catch(() => ({ error: `HTTP ${response.status}: ${response.statusText}` }));
-                throw new Error(errorData.error || `Server error: ${response.status} ${response.statusText}`);
-            }
-            
-            const data = await response.json();
-            loadingMessage.remove();
-            
-            // Add AI response
-            const aiResponse = document.createElement('div');
-            aiResponse.className = 'ai-message';
+            // Replace the streamed text with the final message
             const aiText = data.message || `I found results based on your preferences! Here are the top picks:`;
-            aiResponse.innerHTML = `<div class="message-content"></div>`;
-            chatMessages.appendChild(aiResponse);
-            await this.typeMessage(aiResponse.querySelector('.message-content'), aiText);
+            contentEl.textContent = aiText;
             this.autoScroll();
             
             this.conversationHistory.push({
@@ -607,11 +565,9 @@ class StyleAI {
                 filtersApplied: {}
             };
             
-            // Display products if available
-            if (data.products && data.products.length > 0) {
-                setTimeout(() => {
-                    this.displayProducts(data.products);
-                }, 500);
+            // Display products if available (unless they already arrived mid-stream)
+            if (!productsShown && data.products && data.products.length > 0) {
+                this.displayProducts(data.products);
             }
             
             // Update header with search title
@@ -653,6 +609,22 @@ class StyleAI {
         return cleanPrice.toFixed(2);
     }
 
+    expandProduct(product) {
+        // Compact (schema v2) products omit the legacy alias keys; restore them for the renderers
+        return {
+            current_price: product.price,
+            Image_Url: product.image_url,
+            product_page_url: product.product_url,
+            Sizes: product.sizes,
+            Colors: product.colors,
+            Colors_Available: product.colors_available,
+            productcard_messaging: product.messaging,
+            category: product.name,
+            Category: product.name,
+            ...product
+        };
+    }
+
     initThemeToggle() {
         const themeToggle = document.getElementById('themeToggle');
         const themeIcon = themeToggle.querySelector('.theme-icon');
@@ -1216,6 +1188,7 @@ class StyleAI {
         if (!products || products.length === 0) {
             return;
         }
+        products = products.map(product => this.expandProduct(product));
         
         // Store products for modal and recommendations
         this.productsData = products;
@@ -1585,6 +1558,7 @@ class StyleAI {
     }
 
     displayRecommendations(products) {
+        products = (products || []).map(product => this.expandProduct(product));
         console.log('displayRecommendations called with:', products);
         const recommendationsGrid = document.querySelector('.recommendations-grid');
         console.log('Recommendations grid:', recommendationsGrid);
@@ -2654,47 +2628,19 @@ class StyleAI {
         this.autoScroll();
         
         try {
-            // Send message to backend with conversation history
-            const response = await fetch('/api/chat', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ 
-                    message: messageForBackend,
-                    conversationHistory: this.conversationHistory
-                })
+            // Send message to backend with conversation history; text renders as it streams in
+            // and product cards as soon as the search returns
+            const { data, contentEl, productsShown } = await this.streamAssistantReply(chatMessages, loadingMessage, {
+                message: messageForBackend,
+                conversationHistory: this.conversationHistory
             });
-            
-            // Check if response is OK
-            if (!response.ok) {
-                const errorData = await response.json().catch(() => ({ error: `HTTP ${response.status}: ${response.statusText}` }));
-                throw new Error(errorData.error || `Server error: ${response.status} ${response.statusText}`);
-            }
-            
-            const data = await response.json();
             console.log('Server response:', data);
             console.log('Products count:', data.products ? data.products.length : 0);
             
-            // Remove loading message
-            loadingMessage.remove();
-            
-            // Add AI response with typing animation
-            const aiResponse = document.createElement('div');
-            aiResponse.className = 'ai-message';
+            // Replace the streamed text with the final message
             const aiText = data.message || `I found results for "${displayMessage}"! Here are the top picks:`;
-            
-            // Start with empty content
-            aiResponse.innerHTML = `
-                <div class="message-content"></div>
-            `;
-            chatMessages.appendChild(aiResponse);
-            
-        // Type out the message character by character
-        await this.typeMessage(aiResponse.querySelector('.message-content'), aiText);
-        
-        // Scroll after typing completes
-        this.autoScroll();
+            contentEl.textContent = aiText;
+            this.autoScroll();
         
         // Add AI response to conversation history
             this.conversationHistory.push({
@@ -2726,12 +2672,11 @@ class StyleAI {
             
             // Load products if available - after typing animation completes
             console.log('Checking products...');
-            if (data.products && data.products.length > 0) {
+            if (productsShown) {
+                console.log('Products already displayed from the stream');
+            } else if (data.products && data.products.length > 0) {
                 console.log('Displaying products from server');
-                // Display products after a short delay to allow typing animation to finish
-                setTimeout(() => {
-                    this.displayProducts(data.products);
-                }, 500);
+                this.displayProducts(data.products);
             } else {
                 console.log('No products in response');
             }
@@ -3034,13 +2979,91 @@ class StyleAI {
         }
     }
 
-    async typeMessage(element, text) {
-        // Type out text character by character
-        for (let i = 0; i < text.length; i++) {
-            element.textContent = text.substring(0, i + 1);
-            this.autoScroll();
-            await new Promise(resolve => setTimeout(resolve, 20)); // 20ms delay between characters
+    async streamChat(body, handlers = {}) {
+        // POST to the streaming chat endpoint and dispatch its Server-Sent Events as they arrive;
+        // resolves with the final 'done' payload ({ message, products, is_clarification })
+        const response = await fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({ error: `HTTP ${response.status}: ${response.statusText}` }));
+            throw new Error(errorData.error || `Server error: ${response.status} ${response.statusText}`);
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let result = null;
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let eventName = 'message';
+                let eventData = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                    else if (line.startsWith('data:')) eventData += line.slice(5).trim();
+                });
+                const payload = eventData ? JSON.parse(eventData) : {};
+                
+                if (eventName === 'text' && handlers.onText) {
+                    handlers.onText(payload.delta);
+                } else if (eventName === 'products' && handlers.onProducts) {
+                    handlers.onProducts(payload.products || []);
+                } else if (eventName === 'error') {
+                    throw new Error(payload.error || 'Chat stream failed');
+                } else if (eventName === 'done') {
+                    result = payload;
+                }
+            }
         }
+        
+        if (!result) {
+            throw new Error('Chat stream ended unexpectedly');
+        }
+        return result;
+    }
+    
+    async streamAssistantReply(chatMessages, loadingMessage, body) {
+        // Render a streamed reply: the loading message gives way to a bubble that fills with
+        // text deltas, and product cards are shown as soon as they arrive
+        let contentEl = null;
+        let productsShown = false;
+        const ensureBubble = () => {
+            if (!contentEl) {
+                loadingMessage.remove();
+                const aiResponse = document.createElement('div');
+                aiResponse.className = 'ai-message';
+                aiResponse.innerHTML = `<div class="message-content"></div>`;
+                chatMessages.appendChild(aiResponse);
+                contentEl = aiResponse.querySelector('.message-content');
+            }
+            return contentEl;
+        };
+        
+        const data = await this.streamChat(body, {
+            onText: (delta) => {
+                ensureBubble().textContent += delta;
+                this.autoScroll();
+            },
+            onProducts: (products) => {
+                if (products.length > 0) {
+                    this.displayProducts(products);
+                    productsShown = true;
+                }
+            }
+        });
+        
+        return { data, contentEl: ensureBubble(), productsShown };
     }
     
     autoScroll() {